@@ -0,0 +1,244 @@
+"""Статистика проходження тестів на стовпцевих масивах NumPy.
+
+Результати з test_results дочитуються інкрементно — лише рядки з id, більшим
+за останній прочитаний, — і дописуються в масиви (користувач, тест, відсоток,
+час; окремо відповіді по предметах). Зведення рахуються векторними
+операціями й кешуються до появи нових результатів, тож перегляд статистики
+не сканує таблицю.
+"""
+import json
+import threading
+
+import numpy as np
+
+# Розподіл балів кошиками по 10%: 0–9, 10–19, ..., 90–100
+BUCKETS = 10
+PERCENTILES = (25, 50, 90)
+
+
+class _Column:
+    """Масив, що росте подвоєнням місткості; заповнена частина не змінюється."""
+
+    def __init__(self, dtype):
+        self._data = np.empty(64, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self._data):
+            data = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            data[:self.size] = self._data[:self.size]
+            self._data = data
+        self._data[self.size:needed] = values
+        self.size = needed
+
+    @property
+    def values(self):
+        return self._data[:self.size]
+
+
+class _Codes:
+    """Назви тестів і предметів як цілі коди для np.bincount."""
+
+    def __init__(self):
+        self.names = []
+        self._codes = {}
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+def _group_rank(codes):
+    """Порядковий номер кожного елемента всередині своєї групи (0, 1, 2, ...)."""
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    return rank
+
+
+def _subject_accuracy(names, subjects, correct):
+    answered = np.bincount(subjects, minlength=len(names))
+    right = np.bincount(subjects, weights=correct, minlength=len(names))
+    return [{
+        'subject': names[code],
+        'answers': int(answered[code]),
+        'accuracy': round(float(right[code] * 100 / answered[code]), 1),
+    } for code in np.flatnonzero(answered)]
+
+
+class ResultAnalytics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._last_id = 0
+        self._tests = _Codes()
+        self._subjects = _Codes()
+        self._user = _Column(np.int64)
+        self._test = _Column(np.int32)
+        self._percent = _Column(np.float64)
+        self._time = _Column(np.float64)
+        self._answer_user = _Column(np.int64)
+        self._answer_subject = _Column(np.int32)
+        self._answer_correct = _Column(np.bool_)
+        self._cache = {}
+
+    def ensure_current(self, conn):
+        """Дочитує нові результати; повертає кількість доданих рядків."""
+        last_id = conn.execute('SELECT MAX(id) FROM test_results').fetchone()[0] or 0
+        if last_id == self._last_id:
+            return 0
+        with self._lock:
+            if last_id < self._last_id:
+                # Результати видалено — перечитуємо все
+                self._reset()
+            rows = conn.execute(
+                'SELECT id, user_id, test_name, score, total_questions, time_spent, answers '
+                'FROM test_results WHERE id > ? ORDER BY id', (self._last_id,)
+            ).fetchall()
+            if not rows:
+                return 0
+            self._append(rows)
+            self._last_id = rows[-1][0]
+            self._cache = {}
+            return len(rows)
+
+    def _append(self, rows):
+        users, tests, percents, times = [], [], [], []
+        answer_users, answer_subjects, answer_correct = [], [], []
+        for _, user_id, test_name, score, total, time_spent, answers in rows:
+            user_id = -1 if user_id is None else user_id
+            users.append(user_id)
+            tests.append(self._tests.code(test_name))
+            percents.append(score * 100 / total if total else 0.0)
+            times.append(np.nan if time_spent is None else time_spent)
+            for item in _parse_answers(answers):
+                answer_users.append(user_id)
+                answer_subjects.append(self._subjects.code(item['subject']))
+                answer_correct.append(bool(item.get('isCorrect')))
+        self._user.extend(users)
+        self._test.extend(tests)
+        self._percent.extend(percents)
+        self._time.extend(times)
+        self._answer_user.extend(answer_users)
+        self._answer_subject.extend(answer_subjects)
+        self._answer_correct.extend(answer_correct)
+
+    def _snapshot(self):
+        with self._lock:
+            return (self._cache, list(self._tests.names), list(self._subjects.names),
+                    self._user.values, self._test.values, self._percent.values, self._time.values,
+                    self._answer_user.values, self._answer_subject.values, self._answer_correct.values)
+
+    def overview(self):
+        """Зведення по всіх тестах і предметах."""
+        cache, tests, subjects, _, test, percent, time_spent, _, answer_subject, answer_correct = self._snapshot()
+        result = cache.get('overview')
+        if result is not None:
+            return result
+
+        attempts = np.bincount(test, minlength=len(tests))
+        sums = np.bincount(test, weights=percent, minlength=len(tests))
+        buckets = np.minimum(percent // (100 / BUCKETS), BUCKETS - 1).astype(np.int64)
+        distribution = np.bincount(test * BUCKETS + buckets, minlength=len(tests) * BUCKETS)
+        distribution = distribution.reshape(len(tests), BUCKETS)
+        # Сортування за (тест, відсоток) дає суцільні відрізки для перцентилів кожного тесту
+        order = np.lexsort((percent, test))
+        bounds = np.r_[0, np.cumsum(attempts)]
+
+        summaries = []
+        for code in np.flatnonzero(attempts):
+            rows = order[bounds[code]:bounds[code + 1]]
+            scores, times = percent[rows], time_spent[rows]
+            points = np.percentile(scores, PERCENTILES)
+            summary = {
+                'test_name': tests[code],
+                'attempts': int(attempts[code]),
+                'mean_percent': round(float(sums[code] / attempts[code]), 1),
+                'distribution': distribution[code].tolist(),
+                'median_time': None if np.isnan(times).all() else round(float(np.nanmedian(times))),
+            }
+            summary.update({f'p{p}': round(float(value), 1) for p, value in zip(PERCENTILES, points)})
+            summaries.append(summary)
+
+        result = {
+            'attempts': int(len(percent)),
+            'tests': sorted(summaries, key=lambda s: -s['attempts']),
+            'subjects': _subject_accuracy(subjects, answer_subject, answer_correct),
+        }
+        cache['overview'] = result
+        return result
+
+    def user_progress(self, user_id):
+        """Результати користувача по тестах із динамікою та точністю по предметах.
+
+        trend — нахил прямої, проведеної через відсотки послідовних спроб
+        (у відсоткових пунктах за спробу); додатний означає покращення.
+        """
+        (cache, tests, subjects, user, test, percent, _,
+         answer_user, answer_subject, answer_correct) = self._snapshot()
+        key = ('user', user_id)
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        mask = user == user_id
+        test, percent = test[mask], percent[mask]
+        x = _group_rank(test).astype(np.float64)
+        n = np.bincount(test, minlength=len(tests))
+        sx, sy = np.bincount(test, x, len(tests)), np.bincount(test, percent, len(tests))
+        sxx, sxy = np.bincount(test, x * x, len(tests)), np.bincount(test, x * percent, len(tests))
+        best = np.full(len(tests), -np.inf)
+        np.maximum.at(best, test, percent)
+        # Спроби йдуть за зростанням id: номер 0 — перша, n - 1 — остання
+        first = np.full(len(tests), np.nan)
+        last = np.full(len(tests), np.nan)
+        first[test[x == 0]] = percent[x == 0]
+        is_last = x == n[test] - 1
+        last[test[is_last]] = percent[is_last]
+
+        progress = []
+        for code in np.flatnonzero(n):
+            denominator = n[code] * sxx[code] - sx[code] ** 2
+            trend = (n[code] * sxy[code] - sx[code] * sy[code]) / denominator if denominator else 0.0
+            progress.append({
+                'test_name': tests[code],
+                'attempts': int(n[code]),
+                'best_percent': round(float(best[code]), 1),
+                'mean_percent': round(float(sy[code] / n[code]), 1),
+                'first_percent': round(float(first[code]), 1),
+                'last_percent': round(float(last[code]), 1),
+                'trend': round(float(trend), 2),
+            })
+
+        answered = answer_user == user_id
+        result = {
+            'tests': sorted(progress, key=lambda p: -p['attempts']),
+            'subjects': _subject_accuracy(subjects, answer_subject[answered], answer_correct[answered]),
+        }
+        cache[key] = result
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'rows': self._percent.size, 'answers': self._answer_subject.size, 'last_id': self._last_id}
+
+
+def _parse_answers(answers):
+    """Відповіді по запитаннях; записи без предмета (старі результати) пропускаються."""
+    try:
+        items = json.loads(answers)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(items, list):
+        return []
+    return [item for item in items if isinstance(item, dict) and isinstance(item.get('subject'), str)]
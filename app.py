@@ -1,20 +1,129 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, session, jsonify, flash, make_response, g
 import sqlite3
-import bcrypt
+import click
 import requests
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import partial
 import json
+import math
+import threading
+import db
+import weather
+import migrations
+import passwords
+import mailer
+import bulk
+import tasks_api
+import results
+import metrics
+import fragments
+import assets
+import ratelimit
+import timetable
+import analytics
+import calendar_feeds
+import events
+import fulltext
+import reminders
+from config import Config
+from conflicts import ScheduleEngine, validate_timetable
+from quizzes import (AttemptInvalid, MemoryAttemptStore, QuizEngine, QuizExpired, SQLiteAttemptStore,
+                     load_attempt, make_attempt)
+from schedule_cache import ScheduleCache, WEEKDAYS
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'
+bp = Blueprint('main', __name__)
 
-WEATHER_API_KEY = 'your-api-key-here'
-WEATHER_API_URL = 'http://api.openweathermap.org/data/2.5/weather'
+weather_session = weather.make_session()
+_weather_lock = threading.Lock()
+_hasher_lock = threading.Lock()
+_mail_lock = threading.Lock()
+_results_lock = threading.Lock()
+_reminders_lock = threading.Lock()
+
+def create_app(config=None):
+    """Створює додаток; `config` — клас налаштувань або словник, що доповнює Config."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    
+    db.init_app(app)
+    metrics.init_app(app)
+    fragments.init_app(app)
+    assets.init_app(app)
+    ratelimit.init_app(app)
+    calendar_feeds.init_app(app)
+    events.init_app(app)
+    app.extensions['schedule_cache'] = ScheduleCache()
+    app.extensions['schedule_engine'] = ScheduleEngine()
+    app.extensions['quiz_engine'] = QuizEngine(app.config['QUIZ_SETS_PER_QUIZ'], app.config['QUIZ_MAX_SIZE'])
+    attempts_storage = app.config['QUIZ_ATTEMPTS_STORAGE']
+    app.extensions['quiz_attempts'] = (
+        SQLiteAttemptStore(attempts_storage, app.config['QUIZ_ATTEMPT_TTL']) if attempts_storage
+        else MemoryAttemptStore(app.config['QUIZ_ATTEMPT_TTL'])
+    )
+    app.extensions['result_analytics'] = analytics.ResultAnalytics()
+    app.register_blueprint(bp)
+    # Реєстр спільний для процесу: close_app прибирає збирач разом із додатком
+    app.extensions['metrics_collector'] = partial(collect_component_metrics, app)
+    metrics.registry.add_collector(app.extensions['metrics_collector'])
+    
+    @app.cli.command('init-db')
+    @click.option('--requeue-mail', is_flag=True, help='Повернути в чергу листи, що зависли у відправці')
+    def init_db_command(requeue_mail):
+        """Створює таблиці та застосовує міграції."""
+        init_db()
+        if requeue_mail:
+            database = app.config['DATABASE']
+            conn = sqlite3.connect(database, uri=database.startswith('file:'))
+            with conn:
+                count = mailer.requeue_interrupted(conn)
+            conn.close()
+            print(f"Повернуто в чергу листів: {count}")
+        print(f"База даних {app.config['DATABASE']} готова")
+    
+    @app.cli.command('generate-timetable')
+    @click.argument('spec_file', type=click.File(encoding='utf-8'))
+    @click.option('--seed', default=0, help='Початкове зерно для спроб')
+    @click.option('--restarts', default=None, type=int, help='Кількість спроб з різними зернами')
+    @click.option('--workers', default=None, type=int, help='Процесів для паралельних спроб')
+    @click.option('--timeout', default=None, type=float, help='Скільки секунд шукати розклад')
+    @click.option('--dry-run', is_flag=True, help='Лише скласти розклад, не записуючи в базу')
+    def generate_timetable_command(spec_file, seed, restarts, workers, timeout, dry_run):
+        """Складає розклад класів з JSON-опису і записує його в lessons."""
+        spec = json.load(spec_file)
+        database = app.config['DATABASE']
+        conn = sqlite3.connect(database, uri=database.startswith('file:'))
+        try:
+            problem = timetable.build_problem(spec, timetable.existing_lessons(conn, spec))
+            lessons = timetable.solve(
+                problem, seed=seed,
+                restarts=restarts or app.config['TIMETABLE_RESTARTS'],
+                workers=workers or app.config['TIMETABLE_WORKERS'],
+                timeout=timeout or app.config['TIMETABLE_TIMEOUT'],
+                max_steps=app.config['TIMETABLE_MAX_STEPS'],
+            )
+            if lessons is None:
+                raise click.ClickException('Не вдалося скласти розклад: додайте вчителів, кабінети або слоти')
+            if not dry_run:
+                with conn:
+                    timetable.write_lessons(conn, problem, lessons)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        finally:
+            conn.close()
+        suffix = ' (без запису)' if dry_run else ''
+        print(f"Складено уроків: {len(lessons)} для класів: {', '.join(problem.classes)}{suffix}")
+    
+    return app
 
 def init_db():
     """Ініціалізація бази даних"""
-    conn = sqlite3.connect('school_schedule.db')
+    database = current_app.config['DATABASE']
+    conn = sqlite3.connect(database, uri=database.startswith('file:'))
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -70,50 +179,76 @@ def init_db():
     ''')
     
     conn.commit()
+    migrations.migrate(conn)
     conn.close()
 
 def get_db_connection():
-    conn = sqlite3.connect('school_schedule.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db.get_db()
+
+def get_password_hasher():
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        with _hasher_lock:
+            hasher = current_app.extensions.get('password_hasher')
+            if hasher is None:
+                rounds = current_app.config['BCRYPT_ROUNDS']
+                if rounds is None:
+                    rounds = passwords.calibrate_rounds(current_app.config['BCRYPT_TARGET_MS'])
+                hasher = passwords.PasswordHasher(
+                    rounds=rounds,
+                    workers=current_app.config['PASSWORD_WORKERS'],
+                    bulk_workers=current_app.config['PASSWORD_BULK_WORKERS'],
+                    max_pending=current_app.config['PASSWORD_QUEUE_SIZE'],
+                    executor=current_app.config['PASSWORD_EXECUTOR'],
+                )
+                current_app.extensions['password_hasher'] = hasher
+    return hasher
 
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    with metrics.span('bcrypt.hash'):
+        return get_password_hasher().hash(password)
+
+def hash_passwords(passwords):
+    with metrics.span('bcrypt.hash'):
+        return get_password_hasher().hash_many(passwords)
 
 def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed)
+    with metrics.span('bcrypt.check'):
+        return get_password_hasher().check(password, hashed)
 
 def login_required(f):
     from functools import wraps
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
-def get_weather(city='Kyiv'):
-    try:
-        params = {
-            'q': city,
-            'appid': WEATHER_API_KEY,
-            'units': 'metric',
-            'lang': 'uk'
-        }
-        response = requests.get(WEATHER_API_URL, params=params)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        print(f"Помилка отримання погоди: {e}")
-        return None
-
-@app.route('/')
+def get_weather(city, api_url, api_key):
+    with metrics.span('weather.fetch'):
+        return weather.fetch_weather(weather_session, api_url, api_key, city)
+
+def get_weather_cache():
+    cache = current_app.extensions.get('weather_cache')
+    if cache is None:
+        with _weather_lock:
+            cache = current_app.extensions.get('weather_cache')
+            if cache is None:
+                # Оновлення йде у фонових потоках, поза контекстом додатку
+                fetch = partial(get_weather, api_url=current_app.config['WEATHER_API_URL'],
+                                api_key=current_app.config['WEATHER_API_KEY'])
+                cache = weather.WeatherCache(fetch, ttl=current_app.config['WEATHER_CACHE_TTL'])
+                cache.start()
+                current_app.extensions['weather_cache'] = cache
+    return cache
+
+@bp.route('/')
 def index():
-    weather_data = get_weather()
+    weather_data = get_weather_cache().get('Kyiv')
     return render_template('index.html', weather=weather_data)
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -134,7 +269,6 @@ def register():
         
         if existing_user:
             flash('Користувач з таким ім\'ям або email вже існує')
-            conn.close()
             return render_template('register.html')
         
         password_hash = hash_password(password)
@@ -142,17 +276,17 @@ def register():
             'INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)',
             (username, email, password_hash, role)
         )
+        send_registration_email(conn, email, username)
         conn.commit()
-        conn.close()
-        
-        send_registration_email(email, username)
+        if current_app.config['MAIL_AUTOSTART']:
+            get_mail_dispatcher().wake()
         
         flash('Реєстрація успішна! Перевірте свій email.')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -163,48 +297,172 @@ def login():
             'SELECT * FROM users WHERE username = ?',
             (username,)
         ).fetchone()
-        conn.close()
         
         if user and check_password(password, user['password_hash']):
+            hasher = get_password_hasher()
+            if hasher.needs_rehash(user['password_hash']):
+                conn.execute(
+                    'UPDATE users SET password_hash = ? WHERE id = ?',
+                    (hash_password(password), user['id'])
+                )
+                conn.commit()
+                hasher.record_rehash()
+            
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter is not None:
+                # Невдалі спроби до успішного входу не обмежують наступні входи
+                limiter.reset('main.login', 'username', ratelimit.request_keys()['username'])
+            
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['role'] = user['role']
             flash('Вхід успішний!')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         else:
             flash('Невірні дані для входу')
     
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('Ви вийшли з системи')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/schedule')
+@bp.route('/schedule')
 @login_required
 def schedule():
     conn = get_db_connection()
-    lessons = conn.execute(
-        'SELECT * FROM lessons ORDER BY day_of_week, time_start'
-    ).fetchall()
-    conn.close()
+    schedule_cache = current_app.extensions['schedule_cache']
+    snapshot = schedule_cache.get(conn)
+    # Фрагмент днів має відповідати саме цьому знімку, а не новішій версії в базі
+    fragments.pin_version('lessons', snapshot.version)
+    can_edit = session.get('role') in ['admin', 'teacher']
+    
+    # Сторінка містить навбар користувача, тому ETag враховує його
+    etag = f"{snapshot.etag}-{session['user_id']}-{session.get('role')}"
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = (request.if_modified_since is not None
+                        and request.if_modified_since >= snapshot.last_modified)
+    
+    if not_modified and '_flashes' not in session:
+        response = current_app.response_class(status=304)
+    else:
+        calendar_token = calendar_feeds.make_token(current_app.secret_key, 'user', session['user_id'])
+        response = make_response(render_template(
+            'schedule.html', schedule=snapshot.days, schedule_version=snapshot.version, can_edit=can_edit,
+            calendar_url=url_for('main.calendar_feed', token=calendar_token, _external=True)
+        ))
+    
+    response.set_etag(etag, weak=True)
+    response.last_modified = snapshot.last_modified
+    response.headers['X-Schedule-Version'] = str(snapshot.version)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@bp.route('/calendar/<token>.ics')
+def calendar_feed(token):
+    # Календарні програми не мають сесії: доступ дає лише підписаний токен
+    scope = calendar_feeds.load_token(current_app.secret_key, token)
+    if scope is None:
+        return 'Календар не знайдено', 404
+    
+    pool = db.get_pool()
+    conn = pool.acquire()
+    try:
+        if scope[0] == 'user' and conn.execute('SELECT 1 FROM users WHERE id = ?', (scope[1],)).fetchone() is None:
+            return 'Календар не знайдено', 404
+        versions, updated_at = calendar_feeds.feed_versions(conn, scope)
+    finally:
+        pool.release(conn)
+    
+    etag = calendar_feeds.feed_etag(scope, versions)
+    last_modified = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
     
-    schedule_by_day = {}
-    days = ['Понеділок', 'Вівторок', 'Середа', 'Четвер', 'П\'ятниця']
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        cache = current_app.extensions['calendar_cache']
+        key = (scope[0], scope[1], versions)
+        body = cache.get(key)
+        if body is None:
+            chunks = calendar_feeds.render_feed(pool, scope, updated_at, current_app.config['CALENDAR_TERM_START'])
+            body = calendar_feeds.cached(cache, key, chunks)
+        response = current_app.response_class(body, mimetype='text/calendar')
+        response.headers['Content-Disposition'] = 'inline; filename=schedule.ics'
+    
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@bp.route('/api/calendar_links')
+@login_required
+def calendar_links():
+    secret_key = current_app.secret_key
+    conn = get_db_connection()
+    classes = [row['class_name'] for row in conn.execute(
+        'SELECT DISTINCT class_name FROM lessons WHERE class_name IS NOT NULL ORDER BY class_name'
+    )]
+    return jsonify({
+        'user': url_for('main.calendar_feed', _external=True,
+                        token=calendar_feeds.make_token(secret_key, 'user', session['user_id'])),
+        'classes': {
+            name: url_for('main.calendar_feed', _external=True,
+                          token=calendar_feeds.make_token(secret_key, 'class', name))
+            for name in classes
+        },
+    })
+
+@bp.route('/events')
+@login_required
+def event_stream():
+    hub = current_app.extensions.get('event_hub')
+    if hub is None:
+        return jsonify({'success': False, 'message': 'Канал подій вимкнено'}), 404
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_id') or hub.last_id)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Last-Event-ID має бути числом'}), 400
     
-    for day in days:
-        schedule_by_day[day] = [lesson for lesson in lessons if lesson['day_of_week'] == day]
+    # Версія розкладу в першій події: сторінка, відрендерена раніше, побачить, що відстала.
+    # З'єднання з пулу не тримається весь час потоку
+    pool = db.get_pool()
+    conn = pool.acquire()
+    try:
+        lessons_version = db.get_version(conn, 'lessons')[0]
+    finally:
+        pool.release(conn)
     
-    return render_template('schedule.html', schedule=schedule_by_day)
+    if not hub.open_stream():
+        response = jsonify({'success': False, 'message': 'Забагато відкритих потоків подій'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    channels = ('lessons', f"tasks:{session['user_id']}")
+    response = current_app.response_class(events.stream(
+        hub, channels, last_id, {'type': 'hello', 'lessons_version': lessons_version},
+        heartbeat=current_app.config['EVENTS_HEARTBEAT'],
+        duration=current_app.config['EVENTS_STREAM_TIMEOUT'],
+    ), mimetype='text/event-stream')
+    response.call_on_close(hub.close_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Проксі (nginx) не повинен буферизувати потік
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-@app.route('/add_lesson', methods=['GET', 'POST'])
+@bp.route('/add_lesson', methods=['GET', 'POST'])
 @login_required
 def add_lesson():
     if session.get('role') not in ['admin', 'teacher']:
         flash('У вас немає прав для додавання уроків')
-        return redirect(url_for('schedule'))
+        return redirect(url_for('main.schedule'))
     
     if request.method == 'POST':
         subject = request.form['subject']
@@ -214,101 +472,578 @@ def add_lesson():
         time_start = request.form['time_start']
         time_end = request.form['time_end']
         
+        try:
+            weekday = WEEKDAYS.index(day_of_week) + 1
+            start = bulk.minutes(time_start)
+            end = bulk.minutes(time_end)
+        except ValueError:
+            flash('Некоректний день або час уроку')
+            return render_template('add_lesson.html'), 400
+        if start >= end:
+            flash('Урок має закінчуватися пізніше, ніж починається')
+            return render_template('add_lesson.html'), 400
+
         conn = get_db_connection()
-        conn.execute(
+        schedule_engine = current_app.extensions['schedule_engine']
+        # Блокування запису на час перевірки, щоб паралельний запит не зайняв той самий слот
+        conn.execute('BEGIN IMMEDIATE')
+        schedule_engine.ensure_current(conn)
+        conflicts = schedule_engine.check(teacher, classroom, weekday, start, end)
+        if conflicts and not (session.get('role') == 'admin' and request.form.get('force')):
+            conn.rollback()
+            for conflict in conflicts:
+                lesson = conn.execute(
+                    'SELECT subject, teacher, classroom, time_start, time_end FROM lessons WHERE id = ?',
+                    (conflict['lesson_id'],)
+                ).fetchone()
+                what = 'Кабінет' if conflict['resource'] == 'classroom' else 'Вчитель'
+                flash(f"{what} зайнятий: {lesson['subject']} ({lesson['teacher']}, каб. {lesson['classroom']}) "
+                      f"{day_of_week} {lesson['time_start']}-{lesson['time_end']}")
+            return render_template('add_lesson.html'), 409
+
+        lesson_id = conn.execute(
             'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end, created_by) VALUES (?, ?, ?, ?, ?, ?, ?)',
             (subject, teacher, classroom, day_of_week, time_start, time_end, session['user_id'])
-        )
+        ).lastrowid
+        version = db.bump_version(conn, 'lessons')
         conn.commit()
-        conn.close()
+        schedule_engine.add(lesson_id, teacher, classroom, weekday, start, end, version)
+        events.publish('lessons', {'type': 'lesson_added', 'version': version, 'lesson': {
+            'id': lesson_id, 'subject': subject, 'teacher': teacher, 'classroom': classroom,
+            'day_of_week': day_of_week, 'time_start': time_start, 'time_end': time_end, 'class_name': None,
+        }})
         
         flash('Урок успішно додано!')
-        return redirect(url_for('schedule'))
+        return redirect(url_for('main.schedule'))
     
     return render_template('add_lesson.html')
 
-@app.route('/tasks')
+@bp.route('/tasks')
 @login_required
 def tasks():
+    # Завдання підвантажуються сторінками з /api/tasks
+    return render_template('tasks.html')
+
+@bp.route('/api/tasks')
+@login_required
+def api_tasks():
     conn = get_db_connection()
-    user_tasks = conn.execute(
-        'SELECT * FROM tasks WHERE user_id = ? ORDER BY due_date',
-        (session['user_id'],)
-    ).fetchall()
-    conn.close()
+    # Ревізію читаємо до вибірки: зміни, що закомітяться між ними, клієнт
+    # ще раз отримає з /api/tasks/changes, а не пропустить
+    revision = tasks_api.current_revision(conn)
+    try:
+        user_tasks, next_cursor = tasks_api.query_tasks(conn, session['user_id'], request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    result = {'success': True, 'tasks': user_tasks, 'next_cursor': next_cursor}
+    if not request.args.get('cursor'):
+        result['summary'] = tasks_api.summary(conn, session['user_id'])
+        result['revision'] = revision
+    return jsonify(result)
+
+@bp.route('/api/tasks/changes')
+@login_required
+def api_task_changes():
+    try:
+        since = max(int(request.args.get('since', 0)), 0)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Параметр since має бути числом'}), 400
     
-    return render_template('tasks.html', tasks=user_tasks)
+    conn = get_db_connection()
+    result = tasks_api.changes(conn, session['user_id'], since)
+    if not result['more']:
+        result['summary'] = tasks_api.summary(conn, session['user_id'])
+    result['success'] = True
+    return jsonify(result)
 
-@app.route('/add_task', methods=['POST'])
+@bp.route('/search')
+@login_required
+def search():
+    try:
+        results = fulltext.search(get_db_connection(), request.args, session['user_id'], session.get('role'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except PermissionError as e:
+        return jsonify({'success': False, 'message': str(e)}), 403
+    return jsonify({'success': True, 'query': request.args.get('q'), 'results': results})
+
+@bp.route('/add_task', methods=['POST'])
 @login_required
 def add_task():
     data = request.get_json()
     
     conn = get_db_connection()
-    conn.execute(
+    task_id = conn.execute(
         'INSERT INTO tasks (title, description, subject, due_date, user_id) VALUES (?, ?, ?, ?, ?)',
         (data['title'], data['description'], data['subject'], data['due_date'], session['user_id'])
-    )
+    ).lastrowid
+    task = conn.execute(f'SELECT {", ".join(tasks_api.FIELDS)} FROM tasks WHERE id = ?', (task_id,)).fetchone()
     conn.commit()
-    conn.close()
+    events.publish(f"tasks:{session['user_id']}", {
+        'type': 'task_added', 'task': dict(task), 'summary': tasks_api.summary(conn, session['user_id'])
+    })
+    scheduler = current_app.extensions.get('reminder_scheduler')
+    if scheduler is not None:
+        scheduler.schedule(task_id, data['due_date'])
     
-    return jsonify({'success': True, 'message': 'Завдання додано!'})
+    return jsonify({'success': True, 'message': 'Завдання додано!', 'id': task_id})
 
-@app.route('/delete_task/<int:task_id>', methods=['DELETE'])
+@bp.route('/delete_task/<int:task_id>', methods=['DELETE'])
 @login_required
 def delete_task(task_id):
     conn = get_db_connection()
-    conn.execute(
+    deleted = conn.execute(
         'DELETE FROM tasks WHERE id = ? AND user_id = ?',
         (task_id, session['user_id'])
-    )
+    ).rowcount
     conn.commit()
-    conn.close()
+    if deleted:
+        events.publish(f"tasks:{session['user_id']}", {
+            'type': 'task_deleted', 'id': task_id, 'summary': tasks_api.summary(conn, session['user_id'])
+        })
+        scheduler = current_app.extensions.get('reminder_scheduler')
+        if scheduler is not None:
+            scheduler.cancel(task_id)
     
     return jsonify({'success': True, 'message': 'Завдання видалено!'})
 
-@app.route('/delete_lesson/<int:lesson_id>', methods=['DELETE'])
+@bp.route('/delete_lesson/<int:lesson_id>', methods=['DELETE'])
 @login_required
 def delete_lesson(lesson_id):
     if session.get('role') not in ['admin', 'teacher']:
         return jsonify({'success': False, 'message': 'У вас немає прав для видалення уроків'})
     
     conn = get_db_connection()
-    conn.execute('DELETE FROM lessons WHERE id = ?', (lesson_id,))
+    deleted = conn.execute('DELETE FROM lessons WHERE id = ?', (lesson_id,)).rowcount
+    if deleted:
+        version = db.bump_version(conn, 'lessons')
     conn.commit()
-    conn.close()
+    if deleted:
+        current_app.extensions['schedule_engine'].remove(lesson_id, version)
+        events.publish('lessons', {'type': 'lesson_deleted', 'id': lesson_id, 'version': version})
     
     return jsonify({'success': True, 'message': 'Урок видалено!'})
 
-@app.route('/test')
+def get_quiz_engine():
+    engine = current_app.extensions['quiz_engine']
+    if 'db' in g:
+        engine.ensure_current(g.db)
+        return engine
+    # З'єднання не тримається до кінця запиту: /submit_test далі пише через
+    # буфер результатів, якому потрібне власне з'єднання з того ж пулу
+    pool = db.get_pool()
+    conn = pool.acquire()
+    try:
+        engine.ensure_current(conn)
+    finally:
+        pool.release(conn)
+    return engine
+
+@bp.route('/test')
 def test():
-    return render_template('test.html')
+    return render_template('test.html', subjects=get_quiz_engine().subjects())
+
+@bp.route('/api/quiz')
+def api_quiz():
+    try:
+        size = int(request.args.get('size', 10))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Некоректний розмір тесту'}), 400
+    engine = get_quiz_engine()
+    if not 1 <= size <= engine.max_size:
+        return jsonify({'success': False, 'message': 'Некоректний розмір тесту'}), 400
+    try:
+        quiz = engine.draw(request.args.get('subject') or None, size)
+    except LookupError:
+        return jsonify({'success': False, 'message': 'Немає запитань з цього предмета'}), 404
+    # Підготовлений JSON без правильних відповідей віддається як є, лише з новим токеном спроби
+    attempt = make_attempt(current_app.secret_key, quiz.quiz_id, session.get('user_id'))
+    body = f'{quiz.payload[:-1]}, "attempt": {json.dumps(attempt)}}}'
+    response = current_app.response_class(body, mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
-@app.route('/submit_test', methods=['POST'])
+@bp.route('/submit_test', methods=['POST'])
 def submit_test():
-    data = request.get_json()
-    score = data.get('score', 0)
-    total = data.get('total', 0)
+    data = request.get_json(silent=True) or {}
+    max_age = current_app.config['QUIZ_ATTEMPT_TTL']
+    try:
+        quiz_id, nonce = load_attempt(current_app.secret_key, data.get('attempt'), session.get('user_id'), max_age)
+    except AttemptInvalid as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    engine = get_quiz_engine()
+    try:
+        quiz = engine.get(quiz_id)
+    except QuizExpired:
+        return jsonify({'success': False, 'message': 'Запитання змінилися, почніть тест заново'}), 409
+    except KeyError:
+        return jsonify({'success': False, 'message': 'Невідомий тест'}), 400
+    
+    # Спроба одноразова: правильні відповіді нижче отримує лише той, чий результат зараховано
+    try:
+        current_app.extensions['quiz_attempts'].claim(nonce)
+    except AttemptInvalid as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    
+    # Бал рахується на сервері за ключем відповідей; score/total від клієнта ігноруються
+    score, details = engine.score(quiz, data.get('answers'))
+    total = len(quiz.key)
     
     if 'user_id' in session:
-        conn = get_db_connection()
-        conn.execute(
-            'INSERT INTO test_results (user_id, test_name, score, total_questions) VALUES (?, ?, ?, ?)',
-            (session['user_id'], 'Загальний тест', score, total)
+        time_spent = data.get('timeSpent')
+        get_result_buffer().submit(
+            session['user_id'], quiz.test_name, score, total,
+            time_spent=time_spent if isinstance(time_spent, int) else None,
+            answers=json.dumps(details, ensure_ascii=False),
         )
-        conn.commit()
-        conn.close()
     
-    return jsonify({'success': True, 'score': score, 'total': total})
+    return jsonify({'success': True, 'score': score, 'total': total, 'results': details})
+
+@bp.route('/api/test_stats')
+@login_required
+def test_stats():
+    test_name = request.args.get('test_name', results.DEFAULT_TEST)
+    conn = get_db_connection()
+    return jsonify({
+        'test': results.test_summary(conn, test_name),
+        'leaderboard': results.leaderboard(conn, test_name),
+        'user': results.user_stats(conn, session['user_id']),
+    })
+
+def get_result_analytics():
+    result_analytics = current_app.extensions['result_analytics']
+    result_analytics.ensure_current(get_db_connection())
+    return result_analytics
+
+@bp.route('/stats')
+@login_required
+def stats():
+    result_analytics = get_result_analytics()
+    return render_template('stats.html', overview=result_analytics.overview(),
+                           progress=result_analytics.user_progress(session['user_id']))
+
+@bp.route('/api/stats')
+@login_required
+def api_stats():
+    result_analytics = get_result_analytics()
+    return jsonify({
+        'overview': result_analytics.overview(),
+        'user': result_analytics.user_progress(session['user_id']),
+    })
+
+@bp.route('/admin/import/<entity>', methods=['POST'])
+@login_required
+def bulk_import(entity):
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Доступ заборонено'}), 403
+    if entity not in bulk.ENTITIES:
+        return jsonify({'success': False, 'message': 'Невідомий тип даних'}), 404
+    
+    upload = request.files.get('file')
+    if upload is not None:
+        payload = upload.read()
+        fmt = 'json' if upload.filename.endswith('.json') else 'csv'
+    else:
+        payload = request.get_data()
+        fmt = 'json' if request.is_json else 'csv'
+    
+    try:
+        rows = bulk.parse_rows(payload, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'message': f'Не вдалося розібрати файл: {e}'}), 400
+    
+    imported, errors = bulk.import_rows(
+        get_db_connection(), entity, rows,
+        hash_passwords=hash_passwords,
+        schedule_engine=current_app.extensions['schedule_engine'],
+        created_by=session['user_id'],
+    )
+    if errors:
+        return jsonify({'success': False, 'imported': 0, 'errors': errors}), 400
+    if entity == 'lessons' and imported:
+        version = db.get_version(get_db_connection(), 'lessons')[0]
+        events.publish('lessons', {'type': 'lessons_replaced', 'version': version})
+    return jsonify({'success': True, 'imported': imported, 'errors': []})
+
+@bp.route('/admin/export/<entity>')
+@login_required
+def bulk_export(entity):
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Доступ заборонено'}), 403
+    if entity not in bulk.ENTITIES:
+        return jsonify({'success': False, 'message': 'Невідомий тип даних'}), 404
+    
+    fmt = 'json' if request.args.get('format') == 'json' else 'csv'
+    mimetype = 'application/x-ndjson' if fmt == 'json' else 'text/csv'
+    response = current_app.response_class(bulk.export_rows(db.get_pool(), entity, fmt), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={entity}.{"ndjson" if fmt == "json" else "csv"}'
+    return response
 
-def send_registration_email(email, username):
+@bp.route('/admin/db_stats')
+@login_required
+def db_stats():
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Доступ заборонено'}), 403
+    return jsonify(db.get_pool().stats())
+
+@bp.route('/admin/rate_limits')
+@login_required
+def rate_limit_stats():
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Доступ заборонено'}), 403
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is None:
+        return jsonify({'enabled': False})
+    return jsonify({
+        'enabled': True,
+        'limits': current_app.config['RATE_LIMITS'],
+        'stats': limiter.stats(),
+    })
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    return metrics.registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness: процес живий і обробляє запити."""
+    return jsonify({'status': 'ok'})
+
+@bp.route('/readyz')
+def readyz():
+    """Readiness: база доступна і схема оновлена до поточної версії."""
+    try:
+        version = db.get_db().execute('PRAGMA user_version').fetchone()[0]
+    except (sqlite3.Error, db.PoolTimeout) as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    if version != len(migrations.MIGRATIONS):
+        return jsonify({'status': 'migrating', 'schema_version': version}), 503
+    return jsonify({'status': 'ready', 'schema_version': version})
+
+def collect_component_metrics(app):
+    samples = []
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        for key, value in pool.stats().items():
+            samples.append((f'app_db_pool_{key}', value, {}))
+    hasher = app.extensions.get('password_hasher')
+    if hasher is not None:
+        stats = hasher.stats()
+        samples.append(('app_password_rejected', stats['rejected'], {}))
+        samples.append(('app_password_rehashed', stats['rehashed'], {}))
+    buffer = app.extensions.get('result_buffer')
+    if buffer is not None:
+        for key, value in buffer.stats().items():
+            samples.append((f'app_result_buffer_{key}', value, {}))
+    quiz_engine = app.extensions.get('quiz_engine')
+    if quiz_engine is not None:
+        stats = quiz_engine.stats()
+        samples.append(('app_quiz_questions', stats['questions'], {}))
+        samples.append(('app_quiz_sets', stats['quiz_sets'], {}))
+    attempts = app.extensions.get('quiz_attempts')
+    if attempts is not None:
+        samples.append(('app_quiz_attempts_used', attempts.stats()['used'], {}))
+    result_analytics = app.extensions.get('result_analytics')
+    if result_analytics is not None:
+        stats = result_analytics.stats()
+        samples.append(('app_analytics_rows', stats['rows'], {}))
+        samples.append(('app_analytics_answers', stats['answers'], {}))
+    limiter = app.extensions.get('rate_limiter')
+    if limiter is not None:
+        stats = limiter.stats()
+        samples.append(('app_rate_limit_keys', stats['keys'], {}))
+        for endpoint, count in stats['rejected'].items():
+            samples.append(('app_rate_limit_rejected_total', count, {'endpoint': endpoint}))
+    cache = app.extensions.get('fragment_cache')
+    if cache is not None:
+        for key, value in cache.stats().items():
+            samples.append((f'app_fragment_cache_{key}', value, {}))
+    hub = app.extensions.get('event_hub')
+    if hub is not None:
+        for key, value in hub.stats().items():
+            samples.append((f'app_events_{key}', value, {}))
+    cache = app.extensions.get('calendar_cache')
+    if cache is not None:
+        for key, value in cache.stats().items():
+            samples.append((f'app_calendar_cache_{key}', value, {}))
+    scheduler = app.extensions.get('reminder_scheduler')
+    if scheduler is not None:
+        for key, value in scheduler.stats().items():
+            samples.append((f'app_reminders_{key}', value, {}))
+    return samples
+
+@bp.route('/admin/password_stats')
+@login_required
+def password_stats():
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Доступ заборонено'}), 403
+    return jsonify(get_password_hasher().stats())
+
+@bp.route('/admin/timetable/validate')
+@login_required
+def validate_schedule():
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Доступ заборонено'}), 403
+    conflicts = validate_timetable(get_db_connection())
+    return jsonify({'success': not conflicts, 'conflicts': conflicts})
+
+@bp.route('/admin/timetable/generate', methods=['POST'])
+@login_required
+def generate_timetable():
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Доступ заборонено'}), 403
+    spec = request.get_json(silent=True)
+    if not isinstance(spec, dict):
+        return jsonify({'success': False, 'message': 'Очікується JSON-опис розкладу'}), 400
+    
+    conn = get_db_connection()
+    version, _ = db.get_version(conn, 'lessons')
     try:
-        print(f"Відправка email на {email} для користувача {username}")
-        return True
-    except Exception as e:
-        print(f"Помилка відправки email: {e}")
-        return False
+        problem = timetable.build_problem(spec, timetable.existing_lessons(conn, spec))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    # Пошук іде без блокування запису: інші зміни розкладу в цей час не чекають
+    lessons = timetable.solve(
+        problem,
+        restarts=current_app.config['TIMETABLE_RESTARTS'],
+        workers=current_app.config['TIMETABLE_WORKERS'],
+        timeout=current_app.config['TIMETABLE_TIMEOUT'],
+        max_steps=current_app.config['TIMETABLE_MAX_STEPS'],
+    )
+    if lessons is None:
+        return jsonify({'success': False, 'message': 'Не вдалося скласти розклад'}), 422
+    if request.args.get('dry_run'):
+        return jsonify({'success': True, 'lessons': lessons})
+    
+    conn.execute('BEGIN IMMEDIATE')
+    if db.get_version(conn, 'lessons')[0] != version:
+        conn.rollback()
+        return jsonify({'success': False, 'message': 'Розклад змінився під час складання, спробуйте ще раз'}), 409
+    version = timetable.write_lessons(conn, problem, lessons, created_by=session['user_id'])
+    conn.commit()
+    # Змінено багато уроків одразу — клієнти перечитують розклад повністю
+    events.publish('lessons', {'type': 'lessons_replaced', 'version': version})
+    return jsonify({'success': True, 'lessons': lessons})
+
+@bp.app_errorhandler(passwords.HasherBusy)
+def handle_hasher_busy(e):
+    flash('Сервер зайнятий, спробуйте увійти ще раз за кілька секунд')
+    template = 'register.html' if request.endpoint == 'main.register' else 'login.html'
+    return render_template(template), 429
+
+@bp.app_errorhandler(ratelimit.RateLimited)
+def handle_rate_limited(e):
+    message = f'Забагато спроб, спробуйте ще раз через {math.ceil(e.retry_after)} с'
+    if request.endpoint in ('main.login', 'main.register'):
+        flash(message)
+        template = 'register.html' if request.endpoint == 'main.register' else 'login.html'
+        response = make_response(render_template(template), 429)
+    else:
+        response = make_response(jsonify({'success': False, 'message': message}), 429)
+    response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+    return response
+
+@bp.app_errorhandler(db.PoolTimeout)
+def handle_pool_timeout(e):
+    return jsonify({'success': False, 'message': 'Сервер перевантажений, спробуйте пізніше'}), 503
+
+def get_mail_dispatcher():
+    dispatcher = current_app.extensions.get('mail_dispatcher')
+    if dispatcher is None:
+        with _mail_lock:
+            dispatcher = current_app.extensions.get('mail_dispatcher')
+            if dispatcher is None:
+                config = current_app.config
+                if config['SMTP_HOST']:
+                    transport_factory = lambda: mailer.SMTPTransport(
+                        config['SMTP_HOST'],
+                        port=config['SMTP_PORT'],
+                        username=config['SMTP_USERNAME'],
+                        password=config['SMTP_PASSWORD'],
+                        use_tls=config['SMTP_USE_TLS'],
+                    )
+                else:
+                    transport_factory = mailer.ConsoleTransport
+                dispatcher = mailer.OutboxDispatcher(
+                    db.get_pool(),
+                    transport_factory,
+                    batch_size=current_app.config['MAIL_BATCH_SIZE'],
+                    concurrency=current_app.config['MAIL_CONCURRENCY'],
+                    max_attempts=current_app.config['MAIL_MAX_ATTEMPTS'],
+                )
+                current_app.extensions['mail_dispatcher'] = dispatcher
+    return dispatcher
+
+def get_reminder_scheduler():
+    scheduler = current_app.extensions.get('reminder_scheduler')
+    if scheduler is None:
+        with _reminders_lock:
+            scheduler = current_app.extensions.get('reminder_scheduler')
+            if scheduler is None:
+                config = current_app.config
+                if config['REMINDER_SENDER'] == 'mail':
+                    sender = reminders.OutboxSender(wake=get_mail_dispatcher().wake)
+                else:
+                    sender = reminders.LocalSink()
+                scheduler = reminders.ReminderScheduler(
+                    db.get_pool(),
+                    sender,
+                    days_before=config['REMINDER_DAYS_BEFORE'],
+                    hour=config['REMINDER_HOUR'],
+                    horizon_days=config['REMINDER_HORIZON_DAYS'],
+                    refresh_interval=config['REMINDER_REFRESH_INTERVAL'],
+                )
+                current_app.extensions['reminder_scheduler'] = scheduler
+    return scheduler
+
+def send_registration_email(conn, email, username):
+    with metrics.span('mail.enqueue'):
+        mailer.enqueue(
+            conn, email,
+            'Реєстрація в системі шкільного розкладу',
+            f"Вітаємо, {username}!\n\nВаш обліковий запис успішно створено."
+        )
+
+def get_result_buffer():
+    buffer = current_app.extensions.get('result_buffer')
+    if buffer is None:
+        with _results_lock:
+            buffer = current_app.extensions.get('result_buffer')
+            if buffer is None:
+                buffer = results.ResultBuffer(
+                    db.get_pool(),
+                    batch_size=current_app.config['RESULTS_BATCH_SIZE'],
+                    flush_interval=current_app.config['RESULTS_FLUSH_INTERVAL'],
+                    max_pending=current_app.config['RESULTS_MAX_PENDING'],
+                )
+                current_app.extensions['result_buffer'] = buffer
+    return buffer
+
+def close_app(app):
+    """Зупиняє фонові потоки й пули додатку; результати з буфера записуються в базу."""
+    collector = app.extensions.pop('metrics_collector', None)
+    if collector is not None:
+        metrics.registry.remove_collector(collector)
+    for name in ('reminder_scheduler', 'result_buffer', 'mail_dispatcher', 'weather_cache'):
+        component = app.extensions.pop(name, None)
+        if component is not None:
+            component.stop()
+    hasher = app.extensions.pop('password_hasher', None)
+    if hasher is not None:
+        hasher.shutdown()
+    hub = app.extensions.pop('event_hub', None)
+    if hub is not None:
+        hub.close()
+    pool = app.extensions.pop('db_pool', None)
+    if pool is not None:
+        pool.close()
 
 if __name__ == '__main__':
-    init_db()
+    app = create_app()
+    with app.app_context():
+        init_db()
+        get_mail_dispatcher().start()
+        if app.config['REMINDERS_ENABLED']:
+            get_reminder_scheduler().start()
     app.run(debug=True, host='0.0.0.0', port=5000)
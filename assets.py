@@ -0,0 +1,241 @@
+"""Збірка статичних файлів: мініфікація, хеш у назві та стиснуті копії.
+
+    flask --app app build-assets
+
+Результат пишеться в static/dist разом з manifest.json. Якщо маніфест є,
+url_for('static', filename='css/style.css') повертає адресу зібраного файлу
+(dist/css/style.<хеш>.css), яка віддається з Cache-Control: immutable,
+а браузерам, що підтримують стиснення, — готова .br або .gz копія.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONS = ('.css', '.js')
+# (кодування для Accept-Encoding, суфікс файлу) у порядку переваги
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def minify_css(source):
+    css = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip() + '\n'
+
+
+# Після цих символів і слів «/» починає регулярний вираз, а не ділення
+REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORD = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|new|delete|void|throw|yield|await)$')
+
+
+def _regex_allowed(code):
+    code = code.rstrip()
+    return not code or code[-1] in REGEX_PREFIX or REGEX_KEYWORD.search(code) is not None
+
+
+def minify_js(source):
+    """Прибирає відступи, порожні рядки та коментарі.
+
+    Переноси рядків лишаються (автоматична вставка крапки з комою). Текст
+    читається посимвольно: рядки в лапках, шаблонні літерали `...` (разом із
+    ${...}), регулярні вирази й коментарі розпізнаються, тож лапка чи «`»
+    усередині них не збиває розбір. Рядки всередині шаблонних літералів не
+    змінюються.
+    """
+    lines = []
+    # Відкриті шаблонні літерали ('`') і фігурні дужки всередині їхніх ${...} ('{')
+    stack = []
+    quote = None
+    in_comment = False
+    code = ''
+    for line in source.splitlines():
+        in_template = bool(stack) and stack[-1] == '`' and quote is None and not in_comment
+        out = []
+        i, n = 0, len(line)
+        while i < n:
+            char = line[i]
+            if in_comment:
+                end = line.find('*/', i)
+                if end < 0:
+                    break
+                in_comment = False
+                out.append(' ')
+                i = end + 2
+            elif quote is not None or (stack and stack[-1] == '`'):
+                closing = quote or '`'
+                if char == '\\':
+                    out.append(line[i:i + 2])
+                    i += 2
+                    continue
+                if quote is None and line.startswith('${', i):
+                    stack.append('{')
+                    out.append('${')
+                    code = '{'
+                    i += 2
+                    continue
+                out.append(char)
+                i += 1
+                if char == closing:
+                    if quote is None:
+                        stack.pop()
+                    quote = None
+                    code = char
+            elif line.startswith('//', i):
+                break
+            elif line.startswith('/*', i):
+                in_comment = True
+                i += 2
+            elif char == '/' and _regex_allowed(code):
+                j, in_class = i + 1, False
+                while j < n:
+                    if line[j] == '\\':
+                        j += 1
+                    elif line[j] == '[':
+                        in_class = True
+                    elif line[j] == ']':
+                        in_class = False
+                    elif line[j] == '/' and not in_class:
+                        break
+                    j += 1
+                out.append(line[i:j + 1])
+                code = '/'
+                i = j + 1
+            else:
+                if char in '\'"':
+                    quote = char
+                elif char == '`':
+                    stack.append('`')
+                elif char == '{' and stack:
+                    stack.append('{')
+                elif char == '}' and stack:
+                    stack.pop()
+                out.append(char)
+                code = (code + char)[-16:]
+                i += 1
+        # Рядок у лапках переноситься лише зі зворотною косою рискою в кінці
+        if quote is not None and not line.endswith('\\'):
+            quote = None
+
+        if in_template:
+            lines.append(line)
+            continue
+        text = ''.join(out).lstrip()
+        if not (stack and stack[-1] == '`') and quote is None:
+            text = text.rstrip()
+        if text:
+            lines.append(text)
+    return '\n'.join(lines) + '\n'
+
+
+def _sources(static_folder, output):
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.relpath(root, static_folder) == '.':
+            dirs[:] = [d for d in dirs if d != output]
+        for name in files:
+            if name.endswith(EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/')
+
+
+def build(static_folder, output='dist'):
+    """Збирає всі .css і .js з static_folder; повертає маніфест {джерело: зібраний файл}."""
+    # Файли попередніх збірок не видаляються: сторінки, які ще віддають старі
+    # воркери під час плавного перезавантаження, посилаються на них
+    target = os.path.join(static_folder, output)
+    manifest = {}
+    for name in sorted(_sources(static_folder, output)):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        # Сторонні .min-файли вже мініфіковані
+        if not name.endswith(('.min.css', '.min.js')):
+            minify = minify_css if name.endswith('.css') else minify_js
+            data = minify(data.decode('utf-8')).encode('utf-8')
+
+        root, ext = os.path.splitext(name)
+        built = f'{output}/{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        path = os.path.join(static_folder, built)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data))
+        manifest[name] = built
+
+    os.makedirs(target, exist_ok=True)
+    path = os.path.join(target, 'manifest.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def load_manifest(static_folder, output='dist'):
+    try:
+        with open(os.path.join(static_folder, output, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def init_app(app):
+    """Підміняє адреси статичних файлів зібраними й віддає їх з довгим кешуванням.
+
+    Без маніфесту (збірку не запускали) файли віддаються як є.
+    """
+    app.config.setdefault('ASSETS_OUTPUT', 'dist')
+    app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    output = app.config['ASSETS_OUTPUT']
+
+    manifest = load_manifest(app.static_folder, output)
+    # Які стиснуті копії існують для кожного зібраного файлу
+    variants = {
+        built: [(encoding, suffix) for encoding, suffix in ENCODINGS
+                if os.path.exists(os.path.join(app.static_folder, built + suffix))]
+        for built in manifest.values()
+    }
+    app.extensions['assets_manifest'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static':
+            built = manifest.get(values.get('filename'))
+            if built is not None:
+                values['filename'] = built
+
+    send_static_file = app.view_functions['static']
+
+    def static(filename):
+        if filename not in variants:
+            return send_static_file(filename=filename)
+        max_age = app.config['ASSETS_MAX_AGE']
+        for encoding, suffix in variants[filename]:
+            if request.accept_encodings[encoding]:
+                response = send_from_directory(app.static_folder, filename + suffix, max_age=max_age,
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, max_age=max_age)
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Мініфікує статичні файли, додає хеш до назв і створює стиснуті копії."""
+        built = build(app.static_folder, output)
+        print(f"Зібрано файлів: {len(built)} у {os.path.join(app.static_folder, output)}")
@@ -0,0 +1,127 @@
+"""Генератор синтетичних даних для навантажувального тестування.
+
+Масштабує create_demo_data.py до тисяч користувачів, уроків і завдань:
+
+    python benchmarks/generate_data.py /tmp/bench/school_schedule.db --users 5000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as school_app
+from schedule_cache import WEEKDAYS
+
+PASSWORD = 'benchpass'
+SUBJECTS = ['Математика', 'Українська мова', 'Англійська мова', 'Фізика', 'Хімія',
+            'Біологія', 'Географія', 'Історія', 'Інформатика', 'Фізкультура']
+# Слова для назв і описів завдань: пошук має що розрізняти
+WORDS = ['реферат', 'конспект', 'задачі', 'вправи', 'параграф', 'рівняння', 'функції', 'дроби',
+         'вірш', 'твір', 'переказ', 'диктант', 'лабораторна', 'дослід', 'вимірювання', 'густина',
+         'опір', 'клітина', 'фотосинтез', 'екосистема', 'материк', 'клімат', 'карта', 'козацтво',
+         'гетьманщина', 'революція', 'алгоритм', 'програма', 'масив', 'цикл', 'граматика', 'лексика',
+         'переклад', 'есе', 'презентація', 'проєкт', 'повторити', 'вивчити', 'підготувати', 'розв\'язати']
+SLOTS = [('08:00', '09:35'), ('09:50', '11:25'), ('11:40', '13:15'), ('14:00', '15:35'),
+         ('15:50', '17:25'), ('17:40', '19:15')]
+
+
+def username(i):
+    return f'bench_user_{i}'
+
+
+def generate(path, users=1000, teachers=50, classrooms=40, tasks_per_user=20,
+             results_per_user=3, bcrypt_rounds=12, seed=42):
+    """Створює базу за шляхом `path` і заповнює її детермінованими даними."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+
+    with school_app.create_app({'DATABASE': path}).app_context():
+        school_app.init_db()
+
+    conn = sqlite3.connect(path)
+    # Один хеш на всіх: генерація не витрачає хвилини на bcrypt
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(bcrypt_rounds))
+    with conn:
+        conn.execute(
+            'INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)',
+            ('bench_admin', 'bench_admin@school.test', password_hash, 'admin')
+        )
+        conn.executemany(
+            'INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)',
+            ((username(i), f'{username(i)}@school.test', password_hash, 'student') for i in range(users))
+        )
+
+    # Кожен кабінет і кожен вчитель мають не більше одного уроку в слоті — без накладок
+    lessons = []
+    for weekday in WEEKDAYS:
+        for start, end in SLOTS:
+            offset = rng.randrange(teachers)
+            for room in range(min(classrooms, teachers)):
+                lessons.append((
+                    rng.choice(SUBJECTS), f'Вчитель {(room + offset) % teachers}', str(100 + room),
+                    weekday, start, end, 1,
+                ))
+    with conn:
+        conn.executemany(
+            'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end, created_by) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            lessons
+        )
+        conn.execute(
+            "UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'lessons'"
+        )
+
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'student'")]
+    start_day = date(2025, 9, 1)
+
+    def tasks():
+        for user_id in user_ids:
+            for n in range(tasks_per_user):
+                due = start_day + timedelta(days=rng.randrange(120)) if rng.random() > 0.1 else None
+                title = ' '.join(rng.sample(WORDS, 2)).capitalize()
+                description = ' '.join(rng.choices(WORDS, k=rng.randrange(4, 16)))
+                yield (f'{title} {n}', description, rng.choice(SUBJECTS),
+                       due.isoformat() if due else None, user_id)
+
+    def test_results():
+        for user_id in user_ids:
+            for _ in range(results_per_user):
+                yield (user_id, 'Загальний тест', rng.randrange(11), 10)
+
+    with conn:
+        conn.executemany(
+            'INSERT INTO tasks (title, description, subject, due_date, user_id) VALUES (?, ?, ?, ?, ?)',
+            tasks()
+        )
+        conn.executemany(
+            'INSERT INTO test_results (user_id, test_name, score, total_questions) VALUES (?, ?, ?, ?)',
+            test_results()
+        )
+    conn.close()
+    return {'users': users + 1, 'lessons': len(lessons), 'tasks': users * tasks_per_user}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--teachers', type=int, default=50)
+    parser.add_argument('--classrooms', type=int, default=40)
+    parser.add_argument('--tasks-per-user', type=int, default=20)
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    counts = generate(args.path, users=args.users, teachers=args.teachers, classrooms=args.classrooms,
+                      tasks_per_user=args.tasks_per_user, bcrypt_rounds=args.bcrypt_rounds, seed=args.seed)
+    print(f"Створено: {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""Навантажувальні сценарії для маршрутів додатку.
+
+Генерує базу, запускає локальний сервер і проганяє сценарії паралельними
+клієнтами. Результати (p50/p95/p99, запитів/с) пишуться в JSON і, якщо
+задано --baseline, порівнюються зі збереженим базовим запуском:
+
+    python benchmarks/run.py --users 2000 --output bench.json
+    python benchmarks/run.py --baseline bench.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import generate_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_CODE = (
+    "import app\n"
+    "server = app.create_app()\n"
+    "with server.app_context():\n"
+    "    app.init_db()\n"
+    "server.run(host='127.0.0.1', port={port}, threaded=True)\n"
+)
+
+
+def login(session, base_url, user, attempts=20):
+    for _ in range(attempts):
+        rv = session.post(f'{base_url}/login', data={'username': user, 'password': generate_data.PASSWORD},
+                          allow_redirects=False)
+        if rv.status_code == 302:
+            return
+        # 429 — черга bcrypt заповнена, це не помилка підготовки
+        if rv.status_code != 429:
+            break
+        time.sleep(0.1)
+    raise RuntimeError(f'Не вдалося увійти як {user}: {rv.status_code}')
+
+
+def morning_rush(session, base_url, i):
+    """Початок уроків: учні відкривають розклад і свої завдання."""
+    yield 'GET /schedule', lambda: session.get(f'{base_url}/schedule')
+    yield 'GET /tasks', lambda: session.get(f'{base_url}/tasks')
+    yield 'GET /api/tasks', lambda: session.get(f'{base_url}/api/tasks')
+
+
+def mass_login(session, base_url, i):
+    """Усі входять одночасно — навантаження на bcrypt."""
+    user = generate_data.username(i)
+    yield 'POST /login', lambda: session.post(
+        f'{base_url}/login', data={'username': user, 'password': generate_data.PASSWORD},
+        allow_redirects=False)
+
+
+def quiz_burst(session, base_url, i):
+    """Клас одночасно отримує й завершує тест."""
+    quiz = {}
+
+    def get_quiz():
+        rv = session.get(f'{base_url}/api/quiz', params={'size': 10})
+        quiz.update(rv.json())
+        return rv
+
+    def submit():
+        answers = [(i + n) % 4 for n in range(len(quiz['questions']))]
+        return session.post(f'{base_url}/submit_test',
+                            json={'attempt': quiz['attempt'], 'answers': answers, 'timeSpent': 300})
+
+    yield 'GET /api/quiz', get_quiz
+    yield 'POST /submit_test', submit
+
+
+def task_writes(session, base_url, i):
+    payload = {'title': f'Нове завдання {i}', 'description': '', 'subject': 'Математика',
+               'due_date': '2025-12-01'}
+    yield 'POST /add_task', lambda: session.post(f'{base_url}/add_task', json=payload)
+
+
+def search(session, base_url, i):
+    """Пошук по власних завданнях і розкладу."""
+    words = ' '.join(generate_data.WORDS[(i + n) % len(generate_data.WORDS)][:5] for n in range(2))
+    yield 'GET /search', lambda: session.get(f'{base_url}/search', params={'q': words})
+
+
+# Назва -> (функція запитів, чи потрібен вхід перед виміром)
+SCENARIOS = {
+    'morning_rush': (morning_rush, True),
+    'mass_login': (mass_login, False),
+    'quiz_burst': (quiz_burst, True),
+    'task_writes': (task_writes, True),
+    'search': (search, True),
+}
+
+
+def percentile(values, p):
+    """Перцентиль методом найближчого рангу; values мають бути відсортовані."""
+    if not values:
+        return None
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'rps': round(count / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if count else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if count else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if count else None,
+    }
+
+
+def run_scenario(base_url, name, clients, iterations, users):
+    requests_for, needs_login = SCENARIOS[name]
+    sessions = [requests.Session() for _ in range(clients)]
+    if needs_login:
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(lambda n: login(sessions[n], base_url, generate_data.username(n % users)),
+                          range(clients)))
+
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients)
+
+    def client(n):
+        session = sessions[n]
+        local = []
+        start_barrier.wait()
+        for iteration in range(iterations):
+            index = (n + iteration * clients) % users
+            for label, send in requests_for(session, base_url, index):
+                started = time.perf_counter()
+                try:
+                    ok = send().status_code < 400
+                except requests.RequestException:
+                    ok = False
+                local.append((label, time.perf_counter() - started, ok))
+        with lock:
+            for label, latency, ok in local:
+                latencies.setdefault(label, []).append(latency)
+                errors[label] = errors.get(label, 0) + (not ok)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - started
+
+    for session in sessions:
+        session.close()
+    routes = {label: summarize(values, errors[label], elapsed) for label, values in latencies.items()}
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'clients': clients,
+        'iterations': iterations,
+        'elapsed_s': round(elapsed, 3),
+        'total': summarize(all_latencies, sum(errors.values()), elapsed),
+        'routes': routes,
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """Повертає список регресій: p95 зріс або пропускна здатність впала більше ніж на tolerance."""
+    regressions = []
+    for scenario, result in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(scenario)
+        if base is None:
+            continue
+        for route, stats in result['routes'].items():
+            base_stats = base['routes'].get(route)
+            if base_stats is None:
+                continue
+            if base_stats['p95_ms'] and stats['p95_ms'] > base_stats['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{scenario} {route}: p95 {base_stats['p95_ms']} -> {stats['p95_ms']} мс")
+            if base_stats['rps'] and stats['rps'] < base_stats['rps'] * (1 - tolerance):
+                regressions.append(f"{scenario} {route}: {base_stats['rps']} -> {stats['rps']} запитів/с")
+            if stats['errors'] > base_stats['errors']:
+                regressions.append(f"{scenario} {route}: помилок {base_stats['errors']} -> {stats['errors']}")
+    return regressions
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, port, bcrypt_rounds):
+    # Усі віртуальні користувачі приходять з одного IP — ліміти спотворили б заміри
+    env = dict(os.environ, PYTHONPATH=ROOT, BCRYPT_ROUNDS=str(bcrypt_rounds), RATE_LIMIT_ENABLED='0')
+    # Сервер працює в каталозі з згенерованою базою (school_schedule.db)
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER_CODE.format(port=port)],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Сервер завершився під час запуску')
+        try:
+            requests.get(f'{base_url}/login', timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Сервер не запустився за 30 с')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Адреса вже запущеного сервера (без генерації даних)')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--bcrypt-rounds', type=int, default=10)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Можна вказати кілька разів; за замовчуванням — усі')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='JSON попереднього запуску для порівняння')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    process = None
+    workdir = None
+    base_url = args.url
+    if base_url is None:
+        workdir = tempfile.TemporaryDirectory()
+        print('Генерація даних...')
+        generate_data.generate(os.path.join(workdir.name, 'school_schedule.db'),
+                               users=args.users, bcrypt_rounds=args.bcrypt_rounds)
+        process, base_url = start_server(workdir.name, free_port(), args.bcrypt_rounds)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'users': args.users,
+        'scenarios': {},
+    }
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            print(f'Сценарій {name}...')
+            result = run_scenario(base_url, name, args.clients, args.iterations, args.users)
+            report['scenarios'][name] = result
+            total = result['total']
+            print(f"  {total['rps']} запитів/с, p50 {total['p50_ms']} мс, "
+                  f"p95 {total['p95_ms']} мс, p99 {total['p99_ms']} мс, помилок {total['errors']}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        if workdir is not None:
+            workdir.cleanup()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'Результати збережено в {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'РЕГРЕСІЯ: {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Вимірювання повнотекстового пошуку (FTS5) проти LIKE на великій базі.
+
+Генерує базу (за замовчуванням 1 000 000 завдань) і порівнює затримки
+fulltext.search_* із запитами LIKE '%...%' для тих самих слів:
+
+    python benchmarks/search.py /tmp/bench/search.db --tasks 1000000
+    python benchmarks/search.py /tmp/bench/search.db --reuse   # без повторної генерації
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fulltext
+import generate_data
+from run import percentile
+
+TASKS_PER_USER = 20
+
+
+def measure(run, repeats):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+    }
+
+
+def like_tasks(conn, words, limit, user_id=None):
+    where = ' AND '.join('(title LIKE ? OR description LIKE ? OR subject LIKE ?)' for _ in words)
+    params = [f'%{word}%' for word in words for _ in range(3)]
+    if user_id is not None:
+        where = f'user_id = ? AND {where}'
+        params.insert(0, user_id)
+    return conn.execute(f'SELECT id FROM tasks WHERE {where} LIMIT ?', params + [limit]).fetchall()
+
+
+def like_lessons(conn, words, limit):
+    where = ' AND '.join('(subject LIKE ? OR teacher LIKE ? OR classroom LIKE ?)' for _ in words)
+    params = [f'%{word}%' for word in words for _ in range(3)]
+    return conn.execute(f'SELECT id FROM lessons WHERE {where} LIMIT ?', params + [limit]).fetchall()
+
+
+def run_benchmark(path, repeats=50, limit=20, seed=7):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'student'")]
+    queries = [
+        ('tasks: власні, 1 слово', lambda words: fulltext.search_tasks(
+            conn, fulltext.parse_query(words), limit, user_id=rng.choice(user_ids)),
+         lambda words: like_tasks(conn, words.split(), limit, user_id=rng.choice(user_ids)), 'фотосинт'),
+        ('tasks: власні, 2 слова', lambda words: fulltext.search_tasks(
+            conn, fulltext.parse_query(words), limit, user_id=rng.choice(user_ids)),
+         lambda words: like_tasks(conn, words.split(), limit, user_id=rng.choice(user_ids)), 'козацтво карт'),
+        ('tasks: усі (адмін), рідкісне поєднання', lambda words: fulltext.search_tasks(
+            conn, fulltext.parse_query(words), limit),
+         lambda words: like_tasks(conn, words.split(), limit), 'фотосинтез гетьманщина алгоритм'),
+        ('lessons: вчитель і предмет', lambda words: fulltext.search_lessons(
+            conn, fulltext.parse_query(words), limit),
+         lambda words: like_lessons(conn, words.split(), limit), 'Вчитель 7 Фізика'),
+    ]
+    report = {}
+    for name, fts, like, words in queries:
+        report[name] = {'fts5': measure(lambda: fts(words), repeats), 'like': measure(lambda: like(words), repeats)}
+
+    # Ціна тригерів: вставка завдань разом з оновленням індексу
+    started = time.perf_counter()
+    conn.executemany(
+        'INSERT INTO tasks (title, description, subject, user_id) VALUES (?, ?, ?, ?)',
+        (('Нове завдання', ' '.join(rng.choices(generate_data.WORDS, k=10)), 'Фізика', rng.choice(user_ids))
+         for _ in range(1000))
+    )
+    conn.commit()
+    report['insert_1000_tasks_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    report['tasks'] = conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+    conn.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--tasks', type=int, default=1000000)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--reuse', action='store_true', help='Не генерувати базу, якщо файл уже є')
+    args = parser.parse_args()
+
+    if not (args.reuse and os.path.exists(args.path)):
+        os.makedirs(os.path.dirname(os.path.abspath(args.path)), exist_ok=True)
+        started = time.perf_counter()
+        counts = generate_data.generate(args.path, users=max(args.tasks // TASKS_PER_USER, 1),
+                                        tasks_per_user=TASKS_PER_USER, results_per_user=0, bcrypt_rounds=4)
+        print(f"Створено: {counts} за {time.perf_counter() - started:.1f} с")
+    print(json.dumps(run_benchmark(args.path, repeats=args.repeats), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
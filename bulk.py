@@ -0,0 +1,249 @@
+"""Масовий імпорт та потоковий експорт уроків, завдань, користувачів і запитань тестів."""
+import csv
+import io
+import json
+import re
+from datetime import date
+
+import db
+from conflicts import IntervalIndex
+from schedule_cache import WEEKDAYS
+
+TIME_RE = re.compile(r'^\d{1,2}:\d{2}$')
+ROLES = ('student', 'teacher', 'admin')
+
+# Поля, що приймаються при імпорті, та колонки експорту
+ENTITIES = {
+    'lessons': {
+        'required': ('subject', 'teacher', 'classroom', 'day_of_week', 'time_start', 'time_end'),
+        'optional': (),
+        'export': ('id', 'subject', 'teacher', 'classroom', 'day_of_week', 'time_start', 'time_end'),
+    },
+    'tasks': {
+        'required': ('title', 'subject', 'user_id'),
+        'optional': ('description', 'due_date'),
+        'export': ('id', 'title', 'description', 'subject', 'due_date', 'completed', 'user_id'),
+    },
+    'users': {
+        'required': ('username', 'email', 'password'),
+        'optional': ('role',),
+        'export': ('id', 'username', 'email', 'role', 'created_at'),
+    },
+    # options — JSON-масив або варіанти через «|»; correct — номер правильного з нуля
+    'questions': {
+        'required': ('subject', 'question', 'options', 'correct'),
+        'optional': (),
+        'export': ('id', 'subject', 'question', 'options', 'correct'),
+    },
+}
+
+
+def parse_rows(payload, fmt):
+    """Розбирає CSV або JSON (список об'єктів) у список словників."""
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8-sig')
+    if fmt == 'json':
+        rows = json.loads(payload)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('Очікується JSON-масив об\'єктів')
+        return rows
+    return list(csv.DictReader(io.StringIO(payload)))
+
+
+def minutes(value):
+    hours, mins = value.split(':')
+    return int(hours) * 60 + int(mins)
+
+
+def _validate_lesson(row, errors):
+    if row['day_of_week'] not in WEEKDAYS:
+        errors.append(('day_of_week', 'Невідомий день тижня'))
+    for field in ('time_start', 'time_end'):
+        if not TIME_RE.match(row[field]):
+            errors.append((field, 'Час має бути у форматі ГГ:ХХ'))
+    if not errors and minutes(row['time_start']) >= minutes(row['time_end']):
+        errors.append(('time_end', 'Урок має закінчуватися пізніше, ніж починається'))
+
+
+def _validate_task(row, errors):
+    try:
+        row['user_id'] = int(row['user_id'])
+    except (TypeError, ValueError):
+        errors.append(('user_id', 'Має бути цілим числом'))
+    if row.get('due_date'):
+        try:
+            date.fromisoformat(row['due_date'])
+        except ValueError:
+            errors.append(('due_date', 'Дата має бути у форматі РРРР-ММ-ДД'))
+    else:
+        row['due_date'] = None
+
+
+def _validate_user(row, errors):
+    row['role'] = row.get('role') or 'student'
+    if row['role'] not in ROLES:
+        errors.append(('role', 'Невідома роль'))
+    if '@' not in row['email']:
+        errors.append(('email', 'Некоректний email'))
+
+
+def _validate_question(row, errors):
+    try:
+        options = json.loads(row['options'])
+    except ValueError:
+        options = row['options'].split('|')
+    if not isinstance(options, list) or len(options) < 2:
+        errors.append(('options', 'Потрібно щонайменше два варіанти'))
+        return
+    options = [str(option).strip() for option in options]
+    row['options'] = json.dumps(options, ensure_ascii=False)
+    try:
+        row['correct'] = int(row['correct'])
+    except ValueError:
+        errors.append(('correct', 'Має бути цілим числом'))
+        return
+    if not 0 <= row['correct'] < len(options):
+        errors.append(('correct', 'Немає варіанта з таким номером'))
+
+
+VALIDATORS = {
+    'lessons': _validate_lesson,
+    'tasks': _validate_task,
+    'users': _validate_user,
+    'questions': _validate_question,
+}
+
+
+def validate(entity, rows):
+    """Перевіряє всю пачку; повертає (чисті рядки, помилки по рядках)."""
+    spec = ENTITIES[entity]
+    clean = []
+    errors = []
+    seen = {}
+    for number, raw in enumerate(rows, start=1):
+        row = {}
+        row_errors = []
+        for field in spec['required']:
+            value = raw.get(field)
+            value = str(value).strip() if value is not None else None
+            if value in (None, ''):
+                row_errors.append((field, 'Обов\'язкове поле'))
+            row[field] = value
+        for field in spec['optional']:
+            value = raw.get(field)
+            row[field] = str(value).strip() if value is not None else None
+
+        if not row_errors:
+            VALIDATORS[entity](row, row_errors)
+
+        if entity == 'users' and not row_errors:
+            for field in ('username', 'email'):
+                key = (field, row[field])
+                if key in seen:
+                    row_errors.append((field, f'Дублікат рядка {seen[key]}'))
+                seen[key] = number
+
+        for field, message in row_errors:
+            errors.append({'row': number, 'field': field, 'message': message})
+        clean.append(row)
+    return clean, errors
+
+
+def _existing_users(conn, rows):
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        if conn.execute(
+            'SELECT 1 FROM users WHERE username = ? OR email = ?', (row['username'], row['email'])
+        ).fetchone():
+            errors.append({'row': number, 'field': 'username', 'message': 'Користувач вже існує'})
+    return errors
+
+
+def _lesson_conflicts(schedule_engine, rows):
+    """Накладки уроків пачки з розкладом і між собою (ті самі правила, що й у add_lesson)."""
+    errors = []
+    batch = {'classroom': IntervalIndex(), 'teacher': IntervalIndex()}
+    labels = {'classroom': 'Кабінет', 'teacher': 'Вчитель'}
+    for number, row in enumerate(rows, start=1):
+        weekday = WEEKDAYS.index(row['day_of_week']) + 1
+        start, end = minutes(row['time_start']), minutes(row['time_end'])
+        for conflict in schedule_engine.check(row['teacher'], row['classroom'], weekday, start, end):
+            resource = conflict['resource']
+            errors.append({'row': number, 'field': resource,
+                           'message': f"{labels[resource]} зайнятий: урок #{conflict['lesson_id']}"})
+        for resource, index in batch.items():
+            key = (row[resource], weekday)
+            for other in index.find(key, start, end):
+                errors.append({'row': number, 'field': resource,
+                               'message': f'{labels[resource]} зайнятий: рядок {other}'})
+            index.add(key, start, end, number)
+    return errors
+
+
+def import_rows(conn, entity, rows, hash_passwords=None, schedule_engine=None, created_by=None):
+    """Імпортує пачку в одній транзакції або не імпортує нічого.
+
+    hash_passwords — функція, що хешує список паролів за раз (пул bcrypt);
+    schedule_engine — ScheduleEngine для перевірки накладок уроків.
+    Повертає (кількість вставлених рядків, список помилок).
+    """
+    clean, errors = validate(entity, rows)
+    if entity == 'users' and not errors:
+        errors = _existing_users(conn, clean)
+    if entity == 'lessons' and not errors and schedule_engine is not None:
+        # Блокування запису до вставки, щоб паралельний запит не зайняв ті самі слоти
+        conn.execute('BEGIN IMMEDIATE')
+        schedule_engine.ensure_current(conn)
+        errors = _lesson_conflicts(schedule_engine, clean)
+        if errors:
+            conn.rollback()
+    if errors:
+        return 0, errors
+
+    if entity == 'lessons':
+        for row in clean:
+            row['created_by'] = created_by
+        sql = ('INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end, created_by) '
+               'VALUES (:subject, :teacher, :classroom, :day_of_week, :time_start, :time_end, :created_by)')
+    elif entity == 'tasks':
+        sql = ('INSERT INTO tasks (title, description, subject, due_date, user_id) '
+               'VALUES (:title, :description, :subject, :due_date, :user_id)')
+    elif entity == 'questions':
+        sql = ('INSERT INTO questions (subject, question, options, correct) '
+               'VALUES (:subject, :question, :options, :correct)')
+    else:
+        hashes = hash_passwords([row.pop('password') for row in clean])
+        for row, password_hash in zip(clean, hashes):
+            row['password_hash'] = password_hash
+        sql = ('INSERT INTO users (username, email, password_hash, role) '
+               'VALUES (:username, :email, :password_hash, :role)')
+
+    with conn:
+        conn.executemany(sql, clean)
+        if entity == 'lessons':
+            db.bump_version(conn, 'lessons')
+    return len(clean), []
+
+
+def export_rows(pool, entity, fmt='csv'):
+    """Генератор рядків експорту, що читає курсор поступово, без fetchall()."""
+    columns = ENTITIES[entity]['export']
+    conn = pool.acquire()
+    try:
+        cursor = conn.execute(f'SELECT {", ".join(columns)} FROM {entity} ORDER BY id')
+        if fmt == 'json':
+            for row in cursor:
+                yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+        else:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for row in cursor:
+                writer.writerow(row)
+                if buffer.tell() > 8192:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+    finally:
+        pool.release(conn)
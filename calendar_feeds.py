@@ -0,0 +1,223 @@
+"""Календарні підписки (.ics) на розклад і завдання.
+
+Адреса підписки містить підписаний токен замість cookie сесії:
+
+    /calendar/<токен>.ics    # токен користувача: весь розклад і його завдання
+                             # токен класу: уроки класу (lessons.class_name)
+
+ETag складається з версії lessons у data_versions і ревізії завдань
+користувача, тож повторне опитування календарем без змін коштує кілька
+індексованих читань і 304. Зміст
+генерується потоково з курсора й кешується для поточних версій.
+"""
+import hashlib
+from datetime import date, datetime, timedelta
+
+from itsdangerous import BadSignature, URLSafeSerializer
+
+import db
+from fragments import FragmentCache
+
+PRODID = '-//Шкільний розклад//UK'
+BYDAY = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+# Правила переходу на літній час для TZID=Europe/Kyiv
+VTIMEZONE = (
+    'BEGIN:VTIMEZONE',
+    'TZID:Europe/Kyiv',
+    'BEGIN:STANDARD',
+    'DTSTART:19701025T040000',
+    'RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU',
+    'TZOFFSETFROM:+0300',
+    'TZOFFSETTO:+0200',
+    'TZNAME:EET',
+    'END:STANDARD',
+    'BEGIN:DAYLIGHT',
+    'DTSTART:19700329T030000',
+    'RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU',
+    'TZOFFSETFROM:+0200',
+    'TZOFFSETTO:+0300',
+    'TZNAME:EEST',
+    'END:DAYLIGHT',
+    'END:VTIMEZONE',
+)
+
+
+def _serializer(secret_key):
+    return URLSafeSerializer(secret_key, salt='calendar-feed')
+
+
+def make_token(secret_key, kind, value):
+    """Токен підписки; kind — 'user' (value = id) або 'class' (value = назва класу)."""
+    return _serializer(secret_key).dumps([kind, value])
+
+
+def load_token(secret_key, token):
+    """(kind, value) з токена або None для підробленого чи пошкодженого."""
+    try:
+        kind, value = _serializer(secret_key).loads(token)
+    except (BadSignature, ValueError, TypeError):
+        return None
+    if kind not in ('user', 'class'):
+        return None
+    return kind, value
+
+
+def user_tasks_revision(conn, user_id):
+    """Остання ревізія завдань користувача (разом із видаленими); змінюється лише з його завданнями."""
+    return conn.execute('''
+        SELECT MAX(COALESCE((SELECT MAX(revision) FROM tasks WHERE user_id = :user), 0),
+                   COALESCE((SELECT MAX(revision) FROM task_tombstones WHERE user_id = :user), 0))
+    ''', {'user': user_id}).fetchone()[0]
+
+
+def feed_versions(conn, scope):
+    """Версії даних, від яких залежить стрічка, і час останньої зміни.
+
+    Для стрічки користувача версія завдань — його власна ревізія, тож зміни
+    чужих завдань не скидають ETag. Час беремо із загальної версії tasks:
+    він не раніший за останню зміну завдань користувача.
+    """
+    lessons_version, updated_at = db.get_version(conn, 'lessons')
+    if scope[0] != 'user':
+        return (lessons_version,), updated_at
+    _, tasks_updated_at = db.get_version(conn, 'tasks')
+    return (lessons_version, user_tasks_revision(conn, scope[1])), max(updated_at, tasks_updated_at)
+
+
+def feed_etag(scope, versions):
+    # Назва класу може бути кирилицею, а ETag — лише ASCII
+    digest = hashlib.sha1(repr(scope).encode('utf-8')).hexdigest()[:12]
+    return f"ics-{digest}-{'-'.join(map(str, versions))}"
+
+
+def escape(text):
+    return (str(text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Розбиває рядок на частини до 75 байтів (RFC 5545, 3.1), не розрізаючи символи UTF-8."""
+    if len(line.encode('utf-8')) <= 75:
+        return line + '\r\n'
+    parts = []
+    current = ''
+    size = 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _local_time(day, minute):
+    # Час уроку може бути записаний як 'H:MM', тому беремо хвилини, а не рядок
+    return f'{day:%Y%m%d}T{minute // 60:02d}{minute % 60:02d}00'
+
+
+def _lesson_event(lesson, term_start, stamp):
+    weekday = lesson['weekday']
+    day = term_start + timedelta(days=(weekday - 1 - term_start.weekday()) % 7)
+    start = _local_time(day, lesson['start_minute'])
+    end = _local_time(day, lesson['end_minute'])
+    description = f"Вчитель: {lesson['teacher']}"
+    if lesson['class_name']:
+        description += f"\nКлас: {lesson['class_name']}"
+    return (
+        'BEGIN:VEVENT',
+        f"UID:lesson-{lesson['id']}@school-schedule",
+        f'DTSTAMP:{stamp}',
+        f'DTSTART;TZID=Europe/Kyiv:{start}',
+        f'DTEND;TZID=Europe/Kyiv:{end}',
+        f'RRULE:FREQ=WEEKLY;BYDAY={BYDAY[weekday - 1]}',
+        f"SUMMARY:{escape(lesson['subject'])}",
+        f"LOCATION:{escape('Кабінет ' + lesson['classroom'])}",
+        f'DESCRIPTION:{escape(description)}',
+        'END:VEVENT',
+    )
+
+
+def _task_event(task, stamp):
+    due = date.fromisoformat(task['due_date'])
+    summary = f"{'✅' if task['completed'] else '📝'} {task['title']}"
+    description = task['subject'] + (f"\n{task['description']}" if task['description'] else '')
+    return (
+        'BEGIN:VEVENT',
+        f"UID:task-{task['id']}@school-schedule",
+        f'DTSTAMP:{stamp}',
+        f'DTSTART;VALUE=DATE:{due:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{due + timedelta(days=1):%Y%m%d}',
+        f'SUMMARY:{escape(summary)}',
+        f'DESCRIPTION:{escape(description)}',
+        'TRANSP:TRANSPARENT',
+        'END:VEVENT',
+    )
+
+
+def render_feed(pool, scope, updated_at, term_start):
+    """Генератор частин .ics, що читає уроки й завдання курсором.
+
+    term_start — дата (YYYY-MM-DD) понеділка, з якого повторюються уроки.
+    """
+    kind, value = scope
+    term_start = date.fromisoformat(term_start)
+    stamp = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').strftime('%Y%m%dT%H%M%SZ')
+    name = f'Розклад {value}' if kind == 'class' else 'Шкільний розклад'
+    conn = pool.acquire()
+    try:
+        lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+                 'METHOD:PUBLISH', f'X-WR-CALNAME:{escape(name)}', 'X-WR-TIMEZONE:Europe/Kyiv']
+        lines.extend(VTIMEZONE)
+        yield ''.join(map(fold, lines))
+
+        sql = ('SELECT id, subject, teacher, classroom, class_name, weekday, start_minute, end_minute '
+               'FROM lessons WHERE weekday IS NOT NULL')
+        params = ()
+        if kind == 'class':
+            sql += ' AND class_name = ?'
+            params = (value,)
+        chunk = []
+        for lesson in conn.execute(sql + ' ORDER BY id', params):
+            chunk.extend(map(fold, _lesson_event(lesson, term_start, stamp)))
+            if len(chunk) > 200:
+                yield ''.join(chunk)
+                chunk = []
+
+        if kind == 'user':
+            for task in conn.execute(
+                'SELECT id, title, description, subject, due_date, completed FROM tasks '
+                'WHERE user_id = ? AND due_date IS NOT NULL ORDER BY due_date', (value,)
+            ):
+                try:
+                    chunk.extend(map(fold, _task_event(task, stamp)))
+                except ValueError:
+                    continue
+                if len(chunk) > 200:
+                    yield ''.join(chunk)
+                    chunk = []
+        chunk.append('END:VCALENDAR\r\n')
+        yield ''.join(chunk)
+    finally:
+        pool.release(conn)
+
+
+def cached(cache, key, chunks):
+    """Віддає частини далі й кладе повний текст у кеш, якщо генерація дійшла до кінця."""
+    parts = []
+    for part in chunks:
+        parts.append(part)
+        yield part
+    cache.set(key, ''.join(parts))
+
+
+def init_app(app):
+    app.config.setdefault('CALENDAR_TERM_START', '2025-09-01')
+    app.config.setdefault('CALENDAR_CACHE_SIZE', 200)
+    app.config.setdefault('CALENDAR_CACHE_TTL', 3600)
+    app.extensions['calendar_cache'] = FragmentCache(
+        app.config['CALENDAR_CACHE_SIZE'], app.config['CALENDAR_CACHE_TTL']
+    )
@@ -0,0 +1,139 @@
+"""Налаштування додатку; значення за замовчуванням можна перевизначити змінними оточення."""
+import os
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+
+    # Шлях до файлу SQLite або URI виду 'file:...?mode=memory&cache=shared'
+    DATABASE = os.environ.get('DATABASE', 'school_schedule.db')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = 5.0
+    DB_HEALTH_CHECK_INTERVAL = 30.0
+    # None - звичайне або інструментоване з'єднання залежно від METRICS_ENABLED
+    DB_CONNECTION_FACTORY = None
+
+    # Профілювання повільних запитів: PROFILE_MODE = 'cprofile' або 'stacks'
+    METRICS_ENABLED = True
+    PROFILE_MODE = os.environ.get('PROFILE_MODE')
+    PROFILE_SAMPLE_RATE = 0.1
+    PROFILE_THRESHOLD_MS = 500
+    PROFILE_DIR = 'profiles'
+
+    WEATHER_API_KEY = os.environ.get('WEATHER_API_KEY', 'your-api-key-here')
+    WEATHER_API_URL = 'http://api.openweathermap.org/data/2.5/weather'
+    WEATHER_CACHE_TTL = 600
+
+    # None - підібрати кількість раундів під BCRYPT_TARGET_MS при старті
+    # (gunicorn підбирає один раз у майстрі й передає воркерам через BCRYPT_ROUNDS)
+    BCRYPT_ROUNDS = int(os.environ['BCRYPT_ROUNDS']) if 'BCRYPT_ROUNDS' in os.environ else None
+    BCRYPT_TARGET_MS = 250
+    PASSWORD_WORKERS = int(os.environ['PASSWORD_WORKERS']) if 'PASSWORD_WORKERS' in os.environ else None
+    # Окремий пул для імпорту пачок; None - половина PASSWORD_WORKERS
+    PASSWORD_BULK_WORKERS = None
+    PASSWORD_QUEUE_SIZE = None
+    PASSWORD_EXECUTOR = 'process'
+
+    # Без SMTP_HOST листи лише друкуються в консоль
+    SMTP_HOST = os.environ.get('SMTP_HOST')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 25))
+    SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
+    SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+    SMTP_USE_TLS = False
+    MAIL_BATCH_SIZE = 20
+    MAIL_CONCURRENCY = 1
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_AUTOSTART = True
+
+    # Кеш фрагментів шаблонів ({% cache %}): кількість записів і час життя в секундах
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_SIZE = 1000
+    FRAGMENT_CACHE_TTL = 300
+
+    # Зібрані статичні файли (flask build-assets) у static/<ASSETS_OUTPUT>, кешуються браузером на рік
+    ASSETS_OUTPUT = 'dist'
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+
+    # Календарні підписки (.ics): понеділок, від якого повторюються уроки, і кеш готових стрічок
+    CALENDAR_TERM_START = '2025-09-01'
+    CALENDAR_CACHE_SIZE = 200
+    CALENDAR_CACHE_TTL = 3600
+
+    # Канал подій /events (SSE). Без EVENTS_STORAGE події розходяться лише в межах
+    # воркера, інакше — через спільний файл SQLite, який воркери опитують.
+    # EVENTS_MAX_STREAMS — відкритих потоків на воркер (gunicorn.conf.py задає його
+    # від worker_connections для gevent або від threads для gthread)
+    EVENTS_ENABLED = os.environ.get('EVENTS_ENABLED', '1') != '0'
+    EVENTS_STORAGE = os.environ.get('EVENTS_STORAGE')
+    EVENTS_POLL_INTERVAL = 0.5
+    EVENTS_HISTORY = 1000
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 100))
+    EVENTS_HEARTBEAT = 15
+    EVENTS_STREAM_TIMEOUT = 300
+
+    # Нагадування про терміни завдань: о REMINDER_HOUR за REMINDER_DAYS_BEFORE днів до терміну.
+    # Купа в пам'яті тримає лише найближчі REMINDER_HORIZON_DAYS днів і перечитується щогодини.
+    # REMINDER_SENDER: 'mail' — лист через email_outbox, 'local' — лише в пам'яті
+    REMINDERS_ENABLED = os.environ.get('REMINDERS_ENABLED', '1') != '0'
+    REMINDER_SENDER = os.environ.get('REMINDER_SENDER', 'mail')
+    REMINDER_DAYS_BEFORE = 1
+    REMINDER_HOUR = 18
+    REMINDER_HORIZON_DAYS = 7
+    REMINDER_REFRESH_INTERVAL = 3600
+
+    # Генератор розкладу: спроби з різними зернами та процеси для паралельних спроб
+    TIMETABLE_RESTARTS = 8
+    TIMETABLE_WORKERS = int(os.environ.get('TIMETABLE_WORKERS', 1))
+    # Загальний час на складання (секунди); межа кроків однієї спроби (None - подвоюється з кожною спробою)
+    TIMETABLE_TIMEOUT = 30
+    TIMETABLE_MAX_STEPS = None
+
+    # Підготовлені набори тестів: скільки різних перемішувань на предмет і розмір
+    QUIZ_SETS_PER_QUIZ = 32
+    QUIZ_MAX_SIZE = 50
+    # Скільки секунд дійсний токен спроби тесту
+    QUIZ_ATTEMPT_TTL = 3 * 3600
+    # Використані спроби: без QUIZ_ATTEMPTS_STORAGE — у пам'яті воркера, інакше — в
+    # окремому файлі SQLite, спільному для воркерів (не в основній базі)
+    QUIZ_ATTEMPTS_STORAGE = os.environ.get('QUIZ_ATTEMPTS_STORAGE')
+
+    # Обмеження частоти запитів: ендпоінт -> {область: 'N/second|minute|hour|day'}.
+    # Області: ip, user (сесія), username (поле форми). Без RATE_LIMIT_STORAGE
+    # лічильники живуть у пам'яті воркера, інакше — у спільному файлі SQLite
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE')
+    RATE_LIMIT_MAX_KEYS = 10000
+    # Клас за одним NAT має спільний IP, тому ліміти по IP щедрі
+    RATE_LIMITS = {
+        'main.login': {'ip': '60/minute', 'username': '5/minute'},
+        'main.register': {'ip': '60/hour'},
+        'main.submit_test': {'ip': '300/minute', 'user': '10/minute'},
+    }
+
+    # Результати тестів пишуться пачками: раз на RESULTS_FLUSH_INTERVAL с або по RESULTS_BATCH_SIZE
+    RESULTS_BATCH_SIZE = 100
+    RESULTS_FLUSH_INTERVAL = 0.2
+    RESULTS_MAX_PENDING = 10000
+
+
+class TestingConfig(Config):
+    TESTING = True
+    # Спільна база в пам'яті: схема створюється один раз на сесію тестів
+    DATABASE = 'file:school_schedule_test?mode=memory&cache=shared'
+    DB_POOL_SIZE = 1
+    BCRYPT_ROUNDS = 5
+    PASSWORD_EXECUTOR = 'thread'
+    PROFILE_MODE = None
+    MAIL_AUTOSTART = False
+    REMINDERS_ENABLED = False
+    REMINDER_SENDER = 'local'
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_STORAGE = None
+    QUIZ_ATTEMPTS_STORAGE = None
+    EVENTS_STORAGE = None
+    # Потік подій у тестах закривається сам, щоб відповідь можна було дочитати
+    EVENTS_HEARTBEAT = 0.05
+    EVENTS_STREAM_TIMEOUT = 0.3
+    # Результат записується одразу в потоці запиту
+    RESULTS_MAX_PENDING = 1
+    RESULTS_FLUSH_INTERVAL = 3600
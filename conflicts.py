@@ -0,0 +1,140 @@
+"""Перевірка накладок у розкладі: кабінет або вчитель зайняті в той самий час."""
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+import db
+
+
+class IntervalIndex:
+    """Відсортовані інтервали [start, end) для кожного ключа (ресурс, день).
+
+    Поки інтервали одного ключа не перетинаються, перевірка нового
+    інтервалу — це бінарний пошук і перегляд попереднього сусіда та
+    наступних інтервалів, що починаються до кінця нового (довгий урок може
+    накрити кілька). Якщо в даних уже є накладки (старий розклад), для
+    цього ключа виконується лінійний перегляд, щоб не пропустити конфлікт.
+    """
+
+    def __init__(self):
+        self._items = defaultdict(list)
+        self._overlapping = set()
+
+    def find(self, key, start, end, exclude=None):
+        items = self._items.get(key)
+        if not items:
+            return []
+        if key in self._overlapping:
+            found = [item_id for item_start, item_end, item_id in items
+                     if item_start < end and start < item_end]
+        else:
+            pos = bisect_left(items, (start,))
+            found = []
+            # Інтервали не перетинаються, тож раніше за start може початися лише один із тих, що накладаються
+            if pos > 0 and start < items[pos - 1][1]:
+                found.append(items[pos - 1][2])
+            while pos < len(items) and items[pos][0] < end:
+                found.append(items[pos][2])
+                pos += 1
+        return [item_id for item_id in found if item_id != exclude]
+
+    def add(self, key, start, end, item_id):
+        if self.find(key, start, end, exclude=item_id):
+            self._overlapping.add(key)
+        insort(self._items[key], (start, end, item_id))
+
+    def remove(self, key, item_id):
+        items = self._items.get(key, [])
+        items[:] = [item for item in items if item[2] != item_id]
+
+
+class ScheduleEngine:
+    """Індекси зайнятості кабінетів і вчителів, синхронізовані з таблицею lessons."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self._rooms = IntervalIndex()
+        self._teachers = IntervalIndex()
+        self._lessons = {}
+
+    def _load(self, conn, version):
+        self._rooms = IntervalIndex()
+        self._teachers = IntervalIndex()
+        self._lessons = {}
+        for row in conn.execute(
+            'SELECT id, teacher, classroom, weekday, start_minute, end_minute FROM lessons'
+        ):
+            self._add(row['id'], row['teacher'], row['classroom'],
+                      row['weekday'], row['start_minute'], row['end_minute'])
+        self.version = version
+
+    def _add(self, lesson_id, teacher, classroom, weekday, start, end):
+        self._lessons[lesson_id] = (teacher, classroom, weekday, start, end)
+        self._rooms.add((classroom, weekday), start, end, lesson_id)
+        self._teachers.add((teacher, weekday), start, end, lesson_id)
+
+    def ensure_current(self, conn):
+        version, _ = db.get_version(conn, 'lessons')
+        with self._lock:
+            if self.version != version:
+                self._load(conn, version)
+
+    def check(self, teacher, classroom, weekday, start, end, exclude=None):
+        """Список конфліктів для нового уроку; порожній, якщо накладок немає."""
+        with self._lock:
+            conflicts = [
+                {'resource': 'classroom', 'lesson_id': lesson_id}
+                for lesson_id in self._rooms.find((classroom, weekday), start, end, exclude)
+            ]
+            conflicts.extend(
+                {'resource': 'teacher', 'lesson_id': lesson_id}
+                for lesson_id in self._teachers.find((teacher, weekday), start, end, exclude)
+            )
+        return conflicts
+
+    def add(self, lesson_id, teacher, classroom, weekday, start, end, version):
+        """Додає урок після коміту; `version` — нова версія даних lessons."""
+        with self._lock:
+            if self.version == version - 1:
+                self._add(lesson_id, teacher, classroom, weekday, start, end)
+                self.version = version
+            else:
+                self.version = None
+
+    def remove(self, lesson_id, version):
+        with self._lock:
+            lesson = self._lessons.pop(lesson_id, None)
+            if lesson is not None and self.version == version - 1:
+                teacher, classroom, weekday, _, _ = lesson
+                self._rooms.remove((classroom, weekday), lesson_id)
+                self._teachers.remove((teacher, weekday), lesson_id)
+                self.version = version
+            else:
+                self.version = None
+
+
+def validate_timetable(conn):
+    """Перевіряє весь розклад одним проходом і повертає всі пари накладок."""
+    conflicts = []
+    for resource, column in (('classroom', 'classroom'), ('teacher', 'teacher')):
+        active = []
+        current_key = None
+        for row in conn.execute(
+            f'SELECT id, {column} AS owner, weekday, start_minute, end_minute FROM lessons '
+            f'ORDER BY {column}, weekday, start_minute'
+        ):
+            key = (row['owner'], row['weekday'])
+            if key != current_key:
+                current_key = key
+                active = []
+            active = [item for item in active if item[0] > row['start_minute']]
+            for _, other_id in active:
+                conflicts.append({
+                    'resource': resource,
+                    'value': row['owner'],
+                    'weekday': row['weekday'],
+                    'lesson_ids': [other_id, row['id']],
+                })
+            active.append((row['end_minute'], row['id']))
+    return conflicts
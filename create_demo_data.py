@@ -55,15 +55,15 @@ def create_demo_data():
     ]
     
     print("\nСтворення демо розкладу...")
-    for subject, teacher, classroom, day, time_start, time_end in demo_lessons:
-        try:
-            cursor.execute(
-                'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end, created_by) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                (subject, teacher, classroom, day, time_start, time_end, 1)  # створено адміном
-            )
-            print(f"✓ Додано урок: {subject} ({day}, {time_start})")
-        except sqlite3.IntegrityError:
-            print(f"⚠ Урок {subject} в {day} о {time_start} вже існує")
+    cursor.executemany(
+        'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end, created_by) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [lesson + (1,) for lesson in demo_lessons]  # створено адміном
+    )
+    print(f"✓ Додано уроків: {len(demo_lessons)}")
+    
+    cursor.execute(
+        "UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'lessons'"
+    )
     
     demo_tasks = [
         ('Розв\'язати рівняння 15-20', 'Сторінка 45, завдання 15-20', 'Математика', '2025-08-10'),
@@ -77,15 +77,11 @@ def create_demo_data():
     ]
     
     print("\nСтворення демо завдань...")
-    for title, description, subject, due_date in demo_tasks:
-        try:
-            cursor.execute(
-                'INSERT INTO tasks (title, description, subject, due_date, user_id) VALUES (?, ?, ?, ?, ?)',
-                (title, description, subject, due_date, 4)
-            )
-            print(f"✓ Додано завдання: {title}")
-        except sqlite3.IntegrityError:
-            print(f"⚠ Завдання {title} вже існує")
+    cursor.executemany(
+        'INSERT INTO tasks (title, description, subject, due_date, user_id) VALUES (?, ?, ?, ?, ?)',
+        [task + (4,) for task in demo_tasks]
+    )
+    print(f"✓ Додано завдань: {len(demo_tasks)}")
 
     demo_test_results = [
         (4, 'Загальний тест знань', 8, 10),
@@ -96,15 +92,11 @@ def create_demo_data():
     ]
     
     print("\nСтворення демо результатів тестів...")
-    for user_id, test_name, score, total in demo_test_results:
-        try:
-            cursor.execute(
-                'INSERT INTO test_results (user_id, test_name, score, total_questions) VALUES (?, ?, ?, ?)',
-                (user_id, test_name, score, total)
-            )
-            print(f"✓ Додано результат тесту: {test_name} - {score}/{total}")
-        except sqlite3.IntegrityError:
-            print(f"⚠ Результат тесту вже існує")
+    cursor.executemany(
+        'INSERT INTO test_results (user_id, test_name, score, total_questions) VALUES (?, ?, ?, ?)',
+        demo_test_results
+    )
+    print(f"✓ Додано результатів тестів: {len(demo_test_results)}")
     
     conn.commit()
     conn.close()
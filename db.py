@@ -0,0 +1,242 @@
+"""Пул з'єднань SQLite, прив'язаний до контексту Flask-додатку."""
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g
+
+import metrics
+
+# Прагми застосовуються один раз при створенні з'єднання
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),
+    ('mmap_size', 134217728),
+    ('busy_timeout', 5000),
+)
+
+
+class PoolTimeout(Exception):
+    """Усі з'єднання зайняті і жодне не звільнилося за відведений час."""
+
+
+class ConnectionPool:
+    """Обмежений пул з'єднань з прив'язкою до потоків.
+
+    Потік отримує те саме з'єднання, яким користувався минулого разу, якщо
+    воно вільне, тому кеш сторінок SQLite залишається «теплим».
+    """
+
+    def __init__(self, database, size=8, timeout=5.0, health_check_interval=30.0,
+                 pragmas=DEFAULT_PRAGMAS, factory=sqlite3.Connection):
+        self.database = database
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.pragmas = pragmas
+
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._idle = {}
+        self._created = 0
+        self._closed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.health_failures = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                               factory=self.factory, uri=self.database.startswith('file:'))
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._cond:
+            self._created -= 1
+            self.health_failures += 1
+            self._cond.notify()
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _take_idle(self):
+        preferred = getattr(self._local, 'conn', None)
+        if preferred is not None and id(preferred) in self._idle:
+            return preferred, self._idle.pop(id(preferred))[1]
+        _, (conn, last_used) = self._idle.popitem()
+        return conn, last_used
+
+    def _reserve(self, deadline):
+        """Під замком бере вільне з'єднання або резервує місце під нове.
+
+        Повертає (з'єднання, час останнього використання) або (None, None),
+        якщо зарезервовано місце; саме з'єднання відкривається вже без замка.
+        """
+        started = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('Пул з\'єднань закрито')
+
+                if self._idle:
+                    result = self._take_idle()
+                    break
+
+                if self._created < self.size:
+                    self._created += 1
+                    result = None, None
+                    break
+
+                if started is None:
+                    started = time.monotonic()
+                    self.waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    self.wait_time += time.monotonic() - started
+                    raise PoolTimeout('Немає вільних з\'єднань з базою даних')
+
+            if started is not None:
+                self.wait_time += time.monotonic() - started
+            return result
+
+    def acquire(self):
+        # Відкриття файлу, прагми й перевірка здоров'я йдуть поза замком, щоб
+        # повільне з'єднання не затримувало інших, хто бере чи повертає з'єднання
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn, last_used = self._reserve(deadline)
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except sqlite3.Error:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.misses += 1
+                break
+            if self._is_healthy(conn, last_used):
+                with self._cond:
+                    self.hits += 1
+                break
+            self._discard(conn)
+
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            if self._closed:
+                conn.close()
+                return
+            self._idle[id(conn)] = (conn, time.monotonic())
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle.values():
+                conn.close()
+            self._created -= len(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            requests_total = self.hits + self.misses
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / requests_total if requests_total else 0.0,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 6),
+                'health_failures': self.health_failures,
+            }
+
+
+_pool_lock = threading.Lock()
+
+
+def get_pool(app=None):
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('db_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('db_pool')
+            if pool is None:
+                factory = app.config.get('DB_CONNECTION_FACTORY')
+                if factory is None:
+                    factory = (metrics.InstrumentedConnection if app.config.get('METRICS_ENABLED', True)
+                               else sqlite3.Connection)
+                pool = ConnectionPool(
+                    app.config['DATABASE'],
+                    size=app.config.get('DB_POOL_SIZE', 8),
+                    timeout=app.config.get('DB_POOL_TIMEOUT', 5.0),
+                    health_check_interval=app.config.get('DB_HEALTH_CHECK_INTERVAL', 30.0),
+                    factory=factory,
+                )
+                app.extensions['db_pool'] = pool
+    return pool
+
+
+def get_db():
+    """З'єднання для поточного контексту; повертається в пул автоматично."""
+    if 'db' not in g:
+        with metrics.span('db.acquire'):
+            g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def init_app(app):
+    app.config.setdefault('DATABASE', 'school_schedule.db')
+    app.teardown_appcontext(close_db)
+
+
+def get_version(conn, name):
+    """Повертає (версія, час зміни) набору даних з таблиці data_versions."""
+    row = conn.execute(
+        'SELECT version, updated_at FROM data_versions WHERE name = ?', (name,)
+    ).fetchone()
+    if row is None:
+        return 0, '1970-01-01 00:00:00'
+    return row[0], row[1]
+
+
+def bump_version(conn, name):
+    """Збільшує версію набору даних; викликається в транзакції, що змінює дані."""
+    return conn.execute(
+        'INSERT INTO data_versions (name, version) VALUES (?, 1) '
+        'ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP '
+        'RETURNING version',
+        (name,)
+    ).fetchone()[0]
@@ -0,0 +1,286 @@
+"""Канал подій (Server-Sent Events) про зміни розкладу й завдань.
+
+    GET /events    # text/event-stream: канали 'lessons' і 'tasks:<user_id>' користувача
+
+Обробники після commit викликають publish(channel, data). Подія отримує
+наскрізний номер і потрапляє в кільцевий буфер хаба. Відкриті потоки чекають
+на спільній Condition: підписник — це лише номер останньої відданої йому
+події, без власної черги, тож тисяча простих з'єднань не коштує тисячі черг.
+Клієнт, що перепідключився з Last-Event-ID, отримує пропущене з буфера; якщо
+буфер ці події вже витіснив — подію reset, після якої дані читаються заново.
+
+Хаб побудований на примітивах threading. У продакшні gunicorn запускає
+воркери gevent, які підміняють threading до завантаження додатку, тож
+очікування в wait() — кооперативне: відкритий потік — це greenlet, а не
+потік ОС, і воркер тримає тисячі таких з'єднань.
+
+Як події потрапляють у хаби, вирішує бекенд розсилки:
+LocalBackend — одразу в хаб свого процесу (тести, один воркер);
+SQLiteBackend — через таблицю в окремому файлі (EVENTS_STORAGE), яку кожен
+воркер дочитує фоновим потоком; номери подій тоді спільні для всіх воркерів.
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import deque, namedtuple
+
+from flask import current_app
+
+Event = namedtuple('Event', 'id channel data')
+
+
+class LocalBackend:
+    """Розсилка в межах процесу: номери подій — лічильник у пам'яті."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hub = None
+
+    def start(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, data):
+        # Під блокуванням, щоб події потрапляли в хаб у порядку номерів
+        with self._lock:
+            self._next_id += 1
+            self.hub.deliver(self._next_id, channel, data)
+
+    def stop(self):
+        pass
+
+
+class SQLiteBackend:
+    """Спільна для воркерів розсилка через таблицю events в окремому файлі SQLite.
+
+    Публікація — один INSERT; фоновий потік кожного воркера раз на
+    poll_interval дочитує рядки з більшим id і передає їх у свій хаб. Рядки,
+    старші за retention секунд, видаляються час від часу.
+    """
+
+    CLEANUP_PROBABILITY = 0.01
+
+    def __init__(self, path, poll_interval=0.5, retention=3600, timeout=1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.timeout = timeout
+        self.hub = None
+        self._local = threading.local()
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_id = 0
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self, hub):
+        self.hub = hub
+        # Нові воркери не переграють історію: клієнти отримують події від моменту старту
+        self._last_id = self._connection().execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        hub.skip_to(self._last_id)
+        self._thread = threading.Thread(target=self._run, name='event-poller', daemon=True)
+        self._thread.start()
+
+    def publish(self, channel, data):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            'INSERT INTO events (channel, data, created_at) VALUES (?, ?, ?)',
+            (channel, json.dumps(data, ensure_ascii=False), now)
+        )
+        # Підписники цього ж воркера не чекають наступного опитування
+        self.poll()
+        if random.random() < self.CLEANUP_PROBABILITY:
+            conn.execute('DELETE FROM events WHERE created_at < ?', (now - self.retention,))
+
+    def poll(self):
+        with self._poll_lock:
+            rows = self._connection().execute(
+                'SELECT id, channel, data FROM events WHERE id > ? ORDER BY id LIMIT 1000', (self._last_id,)
+            ).fetchall()
+            for event_id, channel, data in rows:
+                self.hub.deliver(event_id, channel, json.loads(data))
+                self._last_id = event_id
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except sqlite3.Error:
+                # Файл тимчасово заблоковано — дочитаємо на наступному кроці
+                continue
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class EventHub:
+    """Кільцевий буфер останніх подій процесу і очікування нових для потоків SSE."""
+
+    def __init__(self, backend, history=1000, max_streams=100):
+        self.backend = backend
+        self.max_streams = max_streams
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._last_id = 0
+        self._closed = False
+        self.streams = 0
+        self.delivered = 0
+        self.failed = 0
+        backend.start(self)
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._last_id
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def skip_to(self, event_id):
+        with self._cond:
+            self._last_id = max(self._last_id, event_id)
+
+    def publish(self, channel, data):
+        """Публікує подію після commit; збій розсилки не скасовує вже записану зміну."""
+        try:
+            self.backend.publish(channel, data)
+        except sqlite3.Error:
+            with self._cond:
+                self.failed += 1
+
+    def deliver(self, event_id, channel, data):
+        with self._cond:
+            if event_id <= self._last_id:
+                return
+            self._events.append(Event(event_id, channel, data))
+            self._last_id = event_id
+            self.delivered += 1
+            self._cond.notify_all()
+
+    def wait(self, last_id, channels, timeout):
+        """Події каналів channels після last_id; чекає до timeout секунд, якщо їх ще немає.
+
+        Повертає (події, новий last_id). Замість подій None — частину
+        пропущеного буфер уже витіснив.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._last_id > last_id:
+                    if not self._events or self._events[0].id > last_id + 1:
+                        return None, self._last_id
+                    events = [event for event in self._events if event.id > last_id and event.channel in channels]
+                    last_id = self._last_id
+                    if events:
+                        return events, last_id
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    return [], last_id
+                self._cond.wait(remaining)
+
+    def open_stream(self):
+        """Займає місце для потоку; False, якщо воркер уже тримає max_streams потоків."""
+        with self._cond:
+            if self.streams >= self.max_streams:
+                return False
+            self.streams += 1
+            return True
+
+    def close_stream(self):
+        with self._cond:
+            self.streams -= 1
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.backend.stop()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'streams': self.streams,
+                'buffered': len(self._events),
+                'last_id': self._last_id,
+                'delivered': self.delivered,
+                'failed': self.failed,
+            }
+
+
+def format_event(data, event_id=None):
+    payload = json.dumps(data, ensure_ascii=False)
+    return (f'id: {event_id}\n' if event_id is not None else '') + f'data: {payload}\n\n'
+
+
+def stream(hub, channels, last_id, hello, heartbeat=15, duration=300):
+    """Генератор тексту text/event-stream; місце потоку займає й звільняє викликач.
+
+    Потік закривається через duration секунд: браузер перепідключається сам
+    (поле retry) з Last-Event-ID, а потік воркера звільняється.
+    """
+    yield f'retry: 3000\n{format_event(hello)}'
+    if last_id > hub.last_id:
+        # Номер з іншої історії (наприклад, до перезапуску процесу)
+        last_id = hub.last_id
+        yield format_event({'type': 'reset'}, last_id)
+    deadline = time.monotonic() + duration
+    while not hub.closed:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        events, last_id = hub.wait(last_id, channels, min(heartbeat, remaining))
+        if events is None:
+            yield format_event({'type': 'reset'}, last_id)
+        elif events:
+            yield ''.join(format_event(event.data, event.id) for event in events)
+        else:
+            # Коментар не бачить клієнт, але розірване з'єднання виявиться на записі
+            yield ': ping\n\n'
+
+
+def publish(channel, data):
+    hub = current_app.extensions.get('event_hub')
+    if hub is not None:
+        hub.publish(channel, data)
+
+
+def make_hub(app):
+    storage = app.config['EVENTS_STORAGE']
+    backend = SQLiteBackend(storage, app.config['EVENTS_POLL_INTERVAL']) if storage else LocalBackend()
+    return EventHub(backend, app.config['EVENTS_HISTORY'], app.config['EVENTS_MAX_STREAMS'])
+
+
+def init_app(app):
+    app.config.setdefault('EVENTS_ENABLED', True)
+    app.config.setdefault('EVENTS_STORAGE', None)
+    app.config.setdefault('EVENTS_POLL_INTERVAL', 0.5)
+    app.config.setdefault('EVENTS_HISTORY', 1000)
+    app.config.setdefault('EVENTS_MAX_STREAMS', 100)
+    app.config.setdefault('EVENTS_HEARTBEAT', 15)
+    app.config.setdefault('EVENTS_STREAM_TIMEOUT', 300)
+    if app.config['EVENTS_ENABLED']:
+        app.extensions['event_hub'] = make_hub(app)
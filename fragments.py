@@ -0,0 +1,141 @@
+"""Кеш відрендерених фрагментів шаблонів: тег {% cache %} для Jinja.
+
+    {% cache 'nav', session.role %} ... {% endcache %}
+    {% cache 'schedule_days', can_edit depends 'lessons' %} ... {% endcache %}
+
+Ключ фрагмента — назва й перелічені значення (наприклад, роль). Кешувати
+варто лише дорогі фрагменти, спільні для багатьох користувачів: ключ на
+кожного користувача лише роздуває кеш. Разом із фрагментом зберігаються
+версії даних з `depends` (таблиця data_versions); якщо версія змінилася,
+фрагмент рендериться заново й замінює старий запис під тим самим ключем.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+import db
+
+
+class FragmentCache:
+    """LRU з обмеженням кількості записів і часом життя."""
+
+    def __init__(self, max_entries=1000, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.invalidated += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'invalidated': self.invalidated,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_versions=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        keys = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            keys.append(parser.parse_expression())
+        depends = []
+        if parser.stream.skip_if('name:depends'):
+            depends.append(parser.parse_expression())
+            while parser.stream.skip_if('comma'):
+                depends.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render', [nodes.List(keys), nodes.List(depends)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, keys, depends, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = (tuple(keys), tuple(depends))
+        versions = tuple(self.environment.fragment_versions(name) for name in depends)
+        entry = cache.get(key)
+        if entry is not None:
+            if entry[0] == versions:
+                return entry[1]
+            cache.invalidate()
+        html = caller()
+        cache.set(key, (versions, html))
+        return html
+
+
+def data_version(name):
+    """Версія даних `name`; в межах запиту читається з бази один раз."""
+    versions = g.setdefault('_data_versions', {}) if has_request_context() else {}
+    if name not in versions:
+        versions[name] = db.get_version(db.get_db(), name)[0]
+    return versions[name]
+
+
+def pin_version(name, version):
+    """Версія, з якою view уже прочитав дані: фрагменти запиту беруть саме її."""
+    g.setdefault('_data_versions', {})[name] = version
+
+
+def init_app(app):
+    app.config.setdefault('FRAGMENT_CACHE_ENABLED', True)
+    app.config.setdefault('FRAGMENT_CACHE_SIZE', 1000)
+    app.config.setdefault('FRAGMENT_CACHE_TTL', 300)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_versions = data_version
+    if app.config['FRAGMENT_CACHE_ENABLED']:
+        cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'], app.config['FRAGMENT_CACHE_TTL'])
+        app.jinja_env.fragment_cache = cache
+        app.extensions['fragment_cache'] = cache
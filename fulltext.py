@@ -0,0 +1,108 @@
+"""Повнотекстовий пошук по завданнях, уроках і користувачах (SQLite FTS5).
+
+Індекси tasks_fts, lessons_fts і users_fts створює міграція
+create_search_index, а тригери оновлюють їх разом із таблицями. Кожне слово
+запиту шукається як префікс («фіз» знайде «Фізика» і «фізики»), і запис має
+містити всі слова. Результати впорядковуються за bm25 з вагами колонок.
+Завдання індексуються разом із токеном власника, тому фільтр «лише мої» —
+частина запиту MATCH, а не перевірка кожного знайденого рядка.
+"""
+import re
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+MAX_TERMS = 8
+SCOPES = ('tasks', 'lessons', 'users')
+
+WORD = re.compile(r'\w+')
+
+# Порядок ваг відповідає колонкам індексу в migrations.SEARCH_INDEXES
+TASK_WEIGHTS = '10.0, 2.0, 5.0, 0.0'
+LESSON_WEIGHTS = '5.0, 5.0, 3.0, 3.0, 1.0'
+USER_WEIGHTS = '10.0, 2.0'
+
+
+def parse_query(text):
+    """Слова запиту -> вираз FTS5: '"фіз"* AND "мельн"*'.
+
+    Лапки роблять кожне слово літералом, тож оператори й синтаксис FTS5
+    у введеному тексті не діють.
+    """
+    words = WORD.findall(text or '')[:MAX_TERMS]
+    if not words:
+        raise ValueError('Порожній пошуковий запит')
+    return ' AND '.join(f'"{word}"*' for word in words)
+
+
+def allowed_scopes(role):
+    return SCOPES if role == 'admin' else ('tasks', 'lessons')
+
+
+def search_tasks(conn, match, limit, user_id=None):
+    """Завдання користувача user_id (усі, якщо None) з уривком опису."""
+    # Слова шукаються лише в текстових колонках, не в токені власника
+    match = f'{{title description subject}} : ({match})'
+    if user_id is not None:
+        match = f'owner : "u{int(user_id)}" AND {match}'
+    rows = conn.execute(f'''
+        SELECT t.id, t.title, t.subject, t.due_date, t.completed, t.user_id,
+               snippet(tasks_fts, 1, '[', ']', '…', 12) AS snippet
+        FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+        WHERE tasks_fts MATCH ?
+        ORDER BY bm25(tasks_fts, {TASK_WEIGHTS})
+        LIMIT ?
+    ''', (match, limit))
+    return [dict(row) for row in rows]
+
+
+def search_lessons(conn, match, limit):
+    rows = conn.execute(f'''
+        SELECT l.id, l.subject, l.teacher, l.classroom, l.class_name, l.day_of_week, l.time_start, l.time_end
+        FROM lessons_fts JOIN lessons l ON l.id = lessons_fts.rowid
+        WHERE lessons_fts MATCH ?
+        ORDER BY bm25(lessons_fts, {LESSON_WEIGHTS})
+        LIMIT ?
+    ''', (match, limit))
+    return [dict(row) for row in rows]
+
+
+def search_users(conn, match, limit):
+    rows = conn.execute(f'''
+        SELECT u.id, u.username, u.email, u.role
+        FROM users_fts JOIN users u ON u.id = users_fts.rowid
+        WHERE users_fts MATCH ?
+        ORDER BY bm25(users_fts, {USER_WEIGHTS})
+        LIMIT ?
+    ''', (match, limit))
+    return [dict(row) for row in rows]
+
+
+def search(conn, args, user_id, role):
+    """Результати пошуку за параметрами q, type (через кому) і limit.
+
+    Адміністратор бачить завдання всіх користувачів і користувачів;
+    решта — лише власні завдання та уроки. ValueError — некоректні параметри,
+    PermissionError — запитано недоступний тип.
+    """
+    match = parse_query(args.get('q'))
+    try:
+        limit = min(max(int(args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ValueError('Параметр limit має бути числом')
+
+    allowed = allowed_scopes(role)
+    scopes = [scope.strip() for scope in args.get('type', '').split(',') if scope.strip()] or allowed
+    unknown = set(scopes) - set(SCOPES)
+    if unknown:
+        raise ValueError(f'Невідомі типи: {", ".join(sorted(unknown))}')
+    if set(scopes) - set(allowed):
+        raise PermissionError('Доступ заборонено')
+
+    results = {}
+    if 'tasks' in scopes:
+        results['tasks'] = search_tasks(conn, match, limit, user_id=None if role == 'admin' else user_id)
+    if 'lessons' in scopes:
+        results['lessons'] = search_lessons(conn, match, limit)
+    if 'users' in scopes:
+        results['users'] = search_users(conn, match, limit)
+    return results
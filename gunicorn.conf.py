@@ -0,0 +1,93 @@
+"""Продакшн-запуск через gunicorn; файл підхоплюється автоматично:
+
+    gunicorn
+    kill -HUP <pid майстра>    # плавне перезавантаження коду без втрати запитів
+
+Воркери не імпортують додаток у майстрі (preload_app = False): пули з'єднань,
+кеші, пул bcrypt і фонові потоки створюються в кожному воркері вже після fork,
+а після HUP нові воркери завантажують оновлений код.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# gevent: кожне з'єднання — greenlet, тож відкритий потік /events, що чекає на
+# події, майже нічого не коштує. gevent підміняє threading (monkey patching) до
+# завантаження додатку, тому очікування в EventHub, пулі з'єднань і пулі bcrypt
+# стає кооперативним. gthread лишається запасним варіантом без gevent
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = False
+
+timeout = 30
+# Скільки воркер може дообробляти поточні запити після HUP/TERM
+graceful_timeout = 30
+keepalive = 5
+# Воркери періодично перезапускаються, щоб не накопичувати пам'ять
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+# Кожен воркер має власний пул bcrypt; один процес на воркер не перевантажує ядра
+os.environ.setdefault('PASSWORD_WORKERS', '1')
+# Лічильники обмеження частоти спільні для всіх воркерів
+os.environ.setdefault('RATE_LIMIT_STORAGE', 'rate_limits.db')
+# Використану спробу тесту не можна здати вдруге через інший воркер
+os.environ.setdefault('QUIZ_ATTEMPTS_STORAGE', 'quiz_attempts.db')
+# Події змін доходять до клієнтів, підключених до будь-якого воркера
+os.environ.setdefault('EVENTS_STORAGE', 'events.db')
+if worker_class == 'gevent':
+    # Десята частина з'єднань лишається для звичайних запитів
+    os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(worker_connections * 9 // 10, 1)))
+    # Перебір розкладу — у процесах: у greenlet він зупинив би весь воркер
+    os.environ.setdefault('TIMETABLE_WORKERS', '2')
+else:
+    # У gthread кожен потік подій займає потік воркера: половина лишається для запитів
+    os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(threads // 2, 1)))
+
+
+def _flask(*args):
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', *args], check=True)
+
+
+def on_starting(server):
+    # Раунди bcrypt підбираються один раз, щоб усі воркери хешували однаково.
+    # config тут не імпортується: воркери успадкували б його без BCRYPT_ROUNDS
+    if 'BCRYPT_ROUNDS' not in os.environ:
+        import passwords
+
+        os.environ['BCRYPT_ROUNDS'] = str(passwords.calibrate_rounds())
+    # Міграції — один раз до запуску воркерів; листи, що зависли, повертаються в чергу
+    _flask('init-db', '--requeue-mail')
+    _flask('build-assets')
+
+
+def on_reload(server):
+    # Нові воркери після HUP отримують уже оновлену схему і статичні файли
+    _flask('init-db')
+    _flask('build-assets')
+
+
+def post_worker_init(worker):
+    import app
+
+    with worker.wsgi.app_context():
+        app.get_mail_dispatcher().start(recover=False)
+        if worker.wsgi.config['REMINDERS_ENABLED']:
+            app.get_reminder_scheduler().start()
+
+
+def worker_exit(server, worker):
+    import app
+
+    application = getattr(worker, 'wsgi', None)
+    if application is not None:
+        app.close_app(application)
@@ -0,0 +1,223 @@
+"""Черга вихідних листів (outbox) та фоновий диспетчер."""
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+
+def enqueue(conn, recipient, subject, body):
+    """Додає лист у чергу в межах транзакції викликача."""
+    conn.execute(
+        'INSERT INTO email_outbox (recipient, subject, body, next_attempt_at) VALUES (?, ?, ?, ?)',
+        (recipient, subject, body, time.time())
+    )
+
+
+def requeue_interrupted(conn):
+    """Повертає в чергу листи, що «зависли» у відправці після падіння процесу."""
+    return conn.execute("UPDATE email_outbox SET status = 'pending' WHERE status = 'sending'").rowcount
+
+
+class ConsoleTransport:
+    """Заглушка для розробки: лише друкує лист у консоль."""
+
+    def __init__(self, sender='noreply@school.edu.ua'):
+        self.sender = sender
+
+    def open(self):
+        pass
+
+    def send(self, recipient, subject, body):
+        print(f"Відправка email на {recipient}: {subject}")
+
+    def close(self):
+        pass
+
+
+class SMTPTransport:
+    """Одне SMTP-з'єднання на всю пачку листів."""
+
+    def __init__(self, host, port=25, username=None, password=None, use_tls=False,
+                 sender='noreply@school.edu.ua', timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+        self.timeout = timeout
+        self._smtp = None
+
+    def open(self):
+        self._smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            self._smtp.starttls()
+        if self.username:
+            self._smtp.login(self.username, self.password)
+
+    def send(self, recipient, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        self._smtp.send_message(message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+
+class OutboxDispatcher:
+    """Розсилає листи з таблиці email_outbox пачками.
+
+    Кожен воркер атомарно «забирає» пачку рядків (status = 'sending'), тому
+    кілька воркерів не відправляють той самий лист. Невдалі спроби
+    повторюються з експоненційною затримкою, після max_attempts лист
+    переходить у статус 'dead'.
+    """
+
+    def __init__(self, pool, transport_factory, batch_size=20, concurrency=1,
+                 max_attempts=5, base_delay=30.0, max_delay=3600.0, poll_interval=5.0):
+        self.pool = pool
+        self.transport_factory = transport_factory
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def backoff(self, attempts):
+        return min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+
+    def _claim(self, conn):
+        rows = conn.execute(
+            "UPDATE email_outbox SET status = 'sending' "
+            "WHERE id IN (SELECT id FROM email_outbox "
+            "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?) "
+            "RETURNING id, recipient, subject, body, attempts",
+            (time.time(), self.batch_size)
+        ).fetchall()
+        conn.commit()
+        return rows
+
+    def _send(self, batch):
+        results = []
+        transport = self.transport_factory()
+        try:
+            transport.open()
+            for row in batch:
+                try:
+                    transport.send(row['recipient'], row['subject'], row['body'])
+                    results.append((row, None))
+                except Exception as e:
+                    results.append((row, e))
+        except Exception as e:
+            results.extend((row, e) for row in batch[len(results):])
+        finally:
+            transport.close()
+        return results
+
+    def _record(self, conn, results):
+        for row, error in results:
+            if error is None:
+                conn.execute(
+                    "UPDATE email_outbox SET status = 'sent', attempts = attempts + 1, "
+                    "sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?",
+                    (row['id'],)
+                )
+                continue
+            attempts = row['attempts'] + 1
+            status = 'dead' if attempts >= self.max_attempts else 'pending'
+            conn.execute(
+                'UPDATE email_outbox SET status = ?, attempts = ?, next_attempt_at = ?, '
+                'last_error = ? WHERE id = ?',
+                (status, attempts, time.time() + self.backoff(attempts), str(error), row['id'])
+            )
+        conn.commit()
+
+    def drain_once(self):
+        """Відправляє одну пачку; повертає кількість оброблених листів.
+
+        З'єднання з пулом береться лише на захоплення пачки та на запис
+        результатів: під час розмови з SMTP-сервером воно вільне для запитів.
+        """
+        conn = self.pool.acquire()
+        try:
+            batch = self._claim(conn)
+        finally:
+            self.pool.release(conn)
+        if not batch:
+            return 0
+
+        results = self._send(batch)
+
+        conn = self.pool.acquire()
+        try:
+            self._record(conn, results)
+        finally:
+            self.pool.release(conn)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.drain_once()
+            except Exception as e:
+                print(f"Помилка відправки email: {e}")
+                processed = 0
+            if processed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def start(self, recover=True):
+        """Запускає потоки розсилки.
+
+        recover=False — коли процесів кілька (gunicorn): листи, які зараз
+        відправляє сусідній воркер, не можна повертати в чергу.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            if recover:
+                conn = self.pool.acquire()
+                try:
+                    requeue_interrupted(conn)
+                    conn.commit()
+                finally:
+                    self.pool.release(conn)
+
+            for i in range(self.concurrency):
+                thread = threading.Thread(target=self._run, name=f'mail-dispatcher-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        # Воркер-сусід може саме відправляти листи в статусі 'sending'
+        self.start(recover=False)
+        self._wakeup.set()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        conn = self.pool.acquire()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM email_outbox GROUP BY status').fetchall()
+        finally:
+            self.pool.release(conn)
+        return {status: count for status, count in rows}
@@ -0,0 +1,309 @@
+"""Вимірювання часу фаз запиту, лічильники SQL та експорт у форматі Prometheus."""
+import cProfile
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+
+# Межі кошиків гістограм у секундах
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+class Registry:
+    """Лічильники й гістограми з мітками; одне блокування на всі оновлення."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def add_collector(self, collect):
+        """`collect()` повертає список (назва, значення, мітки) поточних показників (gauge)."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def remove_collector(self, collect):
+        with self._lock:
+            if collect in self._collectors:
+                self._collectors.remove(collect)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (h.buckets, list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+            collectors = list(self._collectors)
+
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        for collect in collectors:
+            for name, value, labels in collect():
+                header(name, 'gauge')
+                lines.append(f'{name}{_format_labels(tuple(sorted(labels.items())))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+registry.describe('app_span_seconds', 'Тривалість іменованих фаз обробки (БД, bcrypt, шаблони, погода)')
+registry.describe('app_sql_statements_total', 'Кількість виконаних SQL-запитів')
+registry.describe('app_sql_rows_total', 'Кількість прочитаних рядків SQL')
+registry.describe('http_request_duration_seconds', 'Тривалість HTTP-запитів')
+registry.describe('http_requests_total', 'Кількість HTTP-запитів')
+registry.describe('http_request_sql_statements', 'SQL-запитів на один HTTP-запит')
+
+
+def _request_stats():
+    if has_request_context():
+        return g.get('_metrics')
+    return None
+
+
+@contextmanager
+def span(name):
+    """Вимірює фазу `name`; всередині запиту час додається і до статистики запиту."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('app_span_seconds', elapsed, span=name)
+        stats = _request_stats()
+        if stats is not None:
+            stats['spans'][name] = stats['spans'].get(name, 0.0) + elapsed
+
+
+def _count_rows(count):
+    if count:
+        registry.inc('app_sql_rows_total', count)
+        stats = _request_stats()
+        if stats is not None:
+            stats['rows'] += count
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        _count_rows(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _count_rows(len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        _count_rows(1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """З'єднання, що рахує SQL-запити, прочитані рядки й час виконання."""
+
+    def _run(self, method, sql, parameters):
+        cursor = self.cursor(InstrumentedCursor)
+        with span('db.query'):
+            getattr(cursor, method)(sql, parameters)
+        registry.inc('app_sql_statements_total')
+        stats = _request_stats()
+        if stats is not None:
+            stats['queries'] += 1
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self._run('execute', sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self._run('executemany', sql, parameters)
+
+
+class StackSampler:
+    """Періодично знімає стек одного потоку; результат — згорнуті стеки для flamegraph.pl."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def init_app(app):
+    """Підключає вимірювання запитів до Flask-додатку.
+
+    Профілювання вмикається через PROFILE_MODE ('cprofile' або 'stacks'):
+    кожен запит з ймовірністю PROFILE_SAMPLE_RATE профілюється, і якщо він
+    тривав довше за PROFILE_THRESHOLD_MS, результат зберігається в PROFILE_DIR.
+    """
+    app.config.setdefault('PROFILE_MODE', None)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.1)
+    app.config.setdefault('PROFILE_THRESHOLD_MS', 500)
+    app.config.setdefault('PROFILE_DIR', 'profiles')
+
+    @app.before_request
+    def start_request():
+        g._metrics = {'started': time.perf_counter(), 'spans': {}, 'queries': 0, 'rows': 0}
+        mode = app.config['PROFILE_MODE']
+        if mode and random.random() < app.config['PROFILE_SAMPLE_RATE']:
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                profiler = StackSampler(threading.get_ident())
+                profiler.start()
+            g._profiler = profiler
+
+    @app.after_request
+    def finish_request(response):
+        stats = g.pop('_metrics', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats['started']
+        endpoint = request.endpoint or 'unknown'
+        registry.observe('http_request_duration_seconds', elapsed,
+                         endpoint=endpoint, method=request.method)
+        registry.inc('http_requests_total', endpoint=endpoint, method=request.method,
+                     status=response.status_code)
+        registry.observe('http_request_sql_statements', stats['queries'], buckets=COUNT_BUCKETS,
+                         endpoint=endpoint)
+
+        timings = [f'{name.replace(".", "-")};dur={value * 1000:.1f}' for name, value in stats['spans'].items()]
+        timings.append(f'total;dur={elapsed * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            _save_profile(app, profiler, endpoint, elapsed)
+        return response
+
+    def start_template(sender, template, context, **extra):
+        if has_request_context():
+            g.setdefault('_template_started', []).append(time.perf_counter())
+
+    def finish_template(sender, template, context, **extra):
+        started = g.get('_template_started') if has_request_context() else None
+        if started:
+            elapsed = time.perf_counter() - started.pop()
+            registry.observe('app_span_seconds', elapsed, span='template')
+            stats = _request_stats()
+            if stats is not None:
+                stats['spans']['template'] = stats['spans'].get('template', 0.0) + elapsed
+
+    before_render_template.connect(start_template, app, weak=False)
+    template_rendered.connect(finish_template, app, weak=False)
+
+
+def _save_profile(app, profiler, endpoint, elapsed):
+    if isinstance(profiler, StackSampler):
+        profiler.stop()
+    else:
+        profiler.disable()
+    if elapsed * 1000 < app.config['PROFILE_THRESHOLD_MS']:
+        return
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{int(elapsed * 1000)}ms"
+    path = os.path.join(app.config['PROFILE_DIR'], name)
+    if isinstance(profiler, StackSampler):
+        profiler.dump(path + '.folded')
+    else:
+        profiler.dump_stats(path + '.prof')
@@ -0,0 +1,438 @@
+"""Версіоновані міграції схеми бази даних.
+
+Номер застосованої міграції зберігається в `PRAGMA user_version`. Кожна
+міграція — функція, що отримує з'єднання; нові міграції додаються лише в
+кінець списку MIGRATIONS.
+"""
+import json
+
+BACKFILL_BATCH_SIZE = 500
+
+WEEKDAY_SQL = """CASE {column}
+    WHEN 'Понеділок' THEN 1
+    WHEN 'Вівторок' THEN 2
+    WHEN 'Середа' THEN 3
+    WHEN 'Четвер' THEN 4
+    WHEN 'П''ятниця' THEN 5
+    WHEN 'Субота' THEN 6
+    WHEN 'Неділя' THEN 7
+END"""
+
+# 'HH:MM' або 'H:MM' -> хвилини від початку доби
+MINUTES_SQL = ("(CAST(substr({column}, 1, instr({column}, ':') - 1) AS INTEGER) * 60"
+               " + CAST(substr({column}, instr({column}, ':') + 1) AS INTEGER))")
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def create_data_versions(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO data_versions (name) VALUES ('lessons')")
+
+
+def add_lookup_indexes(conn):
+    # users.username та users.email вже мають індекси через UNIQUE
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_due ON tasks (user_id, due_date)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_test_results_user_completed '
+        'ON test_results (user_id, completed_at)'
+    )
+
+
+def add_lesson_slots(conn):
+    existing = _columns(conn, 'lessons')
+    for column in ('weekday', 'start_minute', 'end_minute'):
+        if column not in existing:
+            conn.execute(f'ALTER TABLE lessons ADD COLUMN {column} INTEGER')
+
+    slot_values = (
+        f"weekday = {WEEKDAY_SQL.format(column='NEW.day_of_week')}, "
+        f"start_minute = {MINUTES_SQL.format(column='NEW.time_start')}, "
+        f"end_minute = {MINUTES_SQL.format(column='NEW.time_end')}"
+    )
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_lessons_slot_insert AFTER INSERT ON lessons
+        BEGIN
+            UPDATE lessons SET {slot_values} WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_lessons_slot_update
+        AFTER UPDATE OF day_of_week, time_start, time_end ON lessons
+        BEGIN
+            UPDATE lessons SET {slot_values} WHERE id = NEW.id;
+        END
+    ''')
+    conn.commit()
+
+    # Заповнюємо наявні рядки порціями, щоб не тримати блокування запису довго
+    backfill = (
+        f"UPDATE lessons SET "
+        f"weekday = {WEEKDAY_SQL.format(column='day_of_week')}, "
+        f"start_minute = {MINUTES_SQL.format(column='time_start')}, "
+        f"end_minute = {MINUTES_SQL.format(column='time_end')} "
+        f"WHERE id IN (SELECT id FROM lessons WHERE start_minute IS NULL AND id > ? ORDER BY id LIMIT ?) "
+        f"RETURNING id"
+    )
+    last_id = 0
+    while True:
+        ids = [row[0] for row in conn.execute(backfill, (last_id, BACKFILL_BATCH_SIZE)).fetchall()]
+        conn.commit()
+        if not ids:
+            break
+        last_id = max(ids)
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lessons_slot ON lessons (weekday, start_minute)')
+
+
+def create_email_outbox(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)'
+    )
+
+
+def add_task_revisions(conn):
+    if 'revision' not in _columns(conn, 'tasks'):
+        conn.execute('ALTER TABLE tasks ADD COLUMN revision INTEGER')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            task_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            revision INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO data_versions (name) VALUES ('tasks')")
+
+    # Лічильник ревізій — рядок 'tasks' у data_versions; кожна зміна отримує новий номер
+    bump = ("UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            "WHERE name = 'tasks';")
+    current = "(SELECT version FROM data_versions WHERE name = 'tasks')"
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_revision_insert AFTER INSERT ON tasks
+        BEGIN
+            {bump}
+            UPDATE tasks SET revision = {current} WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_revision_update
+        AFTER UPDATE OF title, description, subject, due_date, completed ON tasks
+        BEGIN
+            {bump}
+            UPDATE tasks SET revision = {current} WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_tombstone AFTER DELETE ON tasks
+        BEGIN
+            {bump}
+            INSERT OR REPLACE INTO task_tombstones (task_id, user_id, revision)
+            VALUES (OLD.id, OLD.user_id, {current});
+        END
+    ''')
+    conn.commit()
+
+    while True:
+        updated = conn.execute(
+            f"UPDATE tasks SET revision = {current} "
+            f"WHERE id IN (SELECT id FROM tasks WHERE revision IS NULL LIMIT ?)",
+            (BACKFILL_BATCH_SIZE,)
+        ).rowcount
+        conn.commit()
+        if not updated:
+            break
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_revision ON tasks (user_id, revision)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_task_tombstones_user_revision ON task_tombstones (user_id, revision)'
+    )
+
+
+# Відсоток правильних відповідей, 0..100
+PERCENT_SQL = ("CASE WHEN {total} > 0 THEN CAST(ROUND({score} * 100.0 / {total}) AS INTEGER) "
+               "ELSE 0 END")
+
+
+def add_test_aggregates(conn):
+    existing = _columns(conn, 'test_results')
+    if 'time_spent' not in existing:
+        conn.execute('ALTER TABLE test_results ADD COLUMN time_spent INTEGER')
+    if 'answers' not in existing:
+        conn.execute('ALTER TABLE test_results ADD COLUMN answers TEXT')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS test_stats (
+            test_name TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            sum_percent INTEGER NOT NULL DEFAULT 0,
+            best_percent INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    # Гістограма відсотків (не більше 101 рядка на тест) — з неї рахуються перцентилі
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS test_score_histogram (
+            test_name TEXT NOT NULL,
+            percent INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (test_name, percent)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_test_stats (
+            user_id INTEGER NOT NULL,
+            test_name TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            best_score INTEGER NOT NULL DEFAULT 0,
+            best_percent INTEGER NOT NULL DEFAULT 0,
+            sum_percent INTEGER NOT NULL DEFAULT 0,
+            last_completed_at TIMESTAMP,
+            PRIMARY KEY (user_id, test_name)
+        )
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_user_test_stats_leaderboard '
+        'ON user_test_stats (test_name, best_percent DESC, attempts)'
+    )
+
+    percent = PERCENT_SQL.format(score='NEW.score', total='NEW.total_questions')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_test_results_aggregate AFTER INSERT ON test_results
+        BEGIN
+            INSERT INTO test_stats (test_name, attempts, sum_percent, best_percent)
+            VALUES (NEW.test_name, 1, {percent}, {percent})
+            ON CONFLICT(test_name) DO UPDATE SET
+                attempts = attempts + 1,
+                sum_percent = sum_percent + excluded.sum_percent,
+                best_percent = MAX(best_percent, excluded.best_percent);
+
+            INSERT INTO test_score_histogram (test_name, percent, count)
+            VALUES (NEW.test_name, {percent}, 1)
+            ON CONFLICT(test_name, percent) DO UPDATE SET count = count + 1;
+
+            INSERT INTO user_test_stats
+                (user_id, test_name, attempts, best_score, best_percent, sum_percent, last_completed_at)
+            SELECT NEW.user_id, NEW.test_name, 1, NEW.score, {percent}, {percent}, NEW.completed_at
+            WHERE NEW.user_id IS NOT NULL
+            ON CONFLICT(user_id, test_name) DO UPDATE SET
+                attempts = attempts + 1,
+                best_score = CASE WHEN excluded.best_percent > best_percent
+                                  THEN excluded.best_score ELSE best_score END,
+                best_percent = MAX(best_percent, excluded.best_percent),
+                sum_percent = sum_percent + excluded.sum_percent,
+                last_completed_at = excluded.last_completed_at;
+        END
+    ''')
+
+    # Наявні результати переносимо в агрегати одним проходом
+    percent = PERCENT_SQL.format(score='score', total='total_questions')
+    conn.execute(f'''
+        INSERT OR REPLACE INTO test_stats (test_name, attempts, sum_percent, best_percent)
+        SELECT test_name, COUNT(*), SUM({percent}), MAX({percent})
+        FROM test_results GROUP BY test_name
+    ''')
+    conn.execute(f'''
+        INSERT OR REPLACE INTO test_score_histogram (test_name, percent, count)
+        SELECT test_name, {percent}, COUNT(*) FROM test_results GROUP BY test_name, {percent}
+    ''')
+    best_percent = PERCENT_SQL.format(score='best.score', total='best.total_questions')
+    conn.execute(f'''
+        INSERT OR REPLACE INTO user_test_stats
+            (user_id, test_name, attempts, best_score, best_percent, sum_percent, last_completed_at)
+        SELECT user_id, test_name, COUNT(*),
+               (SELECT best.score FROM test_results AS best
+                WHERE best.user_id = r.user_id AND best.test_name = r.test_name
+                ORDER BY {best_percent} DESC, best.id LIMIT 1),
+               MAX({percent}), SUM({percent}), MAX(completed_at)
+        FROM test_results AS r WHERE user_id IS NOT NULL GROUP BY user_id, test_name
+    ''')
+
+
+# Запитання, що раніше були вбудовані в сторінку тесту: (предмет, запитання, варіанти, правильний)
+SEED_QUESTIONS = [
+    ('Математика', 'Чому дорівнює корінь із 144?', ['12', '14', '16', '10'], 0),
+    ('Українська мова', 'Скільки відмінків в українській мові?', ['5', '6', '7', '8'], 2),
+    ('Географія', 'Яка найвища гора в Україні?', ['Говерла', 'Петрос', 'Піп Іван', 'Чорногора'], 0),
+    ('Історія', 'В якому році Україна отримала незалежність?', ['1990', '1991', '1992', '1993'], 1),
+    ('Фізика', 'Одиницею вимірювання сили є:', ['Джоуль', 'Ватт', 'Ньютон', 'Паскаль'], 2),
+    ('Хімія', 'Хімічний символ кисню:', ['O', 'Ox', 'K', 'H'], 0),
+    ('Біологія', 'Скільки камер має серце людини?', ['2', '3', '4', '5'], 2),
+    ('Англійська мова', "Як англійською мовою буде 'книга'?", ['Book', 'Look', 'Cook', 'Hook'], 0),
+    ('Інформатика', 'Що таке HTML?',
+     ['Мова програмування', 'Мова розмітки', 'База даних', 'Операційна система'], 1),
+    ('Математика', 'Чому дорівнює 15% від 200?', ['25', '30', '35', '40'], 1),
+]
+
+
+def create_question_bank(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject TEXT NOT NULL,
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_questions_subject ON questions (subject)')
+    conn.execute("INSERT OR IGNORE INTO data_versions (name) VALUES ('questions')")
+
+    # Будь-яка зміна банку запитань інвалідує підготовлені набори тестів
+    bump = ("UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            "WHERE name = 'questions';")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_questions_{event.lower()} AFTER {event} ON questions
+            BEGIN
+                {bump}
+            END
+        ''')
+
+    if conn.execute('SELECT COUNT(*) FROM questions').fetchone()[0] == 0:
+        conn.executemany(
+            'INSERT INTO questions (subject, question, options, correct) VALUES (?, ?, ?, ?)',
+            [(subject, question, json.dumps(options, ensure_ascii=False), correct)
+             for subject, question, options, correct in SEED_QUESTIONS]
+        )
+
+
+def add_lesson_classes(conn):
+    # Клас, для якого складено урок (генератор розкладу); ручні уроки лишаються без класу
+    if 'class_name' not in _columns(conn, 'lessons'):
+        conn.execute('ALTER TABLE lessons ADD COLUMN class_name TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lessons_class ON lessons (class_name)')
+
+
+# Повнотекстові індекси: таблиця -> (індексовані колонки, вираз власника або None).
+# Значення зберігаються лише в основних таблицях (external content), індекси
+# оновлюються тригерами
+SEARCH_INDEXES = {
+    'tasks': (('title', 'description', 'subject'), "'u' || {row}.user_id"),
+    'lessons': (('subject', 'teacher', 'classroom', 'class_name', 'day_of_week'), None),
+    'users': (('username', 'email'), None),
+}
+# unicode61 знає кирилицю і зводить регістр; префікси з 2–3 символів індексуються окремо
+SEARCH_TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def create_search_index(conn):
+    for table, (columns, owner) in SEARCH_INDEXES.items():
+        fts_columns = list(columns)
+        content = table
+        if owner is not None:
+            # Власник як токен ('u<id>') — фільтр доступу стає частиною запиту MATCH
+            fts_columns.append('owner')
+            content = f'{table}_search'
+            conn.execute(
+                f"CREATE VIEW IF NOT EXISTS {content} AS "
+                f"SELECT id, {', '.join(columns)}, {owner.format(row=table)} AS owner FROM {table}"
+            )
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+            f"{', '.join(fts_columns)}, content = '{content}', content_rowid = 'id', {SEARCH_TOKENIZE})"
+        )
+
+        def values(row):
+            items = [f'{row}.{column}' for column in columns]
+            if owner is not None:
+                items.append(owner.format(row=row))
+            return ', '.join(items)
+
+        insert = f"INSERT INTO {table}_fts (rowid, {', '.join(fts_columns)}) VALUES (new.id, {values('new')});"
+        delete = (f"INSERT INTO {table}_fts ({table}_fts, rowid, {', '.join(fts_columns)}) "
+                  f"VALUES ('delete', old.id, {values('old')});")
+        watched = list(columns) + (['user_id'] if owner is not None else [])
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert AFTER INSERT ON {table} BEGIN {insert} END')
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete AFTER DELETE ON {table} BEGIN {delete} END')
+        # Зміна пароля чи позначка «виконано» не переіндексовує рядок
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update AFTER UPDATE OF {', '.join(watched)} ON {table} "
+            f"BEGIN {delete} {insert} END"
+        )
+        conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+
+def create_task_reminders(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_reminders (
+            task_id INTEGER NOT NULL,
+            due_date DATE NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (task_id, due_date)
+        )
+    ''')
+    # Вікно найближчих термінів для планувальника нагадувань читається з цього індексу
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_pending_due ON tasks (due_date) WHERE completed = 0')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_reminders_delete AFTER DELETE ON tasks
+        BEGIN
+            DELETE FROM task_reminders WHERE task_id = OLD.id;
+        END
+    ''')
+
+
+def create_quiz_attempts(conn):
+    # Використані спроби тесту: токен спроби одноразовий для всіх воркерів
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_attempts (
+            nonce TEXT PRIMARY KEY,
+            used_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_quiz_attempts_used ON quiz_attempts (used_at)')
+
+
+def drop_quiz_attempts(conn):
+    # Використані спроби тепер в окремому сховищі (quizzes.SQLiteAttemptStore)
+    conn.execute('DROP TABLE IF EXISTS quiz_attempts')
+
+
+MIGRATIONS = [
+    create_data_versions,
+    add_lookup_indexes,
+    add_lesson_slots,
+    create_email_outbox,
+    add_task_revisions,
+    add_test_aggregates,
+    create_question_bank,
+    add_lesson_classes,
+    create_search_index,
+    create_task_reminders,
+    create_quiz_attempts,
+    drop_quiz_attempts,
+]
+
+
+def migrate(conn):
+    """Застосовує всі нові міграції і повертає поточну версію схеми."""
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if version <= current:
+            continue
+        migration(conn)
+        conn.execute(f'PRAGMA user_version = {version}')
+        conn.commit()
+        current = version
+    return current
@@ -0,0 +1,179 @@
+"""Хешування паролів bcrypt в окремому пулі воркерів."""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Черга на хешування заповнена — запит треба відхилити (HTTP 429)."""
+
+
+def _hash(password, rounds):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    return hashed, time.perf_counter() - started
+
+
+def _check(password, hashed):
+    started = time.perf_counter()
+    ok = bcrypt.checkpw(password, hashed)
+    return ok, time.perf_counter() - started
+
+
+def hash_rounds(hashed):
+    """Кількість раундів, закодована в хеші виду $2b$12$..."""
+    if isinstance(hashed, str):
+        hashed = hashed.encode('utf-8')
+    try:
+        return int(hashed.split(b'$')[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def calibrate_rounds(target_ms=250, min_rounds=10, max_rounds=15):
+    """Найбільша кількість раундів, хеш з якою вкладається в target_ms."""
+    rounds = min_rounds
+    _, elapsed = _hash(b'calibration', rounds)
+    # Кожен додатковий раунд подвоює час
+    while rounds < max_rounds and elapsed * 2 * 1000 <= target_ms:
+        rounds += 1
+        elapsed *= 2
+    return rounds
+
+
+class LatencyStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class PasswordHasher:
+    """Виконує bcrypt у пулі процесів з обмеженою чергою.
+
+    Якщо в роботі вже `max_pending` операцій, нові відхиляються з HasherBusy
+    замість того, щоб займати потоки веб-сервера в очікуванні.
+    """
+
+    def __init__(self, rounds=12, workers=None, max_pending=None, executor='process', bulk_workers=None):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.bulk_workers = bulk_workers or max(self.workers // 2, 1)
+        self.max_pending = max_pending or self.workers * 4
+        self.executor_kind = executor
+        self._executor = None
+        self._bulk_executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+        self.rejected = 0
+        self.rehashed = 0
+        self._stats = {'hash': LatencyStats(), 'check': LatencyStats(), 'wait': LatencyStats()}
+
+    def _make_executor(self, workers, name):
+        if self.executor_kind == 'thread':
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        return ProcessPoolExecutor(max_workers=workers)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._make_executor(self.workers, 'bcrypt')
+        return self._executor
+
+    def _get_bulk_executor(self):
+        if self._bulk_executor is None:
+            with self._lock:
+                if self._bulk_executor is None:
+                    self._bulk_executor = self._make_executor(self.bulk_workers, 'bcrypt-bulk')
+        return self._bulk_executor
+
+    def _reserve(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy('Забагато одночасних запитів, спробуйте пізніше')
+
+    def _run(self, operation, fn, *args):
+        self._reserve()
+        started = time.perf_counter()
+        try:
+            result, elapsed = self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+        total = time.perf_counter() - started
+        with self._lock:
+            self._stats[operation].add(elapsed)
+            self._stats['wait'].add(max(total - elapsed, 0.0))
+        return result
+
+    def hash(self, password):
+        return self._run('hash', _hash, password.encode('utf-8'), self.rounds)
+
+    def hash_many(self, passwords):
+        """Хеші пачки паролів (імпорт) в окремому, меншому пулі.
+
+        Черга пулу FIFO, тож у спільному пулі логіни стояли б за всією пачкою;
+        окремий пул на `bulk_workers` воркерів лишає основний вільним для логінів.
+        """
+        self._reserve()
+        try:
+            results = list(self._get_bulk_executor().map(
+                _hash, [password.encode('utf-8') for password in passwords], repeat(self.rounds)
+            ))
+        finally:
+            self._slots.release()
+        with self._lock:
+            for _, elapsed in results:
+                self._stats['hash'].add(elapsed)
+        return [hashed for hashed, _ in results]
+
+    def check(self, password, hashed):
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return self._run('check', _check, password.encode('utf-8'), hashed)
+
+    def needs_rehash(self, hashed):
+        # Лише вгору: процеси з різною калібровкою не перехешовують пароль туди й назад
+        return hash_rounds(hashed) < self.rounds
+
+    def record_rehash(self):
+        with self._lock:
+            self.rehashed += 1
+
+    def stats(self):
+        with self._lock:
+            data = {name: stats.as_dict() for name, stats in self._stats.items()}
+            data.update({
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'bulk_workers': self.bulk_workers,
+                'max_pending': self.max_pending,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+            })
+        return data
+
+    def shutdown(self):
+        for name in ('_executor', '_bulk_executor'):
+            executor = getattr(self, name)
+            if executor is not None:
+                executor.shutdown(wait=True)
+                setattr(self, name, None)
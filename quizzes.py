@@ -0,0 +1,242 @@
+"""Банк запитань і підготовлені набори тестів.
+
+Запитання тримаються в пам'яті процесу й перечитуються лише після зміни
+версії 'questions' у data_versions, тож видача й перевірка тесту не читають
+запитання з бази. Для кожного предмета й розміру тесту є sets_per_quiz
+перемішаних наборів; набір будується детерміновано з його ідентифікатора,
+тому відповіді на тест, виданий одним воркером gunicorn, перевіряє будь-який.
+
+Той самий набір видається багатьом, тож відповідь приймається не за
+quiz_id, а за підписаним одноразовим токеном спроби: кожен /api/quiz дає
+новий токен, а використані запам'ятовуються в сховищі спроб (пам'ять воркера
+або окремий файл SQLite, спільний для воркерів). Основна база тут не
+потрібна, тож здача тесту не додає транзакцію запису поза буфером
+результатів. Правильні відповіді повертаються лише разом із зарахованим
+результатом.
+"""
+import json
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from operator import eq
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+import db
+from results import DEFAULT_TEST
+
+QuizSet = namedtuple('QuizSet', 'quiz_id test_name questions key payload')
+QuestionBank = namedtuple('QuestionBank', 'version questions by_subject sets')
+
+NO_ANSWER = 'Не відповів'
+
+
+class QuizExpired(Exception):
+    """Банк запитань змінився після видачі тесту."""
+
+
+class AttemptInvalid(Exception):
+    """Токен спроби відсутній, підроблений, прострочений, чужий або вже використаний."""
+
+
+def _attempt_serializer(secret_key):
+    return URLSafeTimedSerializer(secret_key, salt='quiz-attempt')
+
+
+def make_attempt(secret_key, quiz_id, user_id):
+    return _attempt_serializer(secret_key).dumps([quiz_id, user_id, secrets.token_hex(8)])
+
+
+def load_attempt(secret_key, token, user_id, max_age):
+    """(quiz_id, nonce) з токена спроби, виданого цьому ж користувачу (None — гість)."""
+    try:
+        quiz_id, owner, nonce = _attempt_serializer(secret_key).loads(token, max_age=max_age)
+    except (BadSignature, TypeError, ValueError):
+        raise AttemptInvalid('Спроба недійсна, почніть тест заново')
+    if owner != user_id:
+        raise AttemptInvalid('Спроба недійсна, почніть тест заново')
+    return quiz_id, nonce
+
+
+def _already_used():
+    return AttemptInvalid('Цю спробу вже зараховано, почніть тест заново')
+
+
+class MemoryAttemptStore:
+    """Використані спроби в пам'яті воркера (один процес, тести).
+
+    Записи, старші за max_age, не потрібні: такий токен однаково не пройде
+    перевірку підпису, тож вони прибираються під час наступних claim.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._used = {}
+        self._next_cleanup = 0.0
+
+    def claim(self, nonce):
+        """Позначає спробу використаною; AttemptInvalid, якщо її вже зараховано."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_cleanup:
+                self._used = {key: used_at for key, used_at in self._used.items()
+                              if used_at > now - self.max_age}
+                self._next_cleanup = now + self.max_age / 10
+            if nonce in self._used:
+                raise _already_used()
+            self._used[nonce] = now
+
+    def stats(self):
+        with self._lock:
+            return {'used': len(self._used)}
+
+
+class SQLiteAttemptStore:
+    """Використані спроби в окремому файлі SQLite, спільному для воркерів.
+
+    Як і ratelimit.SQLiteStore, окремий файл не конкурує за блокування запису
+    з основною базою, куди пише буфер результатів.
+    """
+
+    CLEANUP_PROBABILITY = 0.01
+
+    def __init__(self, path, max_age, timeout=1.0):
+        self.path = path
+        self.max_age = max_age
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS quiz_attempts (
+                nonce TEXT PRIMARY KEY,
+                used_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_quiz_attempts_used ON quiz_attempts (used_at)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def claim(self, nonce):
+        """Позначає спробу використаною; AttemptInvalid, якщо її вже зараховано."""
+        conn = self._connection()
+        now = time.time()
+        claimed = conn.execute(
+            'INSERT OR IGNORE INTO quiz_attempts (nonce, used_at) VALUES (?, ?)', (nonce, now)
+        ).rowcount
+        if random.random() < self.CLEANUP_PROBABILITY:
+            conn.execute('DELETE FROM quiz_attempts WHERE used_at < ?', (now - self.max_age,))
+        if not claimed:
+            raise _already_used()
+
+    def stats(self):
+        return {'used': self._connection().execute('SELECT COUNT(*) FROM quiz_attempts').fetchone()[0]}
+
+
+class QuizEngine:
+
+    def __init__(self, sets_per_quiz=32, max_size=50):
+        self.sets_per_quiz = sets_per_quiz
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._bank = QuestionBank(None, {}, {}, {})
+
+    def ensure_current(self, conn):
+        version = db.get_version(conn, 'questions')[0]
+        if self._bank.version == version:
+            return
+        with self._lock:
+            if self._bank.version == version:
+                return
+            questions = {}
+            by_subject = {}
+            rows = conn.execute('SELECT id, subject, question, options, correct FROM questions ORDER BY id')
+            for question_id, subject, text, options, correct in rows:
+                questions[question_id] = (subject, text, json.loads(options), correct)
+                by_subject.setdefault(subject, []).append(question_id)
+            self._bank = QuestionBank(version, questions, by_subject, {})
+
+    def subjects(self):
+        return sorted(self._bank.by_subject)
+
+    def draw(self, subject=None, size=10):
+        """Випадковий із підготовлених наборів; LookupError, якщо запитань немає."""
+        bank = self._bank
+        if not (bank.by_subject.get(subject) if subject else bank.questions):
+            raise LookupError(subject)
+        index = random.randrange(self.sets_per_quiz)
+        return self.get(f'{bank.version}:{size}:{index}:{subject or ""}')
+
+    def get(self, quiz_id):
+        """Набір за ідентифікатором; KeyError для некоректного, QuizExpired для застарілого."""
+        bank = self._bank
+        quiz = bank.sets.get(quiz_id)
+        if quiz is not None:
+            return quiz
+        try:
+            version, size, index, subject = quiz_id.split(':', 3)
+            version, size, index = int(version), int(size), int(index)
+        except (AttributeError, ValueError):
+            raise KeyError(quiz_id)
+        if version != bank.version:
+            raise QuizExpired(quiz_id)
+        if not (1 <= size <= self.max_size and 0 <= index < self.sets_per_quiz):
+            raise KeyError(quiz_id)
+        if subject and subject not in bank.by_subject:
+            raise KeyError(quiz_id)
+
+        quiz = _build(bank, quiz_id, subject, size)
+        bank.sets[quiz_id] = quiz
+        return quiz
+
+    def score(self, quiz, answers):
+        """Повертає (бал, результати по запитаннях) для індексів обраних варіантів."""
+        if not isinstance(answers, list):
+            answers = []
+        answers = [a if type(a) is int else None for a in answers[:len(quiz.key)]]
+        answers += [None] * (len(quiz.key) - len(answers))
+        # Один прохід по ключу відповідей без звертань до бази
+        correct = list(map(eq, quiz.key, answers))
+
+        details = []
+        for item, answer, key, ok in zip(quiz.questions, answers, quiz.key, correct):
+            options = item['options']
+            details.append({
+                'question': item['question'],
+                'subject': item['subject'],
+                'userAnswer': options[answer] if answer is not None and 0 <= answer < len(options) else NO_ANSWER,
+                'correctAnswer': options[key],
+                'isCorrect': ok,
+            })
+        return sum(correct), details
+
+    def stats(self):
+        bank = self._bank
+        return {'version': bank.version, 'questions': len(bank.questions), 'quiz_sets': len(bank.sets)}
+
+
+def _build(bank, quiz_id, subject, size):
+    rng = random.Random(quiz_id)
+    pool = bank.by_subject[subject] if subject else list(bank.questions)
+    items = []
+    key = []
+    for question_id in rng.sample(pool, min(size, len(pool))):
+        question_subject, text, options, correct = bank.questions[question_id]
+        order = list(range(len(options)))
+        rng.shuffle(order)
+        items.append({'subject': question_subject, 'question': text, 'options': [options[i] for i in order]})
+        key.append(order.index(correct))
+
+    test_name = subject or DEFAULT_TEST
+    payload = json.dumps({'quiz_id': quiz_id, 'test_name': test_name, 'questions': items}, ensure_ascii=False)
+    return QuizSet(quiz_id, test_name, items, tuple(key), payload)
@@ -0,0 +1,249 @@
+"""Обмеження частоти запитів (token bucket) по IP, користувачу чи логіну.
+
+Ліміти задаються для ендпоінтів у RATE_LIMITS:
+
+    RATE_LIMITS = {'main.login': {'ip': '60/minute', 'username': '5/minute'}}
+
+Кошик на `N/період` вміщує N токенів і поповнюється рівномірно за період;
+кожен запит (крім GET/HEAD/OPTIONS) забирає токен. Порожній кошик — відповідь
+429 ще до звернення до бази чи bcrypt. Лічильники зберігаються в пам'яті
+процесу (MemoryStore) або, щоб їх бачили всі воркери gunicorn, в окремому
+файлі SQLite (RATE_LIMIT_STORAGE, SQLiteStore).
+"""
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, request, session
+
+Limit = namedtuple('Limit', 'capacity period')
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RateLimited(Exception):
+    """Ліміт вичерпано; retry_after — через скільки секунд з'явиться токен."""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+def parse_limit(value):
+    """'5/minute' -> Limit(5, 60)."""
+    count, _, period = value.partition('/')
+    try:
+        return Limit(int(count), PERIODS[period.strip()])
+    except (KeyError, ValueError):
+        raise ValueError(f'Некоректний ліміт: {value!r}')
+
+
+def _take(tokens, updated_at, now, limit):
+    """Поповнює кошик на момент now і пробує забрати токен.
+
+    Повертає (токени після запиту, 0 або секунди до наступного токена).
+    """
+    rate = limit.capacity / limit.period
+    tokens = min(limit.capacity, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+def _take_all(buckets, now):
+    """Токен з кожного кошика — або з жодного, якщо хоч один порожній.
+
+    buckets — список (токени, updated_at, ліміт). Повертає (нові токени або
+    None, якщо запит відхилено; найбільше очікування серед порожніх кошиків).
+    """
+    taken = [_take(tokens, updated_at, now, limit) for tokens, updated_at, limit in buckets]
+    retry_after = max((wait for _, wait in taken), default=0)
+    if retry_after:
+        return None, retry_after
+    return [tokens for tokens, _ in taken], 0
+
+
+class MemoryStore:
+    """Кошики в OrderedDict: найдавніше використані витісняються понад max_keys."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self.evictions = 0
+
+    def hit(self, key, limit):
+        return self.hit_all([(key, limit)])
+
+    def hit_all(self, items):
+        """items — пари (ключ, ліміт); токени забираються, лише якщо є в усіх кошиках."""
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._buckets.get(key, (limit.capacity, now)) + (limit,) for key, limit in items]
+            remaining, retry_after = _take_all(buckets, now)
+            if remaining is None:
+                return retry_after
+            for (key, _), tokens in zip(items, remaining):
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._buckets), 'evictions': self.evictions}
+
+
+class SQLiteStore:
+    """Спільні для процесів кошики в окремому файлі SQLite.
+
+    Окремий файл не конкурує за блокування запису з основною базою. Записи
+    з уже повним кошиком (expires_at у минулому) видаляються час від часу.
+    """
+
+    CLEANUP_PROBABILITY = 0.01
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_expires ON rate_limits (expires_at)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, limit):
+        return self.hit_all([(key, limit)])
+
+    def hit_all(self, items):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            buckets = []
+            for key, limit in items:
+                row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+                buckets.append(tuple(row if row is not None else (limit.capacity, now)) + (limit,))
+            remaining, retry_after = _take_all(buckets, now)
+            for (key, limit), tokens in zip(items, remaining or ()):
+                # Після expires_at кошик знову повний і запис можна забути
+                expires_at = now + (limit.capacity - tokens) * limit.period / limit.capacity
+                conn.execute(
+                    'INSERT INTO rate_limits (key, tokens, updated_at, expires_at) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, '
+                    'updated_at = excluded.updated_at, expires_at = excluded.expires_at',
+                    (key, tokens, now, expires_at)
+                )
+            if random.random() < self.CLEANUP_PROBABILITY:
+                conn.execute('DELETE FROM rate_limits WHERE expires_at < ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return retry_after
+
+    def reset(self, key):
+        self._connection().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rate_limits')
+
+    def stats(self):
+        return {'keys': self._connection().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]}
+
+
+class RateLimiter:
+
+    def __init__(self, limits, store):
+        self.store = store
+        self.limits = {
+            endpoint: [(scope, parse_limit(value)) for scope, value in rules.items()]
+            for endpoint, rules in limits.items()
+        }
+        self._lock = threading.Lock()
+        self.rejected = {}
+
+    def check(self, endpoint, keys):
+        """Забирає по токену з кожного кошика ендпоінта; RateLimited, якщо якийсь порожній.
+
+        keys — значення для областей ліміту ({'ip': ..., 'username': ...});
+        області без значення пропускаються. Відхилений запит не забирає токенів
+        і з інших кошиків: вичерпаний ліміт логіна не витрачає ліміт IP.
+        """
+        items = [
+            (f'{endpoint}:{scope}:{keys[scope]}', limit)
+            for scope, limit in self.limits.get(endpoint, ()) if keys.get(scope) is not None
+        ]
+        if not items:
+            return
+        retry_after = self.store.hit_all(items)
+        if retry_after:
+            with self._lock:
+                self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+            raise RateLimited(retry_after)
+
+    def reset(self, endpoint, scope, value):
+        self.store.reset(f'{endpoint}:{scope}:{value}')
+
+    def stats(self):
+        with self._lock:
+            rejected = dict(self.rejected)
+        return dict(self.store.stats(), rejected=rejected)
+
+
+def request_keys():
+    username = request.form.get('username')
+    return {
+        'ip': request.remote_addr,
+        'user': session.get('user_id'),
+        'username': username.strip().lower() if username else None,
+    }
+
+
+def limit_request():
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is None or request.method in SAFE_METHODS or request.endpoint not in limiter.limits:
+        return
+    limiter.check(request.endpoint, request_keys())
+
+
+def init_app(app):
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMIT_STORAGE', None)
+    app.config.setdefault('RATE_LIMIT_MAX_KEYS', 10000)
+    app.config.setdefault('RATE_LIMITS', {})
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+
+    storage = app.config['RATE_LIMIT_STORAGE']
+    store = SQLiteStore(storage) if storage else MemoryStore(app.config['RATE_LIMIT_MAX_KEYS'])
+    app.extensions['rate_limiter'] = RateLimiter(app.config['RATE_LIMITS'], store)
+    app.before_request(limit_request)
@@ -0,0 +1,228 @@
+"""Нагадування про терміни завдань: купа таймерів у пам'яті воркера.
+
+Замість щохвилинного сканування tasks планувальник раз на refresh_interval
+читає індексованим запитом лише вікно найближчих horizon_days днів і
+тримає нагадування в мін-купі за часом спрацювання. add_task/delete_task
+оновлюють купу одразу; потік спить до найближчого нагадування.
+
+Відправлене нагадування записується в task_reminders (завдання і термін). Воркерів може бути
+кілька, і в кожного своя купа, тож нагадування «забирає» той, чий INSERT
+спрацював першим, і лише якщо завдання досі існує, не виконане і має той
+самий термін. Після перезапуску купа відновлюється тим самим запитом.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import mailer
+
+Reminder = namedtuple('Reminder', 'task_id title subject due_date username email')
+
+WINDOW_SQL = '''
+    SELECT t.id, t.due_date FROM tasks t
+    WHERE t.completed = 0 AND t.due_date BETWEEN ? AND ?
+      AND NOT EXISTS (SELECT 1 FROM task_reminders r WHERE r.task_id = t.id AND r.due_date = t.due_date)
+'''
+
+
+class LocalSink:
+    """Складає нагадування в список: для розробки й тестів."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, conn, reminder):
+        self.sent.append(reminder)
+
+
+class OutboxSender:
+    """Лист у чергу email_outbox у тій самій транзакції, що й позначка про відправку."""
+
+    def __init__(self, wake=None):
+        self.wake = wake
+
+    def send(self, conn, reminder):
+        mailer.enqueue(
+            conn, reminder.email,
+            f'Нагадування: «{reminder.title}» до {reminder.due_date}',
+            f"Вітаємо, {reminder.username}!\n\n"
+            f"Термін завдання «{reminder.title}» ({reminder.subject}) — {reminder.due_date}."
+        )
+
+    def flush(self):
+        if self.wake is not None:
+            self.wake()
+
+
+class ReminderScheduler:
+
+    def __init__(self, pool, sender, days_before=1, hour=18, horizon_days=7,
+                 refresh_interval=3600.0, clock=time.time):
+        self.pool = pool
+        self.sender = sender
+        self.days_before = days_before
+        self.hour = hour
+        self.horizon_days = horizon_days
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._heap = []
+        # task_id -> (час спрацювання, порядковий номер запису в купі)
+        self._entries = {}
+        self._seq = itertools.count()
+        self._window = None
+        self._refresh_at = 0.0
+        self._stop = False
+        self._thread = None
+        self._counters = {'fired': 0, 'skipped': 0, 'rebuilds': 0}
+
+    def fire_time(self, due_date):
+        """Коли нагадати: о `hour` годині за `days_before` днів до терміну (місцевий час)."""
+        day = date.fromisoformat(due_date) - timedelta(days=self.days_before)
+        return datetime.combine(day, datetime.min.time()).replace(hour=self.hour).timestamp()
+
+    def _window_bounds(self, now):
+        today = datetime.fromtimestamp(now).date()
+        return today.isoformat(), (today + timedelta(days=self.days_before + self.horizon_days)).isoformat()
+
+    def _push(self, task_id, due_date):
+        try:
+            fire_at = self.fire_time(due_date)
+        except (TypeError, ValueError):
+            return
+        seq = next(self._seq)
+        self._entries[task_id] = (fire_at, seq)
+        heapq.heappush(self._heap, (fire_at, seq, task_id))
+
+    def rebuild(self, conn):
+        """Перечитує вікно найближчих термінів; повертає кількість нагадувань у купі."""
+        now = self.clock()
+        start, end = self._window_bounds(now)
+        rows = conn.execute(WINDOW_SQL, (start, end)).fetchall()
+        with self._cond:
+            self._heap = []
+            self._entries = {}
+            for task_id, due_date in rows:
+                self._push(task_id, due_date)
+            self._window = (start, end)
+            self._refresh_at = now + self.refresh_interval
+            self._counters['rebuilds'] += 1
+            self._cond.notify()
+            return len(self._entries)
+
+    def schedule(self, task_id, due_date):
+        """Нове чи змінене завдання; терміни поза вікном підхопить наступне перечитування."""
+        with self._cond:
+            self._entries.pop(task_id, None)
+            if self._window is None or not due_date or not self._window[0] <= due_date <= self._window[1]:
+                return
+            self._push(task_id, due_date)
+            self._cond.notify()
+
+    def cancel(self, task_id):
+        # Запис у купі лишається і пропускається, коли до нього дійде черга
+        with self._cond:
+            self._entries.pop(task_id, None)
+
+    def _pop_due(self, now):
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, seq, task_id = heapq.heappop(self._heap)
+                if self._entries.get(task_id) == (fire_at, seq):
+                    del self._entries[task_id]
+                    due.append(task_id)
+        return due
+
+    def _claim(self, conn, task_id, now):
+        row = conn.execute('''
+            SELECT t.title, t.subject, t.due_date, u.username, u.email
+            FROM tasks t JOIN users u ON u.id = t.user_id
+            WHERE t.id = ? AND t.completed = 0 AND t.due_date >= ?
+        ''', (task_id, self._window_bounds(now)[0])).fetchone()
+        if row is None:
+            return None
+        claimed = conn.execute(
+            'INSERT OR IGNORE INTO task_reminders (task_id, due_date) VALUES (?, ?)', (task_id, row[2])
+        ).rowcount
+        if not claimed:
+            return None
+        return Reminder(task_id, *row)
+
+    def run_pending(self):
+        """Надсилає нагадування, час яких настав; повертає кількість надісланих."""
+        now = self.clock()
+        due = self._pop_due(now)
+        if not due:
+            return 0
+        sent = 0
+        conn = self.pool.acquire()
+        try:
+            for task_id in due:
+                reminder = self._claim(conn, task_id, now)
+                if reminder is None:
+                    continue
+                self.sender.send(conn, reminder)
+                sent += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.release(conn)
+        if sent and hasattr(self.sender, 'flush'):
+            self.sender.flush()
+        with self._cond:
+            self._counters['fired'] += sent
+            self._counters['skipped'] += len(due) - sent
+        return sent
+
+    def _refresh(self):
+        conn = self.pool.acquire()
+        try:
+            self.rebuild(conn)
+        finally:
+            self.pool.release(conn)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stop:
+                    return
+                now = self.clock()
+                next_at = min(self._heap[0][0] if self._heap else self._refresh_at, self._refresh_at)
+                if next_at > now:
+                    self._cond.wait(next_at - now)
+                    continue
+            try:
+                if self.clock() >= self._refresh_at:
+                    self._refresh()
+                self.run_pending()
+            except Exception as e:
+                print(f"Помилка нагадувань: {e}")
+                with self._cond:
+                    self._cond.wait(5)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, scheduled=len(self._entries))
@@ -0,0 +1,159 @@
+"""Відкладений запис результатів тестів та агреговані рейтинги."""
+import atexit
+import threading
+import time
+
+DEFAULT_TEST = 'Загальний тест'
+
+INSERT_SQL = ('INSERT INTO test_results (user_id, test_name, score, total_questions, time_spent, answers) '
+              'VALUES (?, ?, ?, ?, ?, ?)')
+
+
+class ResultBuffer:
+    """Накопичує результати в пам'яті й записує їх однією транзакцією.
+
+    Запис відбувається кожні `flush_interval` секунд або щойно набереться
+    `batch_size` рядків, тож одночасне завершення тесту цілим класом дає
+    кілька комітів замість сотні. Під час зупинки (`stop`, atexit) буфер
+    дописується до кінця; при аварійному падінні процесу втрачаються лише
+    результати за останній інтервал.
+    """
+
+    def __init__(self, pool, batch_size=100, flush_interval=0.2, max_pending=10000):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {'submitted': 0, 'written': 0, 'batches': 0, 'errors': 0}
+
+    def submit(self, user_id, test_name, score, total, time_spent=None, answers=None):
+        with self._lock:
+            self._pending.append((user_id, test_name, score, total, time_spent, answers))
+            self._counters['submitted'] += 1
+            pending = len(self._pending)
+        if self._thread is None:
+            self.start()
+        if pending >= self.max_pending:
+            # Записувач не встигає — пишемо в потоці запиту, щоб не рости без меж
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Записує все накопичене; повертає кількість записаних рядків."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            conn = self.pool.acquire()
+            try:
+                with conn:
+                    conn.executemany(INSERT_SQL, batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                    self._counters['errors'] += 1
+                raise
+            finally:
+                self.pool.release(conn)
+            with self._lock:
+                self._counters['written'] += len(batch)
+                self._counters['batches'] += 1
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Помилка запису результатів тестів: {e}")
+                time.sleep(self.flush_interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='result-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=len(self._pending))
+
+
+def _percentiles(histogram, attempts, points=(50, 90)):
+    result = {}
+    cumulative = 0
+    targets = list(points)
+    for percent, count in histogram:
+        cumulative += count
+        while targets and cumulative * 100 >= targets[0] * attempts:
+            result[f'p{targets.pop(0)}'] = percent
+    return result
+
+
+def test_summary(conn, test_name):
+    """Спроби, найкращий і середній відсоток та перцентилі тесту без читання test_results."""
+    row = conn.execute(
+        'SELECT attempts, sum_percent, best_percent FROM test_stats WHERE test_name = ?', (test_name,)
+    ).fetchone()
+    if row is None:
+        return {'test_name': test_name, 'attempts': 0}
+    histogram = conn.execute(
+        'SELECT percent, count FROM test_score_histogram WHERE test_name = ? ORDER BY percent',
+        (test_name,)
+    ).fetchall()
+    summary = {
+        'test_name': test_name,
+        'attempts': row['attempts'],
+        'best_percent': row['best_percent'],
+        'mean_percent': round(row['sum_percent'] / row['attempts'], 1),
+    }
+    summary.update(_percentiles(histogram, row['attempts']))
+    return summary
+
+
+def user_stats(conn, user_id):
+    rows = conn.execute(
+        'SELECT test_name, attempts, best_score, best_percent, sum_percent, last_completed_at '
+        'FROM user_test_stats WHERE user_id = ? ORDER BY last_completed_at DESC',
+        (user_id,)
+    ).fetchall()
+    return [{
+        'test_name': row['test_name'],
+        'attempts': row['attempts'],
+        'best_score': row['best_score'],
+        'best_percent': row['best_percent'],
+        'mean_percent': round(row['sum_percent'] / row['attempts'], 1),
+        'last_completed_at': row['last_completed_at'],
+    } for row in rows]
+
+
+def leaderboard(conn, test_name, limit=10):
+    rows = conn.execute(
+        'SELECT u.username, s.best_score, s.best_percent, s.attempts '
+        'FROM user_test_stats s JOIN users u ON u.id = s.user_id '
+        'WHERE s.test_name = ? ORDER BY s.best_percent DESC, s.attempts LIMIT ?',
+        (test_name, limit)
+    ).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,48 @@
+"""Матеріалізований знімок розкладу з версіонуванням."""
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import db
+
+WEEKDAYS = ['Понеділок', 'Вівторок', 'Середа', 'Четвер', 'П\'ятниця']
+
+ScheduleSnapshot = namedtuple('ScheduleSnapshot', 'version last_modified days etag')
+
+
+def build_snapshot(conn, version, updated_at):
+    lessons = conn.execute('SELECT * FROM lessons ORDER BY weekday, start_minute').fetchall()
+
+    days = {day: [] for day in WEEKDAYS}
+    for lesson in lessons:
+        bucket = days.get(lesson['day_of_week'])
+        if bucket is not None:
+            bucket.append(dict(lesson))
+
+    last_modified = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return ScheduleSnapshot(version, last_modified, days, f'schedule-{version}')
+
+
+class ScheduleCache:
+    """Знімок розкладу для поточної версії.
+
+    Версія зберігається в таблиці `data_versions` і збільшується в тій самій
+    транзакції, що змінює `lessons`, тому всі процеси бачать інвалідацію.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get(self, conn):
+        version, updated_at = db.get_version(conn, 'lessons')
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = build_snapshot(conn, version, updated_at)
+                self._snapshot = snapshot
+        return snapshot
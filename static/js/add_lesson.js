@@ -0,0 +1,36 @@
+document.getElementById('time_start').addEventListener('change', function() {
+    const timeEnd = document.getElementById('time_end');
+    const timeMap = {
+        '08:00': '09:35',
+        '09:50': '11:25', 
+        '11:40': '13:15',
+        '14:00': '15:35',
+        '15:50': '17:25',
+        '17:40': '19:15'
+    };
+    
+    if (timeMap[this.value]) {
+        timeEnd.value = timeMap[this.value];
+    }
+});
+
+document.getElementById('addLessonForm').addEventListener('submit', function(e) {
+    const subject = document.getElementById('subject').value;
+    const teacher = document.getElementById('teacher').value;
+    const classroom = document.getElementById('classroom').value;
+    const dayOfWeek = document.getElementById('day_of_week').value;
+    const timeStart = document.getElementById('time_start').value;
+    const timeEnd = document.getElementById('time_end').value;
+    
+    if (!subject || !teacher || !classroom || !dayOfWeek || !timeStart || !timeEnd) {
+        e.preventDefault();
+        alert('Будь ласка, заповніть всі поля');
+        return;
+    }
+    
+    if (teacher.length < 2) {
+        e.preventDefault();
+        alert('Введіть повне ім\'я вчителя');
+        return;
+    }
+});
@@ -29,9 +29,8 @@ function initializeTooltips() {
 }
 
 function initializeLocalStorage() {
-    if (!localStorage.getItem('tasks')) {
-        localStorage.setItem('tasks', JSON.stringify([]));
-    }
+    // Раніше тут зберігався весь список завдань; тепер він завантажується з сервера
+    localStorage.removeItem('tasks');
     
     if (!localStorage.getItem('userSettings')) {
         localStorage.setItem('userSettings', JSON.stringify({
@@ -71,20 +70,42 @@ function applyTheme(theme) {
     localStorage.setItem('theme', theme);
 }
 
-function saveTaskToLocalStorage(task) {
-    const tasks = JSON.parse(localStorage.getItem('tasks') || '[]');
-    tasks.push(task);
-    localStorage.setItem('tasks', JSON.stringify(tasks));
-}
-
-function removeTaskFromLocalStorage(taskId) {
-    const tasks = JSON.parse(localStorage.getItem('tasks') || '[]');
-    const updatedTasks = tasks.filter(task => task.id !== taskId);
-    localStorage.setItem('tasks', JSON.stringify(updatedTasks));
+// Зміни завдань після ревізії since: {changed, deleted, revision, summary}.
+// reset означає, що сервер «молодший» за since (наприклад, після відновлення
+// БД) і список треба завантажити заново
+async function syncTasks(since) {
+    const delta = {changed: [], deleted: [], revision: since, summary: null, reset: false};
+    
+    while (true) {
+        const response = await fetch(`/api/tasks/changes?since=${delta.revision}`);
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.message);
+        }
+        
+        if (data.revision < delta.revision) {
+            delta.reset = true;
+            return delta;
+        }
+        
+        delta.changed.push(...data.changed);
+        delta.deleted.push(...data.deleted);
+        delta.revision = data.revision;
+        
+        if (!data.more) {
+            delta.summary = data.summary;
+            return delta;
+        }
+    }
 }
 
-function getTasksFromLocalStorage() {
-    return JSON.parse(localStorage.getItem('tasks') || '[]');
+// Зміни розкладу й завдань із /events (Server-Sent Events); після обриву
+// EventSource перепідключається сам і передає Last-Event-ID
+function subscribeToEvents(onEvent) {
+    if (!window.EventSource) return null;
+    const source = new EventSource('/events');
+    source.onmessage = message => onEvent(JSON.parse(message.data));
+    return source;
 }
 
 function showNotification(message, type = 'info') {
@@ -312,9 +333,7 @@ window.AppUtils = {
     setCookie,
     getCookie,
     deleteCookie,
-    saveTaskToLocalStorage,
-    removeTaskFromLocalStorage,
-    getTasksFromLocalStorage,
+    syncTasks,
     getUserSettings,
     saveUserSettings
 };
@@ -0,0 +1,17 @@
+// Перевірка форми реєстрації перед надсиланням
+document.getElementById('registerForm').addEventListener('submit', function(e) {
+    const password = document.getElementById('password').value;
+    const confirmPassword = document.getElementById('confirm_password').value;
+
+    if (password.length < 6) {
+        e.preventDefault();
+        alert('Пароль повинен містити мінімум 6 символів');
+        return;
+    }
+
+    if (password !== confirmPassword) {
+        e.preventDefault();
+        alert('Паролі не збігаються');
+        return;
+    }
+});
@@ -0,0 +1,104 @@
+// Дії з уроками та оновлення розкладу в реальному часі
+
+// Права й версія розкладу передаються атрибутами тегу <script>: розмітка
+// днів кешується, тож вбудовувати їх у неї не можна
+const scheduleScript = document.currentScript.dataset;
+const CAN_EDIT = scheduleScript.canEdit === 'true';
+let scheduleVersion = Number(scheduleScript.version);
+
+function lessonMinutes(time) {
+    const [hours, minutes] = time.split(':').map(Number);
+    return hours * 60 + minutes;
+}
+
+function insertLesson(lesson) {
+    const dayBody = document.querySelector(`[data-day="${lesson.day_of_week}"]`);
+    if (!dayBody || document.querySelector(`[data-lesson-id="${lesson.id}"]`)) return;
+    let timeline = dayBody.querySelector('.timeline');
+    if (!timeline) {
+        dayBody.innerHTML = '<div class="timeline"></div>';
+        timeline = dayBody.querySelector('.timeline');
+    }
+    
+    const item = document.createElement('div');
+    item.className = 'timeline-item mb-3';
+    item.dataset.lessonId = lesson.id;
+    item.dataset.timeStart = lesson.time_start;
+    item.innerHTML = `
+        <div class="card border-start border-4 border-info">
+            <div class="card-body">
+                <div class="d-flex justify-content-between align-items-start">
+                    <div>
+                        <h6 class="card-title mb-1 lesson-subject"></h6>
+                        <p class="card-text mb-1"><small class="text-muted lesson-time"></small></p>
+                        <p class="card-text mb-1"><small class="lesson-teacher"></small></p>
+                        <p class="card-text mb-0"><small class="lesson-classroom"></small></p>
+                    </div>
+                </div>
+            </div>
+        </div>`;
+    item.querySelector('.lesson-subject').textContent = `📚 ${lesson.subject}`;
+    item.querySelector('.lesson-time').textContent = `🕐 ${lesson.time_start} - ${lesson.time_end}`;
+    item.querySelector('.lesson-teacher').textContent = `👨‍🏫 ${lesson.teacher}`;
+    item.querySelector('.lesson-classroom').textContent = `🏫 Кабінет: ${lesson.classroom}`;
+    if (CAN_EDIT) {
+        const remove = document.createElement('button');
+        remove.className = 'btn btn-sm btn-outline-danger';
+        remove.textContent = '🗑️';
+        remove.onclick = () => deleteLesson(lesson.id);
+        item.querySelector('.d-flex').appendChild(remove);
+    }
+    
+    const start = lessonMinutes(lesson.time_start);
+    const next = Array.from(timeline.children).find(other => lessonMinutes(other.dataset.timeStart) > start);
+    timeline.insertBefore(item, next || null);
+}
+
+// Сторінка оновлюється подіями, лише якщо не пропущено жодної зміни розкладу;
+// інакше (або для масових змін) вона перезавантажується
+subscribeToEvents(event => {
+    if (event.type === 'hello') {
+        if (event.lessons_version !== scheduleVersion) location.reload();
+    } else if (event.type === 'reset' || event.type === 'lessons_replaced') {
+        location.reload();
+    } else if (event.type === 'lesson_added' || event.type === 'lesson_deleted') {
+        if (event.version !== scheduleVersion + 1) {
+            location.reload();
+            return;
+        }
+        scheduleVersion = event.version;
+        if (event.type === 'lesson_added') {
+            insertLesson(event.lesson);
+        } else {
+            const item = document.querySelector(`[data-lesson-id="${event.id}"]`);
+            if (item) item.remove();
+        }
+    }
+});
+
+function editLesson(lessonId) {
+    alert('Функція редагування буде додана в наступних версіях');
+}
+
+function deleteLesson(lessonId) {
+    if (confirm('Ви впевнені, що хочете видалити цей урок?')) {
+        fetch(`/delete_lesson/${lessonId}`, {
+            method: 'DELETE',
+            headers: {
+                'Content-Type': 'application/json',
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                location.reload();
+            } else {
+                alert('Помилка при видаленні уроку');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Помилка при видаленні уроку');
+        });
+    }
+}
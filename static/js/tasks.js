@@ -0,0 +1,314 @@
+const TASKS_PAGE_SIZE = 20;
+let nextCursor = null;
+let tasksLoading = false;
+let tasksExhausted = false;
+// Збільшується при перезавантаженні списку, щоб відповідь на запит до
+// старого списку не дописалась у новий
+let tasksGeneration = 0;
+// Завантажені рядки у порядку (due_date, id) і ревізія, з якої вони актуальні
+let loadedTasks = [];
+let tasksRevision = null;
+// Зміни, що прийшли, поки вантажилась сторінка: після її показу застосовуються
+// ще раз, бо сторінку могли вибрати до цих змін
+let changesDuringLoad = null;
+
+function taskQuery() {
+    const params = new URLSearchParams({limit: TASKS_PAGE_SIZE});
+    const subject = document.getElementById('filterSubject').value;
+    const completed = document.getElementById('filterCompleted').value;
+    if (subject) params.set('subject', subject);
+    if (completed) params.set('completed', completed);
+    if (nextCursor) params.set('cursor', nextCursor);
+    return params;
+}
+
+function taskMatchesFilters(task) {
+    const subject = document.getElementById('filterSubject').value;
+    const completed = document.getElementById('filterCompleted').value;
+    if (subject && task.subject !== subject) return false;
+    if (completed && String(Number(task.completed)) !== completed) return false;
+    return true;
+}
+
+// Той самий порядок, що й у /api/tasks: ORDER BY due_date, id (NULL — першими)
+function compareTasks(a, b) {
+    if (a.due_date !== b.due_date) {
+        if (a.due_date === null) return -1;
+        if (b.due_date === null) return 1;
+        return a.due_date < b.due_date ? -1 : 1;
+    }
+    return a.id - b.id;
+}
+
+function renderTask(task) {
+    const today = new Date().toISOString().split('T')[0];
+    const card = document.createElement('div');
+    card.className = 'card mb-3 task-item';
+    card.dataset.taskId = task.id;
+    card.innerHTML = `
+        <div class="card-body">
+            <div class="d-flex justify-content-between align-items-start">
+                <div class="flex-grow-1">
+                    <h6 class="card-title"><span class="task-title"></span></h6>
+                    <p class="card-text task-description"></p>
+                    <div class="d-flex gap-3">
+                        <small class="text-muted task-subject"></small>
+                        <small class="text-muted task-due"></small>
+                    </div>
+                </div>
+                <div class="dropdown">
+                    <button class="btn btn-sm btn-outline-secondary dropdown-toggle"
+                            type="button" data-bs-toggle="dropdown">⚙️</button>
+                    <ul class="dropdown-menu">
+                        <li><a class="dropdown-item task-toggle" href="#"></a></li>
+                        <li><a class="dropdown-item task-edit" href="#">✏️ Редагувати</a></li>
+                        <li><hr class="dropdown-divider"></li>
+                        <li><a class="dropdown-item text-danger task-delete" href="#">🗑️ Видалити</a></li>
+                    </ul>
+                </div>
+            </div>
+        </div>`;
+    
+    const title = card.querySelector('.task-title');
+    title.textContent = task.title;
+    const badge = document.createElement('span');
+    if (task.completed) {
+        title.className = 'text-decoration-line-through text-muted';
+        badge.className = 'badge bg-success ms-2';
+        badge.textContent = '✅ Виконано';
+    } else if (task.due_date && task.due_date < today) {
+        badge.className = 'badge bg-danger ms-2';
+        badge.textContent = '⏰ Прострочено';
+    } else if (task.due_date === today) {
+        badge.className = 'badge bg-warning ms-2';
+        badge.textContent = '📅 Сьогодні';
+    }
+    if (badge.textContent) title.after(badge);
+    
+    card.querySelector('.task-description').textContent = task.description || 'Немає опису';
+    card.querySelector('.task-subject').textContent = `📚 Предмет: ${task.subject}`;
+    card.querySelector('.task-due').textContent = task.due_date ? `📅 Дедлайн: ${task.due_date}` : '';
+    
+    const toggle = card.querySelector('.task-toggle');
+    toggle.textContent = task.completed ? '↩️ Повернути в роботу' : '✅ Позначити виконаним';
+    toggle.onclick = () => toggleTaskComplete(task.id, !task.completed);
+    card.querySelector('.task-edit').onclick = () => editTask(task.id);
+    card.querySelector('.task-delete').onclick = () => deleteTask(task.id);
+    return card;
+}
+
+function renderSummary(summary) {
+    document.getElementById('statTotal').textContent = summary.total;
+    document.getElementById('statCompleted').textContent = summary.completed;
+    document.getElementById('statPending').textContent = summary.pending;
+    
+    const progressBlock = document.getElementById('statProgressBlock');
+    progressBlock.classList.toggle('d-none', summary.total === 0);
+    if (summary.total > 0) {
+        const progress = Math.round(summary.completed / summary.total * 100);
+        const bar = document.getElementById('statProgress');
+        bar.style.width = `${progress}%`;
+        bar.textContent = `${progress}%`;
+    }
+}
+
+function updateTasksState() {
+    document.getElementById('tasksSentinel').classList.toggle('d-none', tasksExhausted);
+    document.getElementById('tasksEmpty').classList.toggle('d-none', !tasksExhausted || loadedTasks.length > 0);
+}
+
+// Кожна сторінка — окремий запит до /api/tasks з курсором попередньої
+function loadNextPage() {
+    if (tasksLoading || tasksExhausted) return;
+    tasksLoading = true;
+    changesDuringLoad = {changed: [], deleted: []};
+    const generation = tasksGeneration;
+    
+    fetch(`/api/tasks?${taskQuery()}`)
+    .then(response => response.json())
+    .then(data => {
+        if (generation !== tasksGeneration) return;
+        if (!data.success) throw new Error(data.message);
+        if (data.summary) renderSummary(data.summary);
+        if (data.revision !== undefined) tasksRevision = data.revision;
+        
+        const container = document.getElementById('tasksContainer');
+        data.tasks.forEach(task => {
+            loadedTasks.push(task);
+            container.appendChild(renderTask(task));
+        });
+        
+        nextCursor = data.next_cursor;
+        tasksExhausted = !nextCursor;
+        const missed = changesDuringLoad;
+        changesDuringLoad = null;
+        applyTaskChanges(missed.changed, missed.deleted);
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        document.getElementById('tasksSentinel').textContent = 'Помилка завантаження завдань';
+    })
+    .finally(() => {
+        if (generation === tasksGeneration) {
+            tasksLoading = false;
+            changesDuringLoad = null;
+        }
+    });
+}
+
+function reloadTasks() {
+    tasksGeneration++;
+    nextCursor = null;
+    tasksLoading = false;
+    tasksExhausted = false;
+    loadedTasks = [];
+    tasksRevision = null;
+    document.getElementById('tasksContainer').innerHTML = '';
+    document.getElementById('tasksEmpty').classList.add('d-none');
+    document.getElementById('tasksSentinel').classList.remove('d-none');
+    loadNextPage();
+}
+
+function removeLoadedTask(taskId) {
+    const index = loadedTasks.findIndex(task => task.id === taskId);
+    if (index < 0) return;
+    loadedTasks.splice(index, 1);
+    document.getElementById('tasksContainer').children[index].remove();
+}
+
+// Зміни стосуються лише вже завантажених рядків: завдання, що за порядком
+// потрапляє далі за останній рядок, прийде з наступною сторінкою.
+// Повторне застосування тих самих змін нічого не ламає
+function applyTaskChanges(changed, deleted) {
+    if (changesDuringLoad) {
+        changesDuringLoad.changed.push(...changed);
+        changesDuringLoad.deleted.push(...deleted);
+    }
+    
+    const container = document.getElementById('tasksContainer');
+    changed.forEach(task => {
+        removeLoadedTask(task.id);
+        if (!taskMatchesFilters(task)) return;
+        let index = loadedTasks.findIndex(other => compareTasks(task, other) < 0);
+        if (index < 0) {
+            if (!tasksExhausted) return;
+            index = loadedTasks.length;
+        }
+        loadedTasks.splice(index, 0, task);
+        container.insertBefore(renderTask(task), container.children[index] || null);
+    });
+    deleted.forEach(removeLoadedTask);
+    updateTasksState();
+}
+
+function refreshTasks() {
+    // Поки перша сторінка не прийшла, ревізії ще немає — вона прийде разом зі сторінкою
+    if (tasksRevision === null) return Promise.resolve();
+    const generation = tasksGeneration;
+    
+    return syncTasks(tasksRevision)
+    .then(delta => {
+        if (generation !== tasksGeneration) return;
+        if (delta.reset) {
+            reloadTasks();
+            return;
+        }
+        tasksRevision = Math.max(tasksRevision, delta.revision);
+        applyTaskChanges(delta.changed, delta.deleted);
+        if (delta.summary) renderSummary(delta.summary);
+    })
+    .catch(error => console.error('Error:', error));
+}
+
+reloadTasks();
+
+// Події несуть і саме завдання, і нові лічильники, тож застосовуються без
+// запитів; після 'reset' (пропущені події) добираємо зміни з /api/tasks/changes
+subscribeToEvents(event => {
+    if (event.type === 'task_added') {
+        applyTaskChanges([event.task], []);
+        renderSummary(event.summary);
+    } else if (event.type === 'task_deleted') {
+        applyTaskChanges([], [event.id]);
+        renderSummary(event.summary);
+    } else if (event.type === 'reset') {
+        refreshTasks();
+    }
+});
+
+new IntersectionObserver(entries => {
+    if (entries.some(entry => entry.isIntersecting)) loadNextPage();
+}).observe(document.getElementById('tasksSentinel'));
+
+function addTask() {
+    const title = document.getElementById('taskTitle').value;
+    const description = document.getElementById('taskDescription').value;
+    const subject = document.getElementById('taskSubject').value;
+    const dueDate = document.getElementById('taskDueDate').value;
+    
+    if (!title || !subject) {
+        alert('Будь ласка, заповніть обов\'язкові поля');
+        return;
+    }
+    
+    fetch('/add_task', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            title: title,
+            description: description,
+            subject: subject,
+            due_date: dueDate
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            bootstrap.Modal.getInstance(document.getElementById('addTaskModal')).hide();
+            document.getElementById('addTaskForm').reset();
+            refreshTasks();
+        } else {
+            alert('Помилка при додаванні завдання');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Помилка при додаванні завдання');
+    });
+}
+
+function deleteTask(taskId) {
+    if (confirm('Ви впевнені, що хочете видалити це завдання?')) {
+        fetch(`/delete_task/${taskId}`, {
+            method: 'DELETE',
+            headers: {
+                'Content-Type': 'application/json',
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                refreshTasks();
+            } else {
+                alert('Помилка при видаленні завдання');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Помилка при видаленні завдання');
+        });
+    }
+}
+
+function toggleTaskComplete(taskId, completed) {
+    console.log(`Завдання ${taskId} ${completed ? 'виконано' : 'повернуто в роботу'}`);
+    location.reload();
+}
+
+function editTask(taskId) {
+    alert('Функція редагування буде додана в наступних версіях');
+}
+
+document.getElementById('taskDueDate').min = new Date().toISOString().split('T')[0];
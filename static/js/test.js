@@ -0,0 +1,232 @@
+// Запитання видає сервер (/api/quiz); правильних відповідей клієнт не знає
+let questions = [];
+let attempt = null;
+
+let currentQuestion = 0;
+let userAnswers = [];
+let startTime = null;
+
+function startTest() {
+    const subject = document.getElementById('quizSubject').value;
+    const params = new URLSearchParams({ size: 10 });
+    if (subject) {
+        params.set('subject', subject);
+    }
+    
+    fetch(`/api/quiz?${params}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(quiz => {
+            questions = quiz.questions;
+            attempt = quiz.attempt;
+            document.getElementById('instructions').style.display = 'none';
+            document.getElementById('testContainer').style.display = 'block';
+            startTime = new Date();
+            currentQuestion = 0;
+            userAnswers = [];
+            showQuestion();
+        })
+        .catch(error => {
+            console.error('Помилка завантаження тесту:', error);
+            alert('Не вдалося завантажити тест. Спробуйте пізніше.');
+        });
+}
+
+function showQuestion() {
+    const question = questions[currentQuestion];
+    const container = document.getElementById('questionContainer');
+    
+    container.innerHTML = `
+        <div class="card">
+            <div class="card-header">
+                <div class="d-flex justify-content-between align-items-center">
+                    <span class="badge bg-secondary">${question.subject}</span>
+                    <span class="text-muted">Запитання ${currentQuestion + 1} з ${questions.length}</span>
+                </div>
+            </div>
+            <div class="card-body">
+                <h5 class="card-title">${question.question}</h5>
+                <div class="mt-3">
+                    ${question.options.map((option, index) => `
+                        <div class="form-check mb-2">
+                            <input class="form-check-input" type="radio" 
+                                   name="answer" value="${index}" id="option${index}"
+                                   ${userAnswers[currentQuestion] === index ? 'checked' : ''}>
+                            <label class="form-check-label" for="option${index}">
+                                ${option}
+                            </label>
+                        </div>
+                    `).join('')}
+                </div>
+            </div>
+        </div>
+    `;
+    
+    updateProgress();
+    updateButtons();
+}
+
+function updateProgress() {
+    const progress = ((currentQuestion + 1) / questions.length) * 100;
+    const progressBar = document.getElementById('progressBar');
+    progressBar.style.width = progress + '%';
+    progressBar.textContent = `${currentQuestion + 1}/${questions.length}`;
+}
+
+function updateButtons() {
+    const prevBtn = document.getElementById('prevBtn');
+    const nextBtn = document.getElementById('nextBtn');
+    const finishBtn = document.getElementById('finishBtn');
+    
+    prevBtn.style.display = currentQuestion > 0 ? 'block' : 'none';
+    
+    if (currentQuestion === questions.length - 1) {
+        nextBtn.style.display = 'none';
+        finishBtn.style.display = 'block';
+    } else {
+        nextBtn.style.display = 'block';
+        finishBtn.style.display = 'none';
+    }
+}
+
+function nextQuestion() {
+    saveCurrentAnswer();
+    if (currentQuestion < questions.length - 1) {
+        currentQuestion++;
+        showQuestion();
+    }
+}
+
+function previousQuestion() {
+    saveCurrentAnswer();
+    if (currentQuestion > 0) {
+        currentQuestion--;
+        showQuestion();
+    }
+}
+
+function saveCurrentAnswer() {
+    const selectedOption = document.querySelector('input[name="answer"]:checked');
+    if (selectedOption) {
+        userAnswers[currentQuestion] = parseInt(selectedOption.value);
+    }
+}
+
+function finishTest() {
+    saveCurrentAnswer();
+    
+    const endTime = new Date();
+    const timeSpent = Math.round((endTime - startTime) / 1000); // в секундах
+    
+    fetch('/submit_test', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            attempt: attempt,
+            answers: questions.map((_, i) => userAnswers[i] !== undefined ? userAnswers[i] : null),
+            timeSpent: timeSpent
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            alert(data.message);
+            retakeTest();
+            return;
+        }
+        showResults(data.score, timeSpent, data.results);
+    })
+    .catch(error => {
+        console.error('Помилка перевірки тесту:', error);
+    });
+}
+
+function showResults(score, timeSpent, results) {
+    document.getElementById('testContainer').style.display = 'none';
+    document.getElementById('resultsContainer').style.display = 'block';
+    
+    const percentage = Math.round((score / questions.length) * 100);
+    let grade = '';
+    let badgeClass = '';
+    
+    if (percentage >= 90) {
+        grade = 'Відмінно';
+        badgeClass = 'bg-success';
+    } else if (percentage >= 75) {
+        grade = 'Добре';
+        badgeClass = 'bg-info';
+    } else if (percentage >= 60) {
+        grade = 'Задовільно';
+        badgeClass = 'bg-warning';
+    } else {
+        grade = 'Незадовільно';
+        badgeClass = 'bg-danger';
+    }
+    
+    document.getElementById('scoreDisplay').innerHTML = `
+        <div class="card">
+            <div class="card-body text-center">
+                <h1 class="display-4 text-primary">${score}/${questions.length}</h1>
+                <h3><span class="badge ${badgeClass}">${grade} (${percentage}%)</span></h3>
+                <p class="text-muted">Час виконання: ${Math.floor(timeSpent / 60)}:${(timeSpent % 60).toString().padStart(2, '0')}</p>
+            </div>
+        </div>
+    `;
+    
+    const detailedResultsHtml = `
+        <div class="card">
+            <div class="card-header">
+                <h5>📊 Детальні результати</h5>
+            </div>
+            <div class="card-body">
+                <div class="table-responsive">
+                    <table class="table table-striped">
+                        <thead>
+                            <tr>
+                                <th>Предмет</th>
+                                <th>Запитання</th>
+                                <th>Ваша відповідь</th>
+                                <th>Правильна відповідь</th>
+                                <th>Результат</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            ${results.map((result, index) => `
+                                <tr>
+                                    <td><span class="badge bg-secondary">${result.subject}</span></td>
+                                    <td>${result.question}</td>
+                                    <td class="${result.isCorrect ? 'text-success' : 'text-danger'}">
+                                        ${result.userAnswer}
+                                    </td>
+                                    <td class="text-success">${result.correctAnswer}</td>
+                                    <td>
+                                        ${result.isCorrect ? 
+                                            '<span class="badge bg-success">✅</span>' : 
+                                            '<span class="badge bg-danger">❌</span>'
+                                        }
+                                    </td>
+                                </tr>
+                            `).join('')}
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    document.getElementById('detailedResults').innerHTML = detailedResultsHtml;
+}
+
+function retakeTest() {
+    document.getElementById('resultsContainer').style.display = 'none';
+    document.getElementById('testContainer').style.display = 'none';
+    document.getElementById('instructions').style.display = 'block';
+    currentQuestion = 0;
+    userAnswers = [];
+}
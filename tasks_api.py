@@ -0,0 +1,138 @@
+"""Вибірка завдань для JSON API з курсорною (keyset) пагінацією."""
+import base64
+import json
+from datetime import date
+
+FIELDS = ('id', 'title', 'description', 'subject', 'due_date', 'completed', 'created_at')
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(due_date, task_id):
+    raw = json.dumps([due_date, task_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        due_date, task_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Некоректний курсор')
+    if not isinstance(task_id, int) or not (due_date is None or isinstance(due_date, str)):
+        raise ValueError('Некоректний курсор')
+    return due_date, task_id
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f'Параметр {name} має бути датою РРРР-ММ-ДД')
+
+
+def parse_fields(value):
+    if not value:
+        return FIELDS
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f'Невідомі поля: {", ".join(sorted(unknown))}')
+    # id та due_date потрібні для курсора наступної сторінки
+    return tuple(dict.fromkeys(['id', 'due_date'] + fields))
+
+
+def query_tasks(conn, user_id, args):
+    """Повертає одну сторінку завдань користувача у порядку (due_date, id).
+
+    Порядок збігається з індексом idx_tasks_user_due (id — це rowid, що
+    неявно входить в індекс), тож кожна сторінка — це пошук по індексу без
+    OFFSET, незалежно від того, наскільки далеко гортає користувач.
+    """
+    try:
+        limit = min(max(int(args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ValueError('Параметр limit має бути числом')
+    fields = parse_fields(args.get('fields'))
+
+    where = ['user_id = ?']
+    params = [user_id]
+
+    if args.get('subject'):
+        where.append('subject = ?')
+        params.append(args['subject'])
+    if args.get('completed') in ('0', '1', 'true', 'false'):
+        where.append('completed = ?')
+        params.append(1 if args['completed'] in ('1', 'true') else 0)
+    if args.get('due_from'):
+        where.append('due_date >= ?')
+        params.append(_parse_date(args['due_from'], 'due_from'))
+    if args.get('due_to'):
+        where.append('due_date <= ?')
+        params.append(_parse_date(args['due_to'], 'due_to'))
+
+    if args.get('cursor'):
+        due_date, task_id = decode_cursor(args['cursor'])
+        # SQLite сортує NULL першими, тому завдання без дедлайну йдуть на початку
+        if due_date is None:
+            where.append('((due_date IS NULL AND id > ?) OR due_date IS NOT NULL)')
+            params.append(task_id)
+        else:
+            where.append('(due_date > ? OR (due_date = ? AND id > ?))')
+            params.extend([due_date, due_date, task_id])
+
+    rows = conn.execute(
+        f'SELECT {", ".join(fields)} FROM tasks WHERE {" AND ".join(where)} '
+        f'ORDER BY due_date, id LIMIT ?',
+        params + [limit + 1]
+    ).fetchall()
+
+    tasks = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = tasks[-1]
+        next_cursor = encode_cursor(last['due_date'], last['id'])
+    return tasks, next_cursor
+
+
+def current_revision(conn):
+    return conn.execute("SELECT version FROM data_versions WHERE name = 'tasks'").fetchone()[0]
+
+
+def changes(conn, user_id, since, limit=500):
+    """Зміни завдань користувача після ревізії `since`.
+
+    Повертає змінені/нові завдання, id видалених завдань та ревізію, з якої
+    клієнт має продовжити. Якщо змін більше за `limit`, `more` = True.
+    """
+    # Спершу фіксуємо верхню межу: зміни, закомічені пізніше, отримають
+    # більшу ревізію і потраплять у наступну синхронізацію
+    upto = current_revision(conn)
+    rows = conn.execute(
+        f'SELECT {", ".join(FIELDS)}, revision FROM tasks '
+        'WHERE user_id = ? AND revision > ? AND revision <= ? ORDER BY revision LIMIT ?',
+        (user_id, since, upto, limit + 1)
+    ).fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if more:
+        upto = rows[-1]['revision']
+
+    deleted = [row[0] for row in conn.execute(
+        'SELECT task_id FROM task_tombstones WHERE user_id = ? AND revision > ? AND revision <= ?',
+        (user_id, since, upto)
+    )]
+    return {
+        'revision': upto,
+        'changed': [dict(row) for row in rows],
+        'deleted': deleted,
+        'more': more,
+    }
+
+
+def summary(conn, user_id):
+    row = conn.execute(
+        'SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM tasks WHERE user_id = ?', (user_id,)
+    ).fetchone()
+    return {'total': row[0], 'completed': row[1], 'pending': row[0] - row[1]}
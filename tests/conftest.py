@@ -0,0 +1,147 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+import db
+import events
+import metrics
+from app import close_app, create_app, init_db
+from conflicts import ScheduleEngine
+from quizzes import QuizEngine
+from analytics import ResultAnalytics
+from config import TestingConfig
+from schedule_cache import ScheduleCache
+
+
+class TransactionalConnection(metrics.InstrumentedConnection):
+    """З'єднання, у якого кожен тест виконується в одній транзакції, що відкочується в кінці.
+
+    commit() і rollback() додатку працюють із точкою збереження всередині
+    транзакції тесту, тому схема створюється один раз на сесію.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs['isolation_level'] = None
+        super().__init__(*args, **kwargs)
+        self.in_test = False
+
+    def execute(self, sql, parameters=()):
+        # BEGIN IMMEDIATE додатку: транзакція тесту вже відкрита
+        if self.in_test and sql.lstrip().upper().startswith('BEGIN'):
+            return self.cursor()
+        return super().execute(sql, parameters)
+
+    def commit(self):
+        if self.in_test:
+            super().execute('RELEASE SAVEPOINT app')
+            super().execute('SAVEPOINT app')
+        else:
+            super().commit()
+
+    def rollback(self):
+        if self.in_test:
+            super().execute('ROLLBACK TO SAVEPOINT app')
+        else:
+            super().rollback()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def begin_test(self):
+        super().execute('BEGIN')
+        super().execute('SAVEPOINT app')
+        self.in_test = True
+
+    def end_test(self):
+        self.in_test = False
+        super().rollback()
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app(TestingConfig)
+    app.config['DB_CONNECTION_FACTORY'] = TransactionalConnection
+    # База в пам'яті існує, доки відкрите хоча б одне з'єднання
+    keeper = sqlite3.connect(app.config['DATABASE'], uri=True)
+    with app.app_context():
+        init_db()
+    yield app
+    close_app(app)
+    keeper.close()
+
+
+@pytest.fixture
+def client(app):
+    pool = db.get_pool(app)
+    conn = pool.acquire()
+    conn.begin_test()
+    pool.release(conn)
+    app.extensions['schedule_cache'] = ScheduleCache()
+    app.extensions['schedule_engine'] = ScheduleEngine()
+    app.extensions['quiz_engine'] = QuizEngine(app.config['QUIZ_SETS_PER_QUIZ'], app.config['QUIZ_MAX_SIZE'])
+    app.extensions['result_analytics'] = ResultAnalytics()
+    # Після відкату версії даних повторюються, тож фрагменти попереднього тесту не годяться
+    app.extensions['fragment_cache'].clear()
+    app.extensions['calendar_cache'].clear()
+    app.extensions['rate_limiter'].store.clear()
+    app.extensions['event_hub'] = events.make_hub(app)
+
+    with app.test_client() as client:
+        yield client
+
+    app.extensions.pop('reminder_scheduler', None)
+    buffer = app.extensions.pop('result_buffer', None)
+    if buffer is not None:
+        buffer.stop()
+    conn = pool.acquire()
+    conn.end_test()
+    pool.release(conn)
+
+
+@pytest.fixture
+def database(app):
+    """Те саме з'єднання, що й у додатку, — бачить незафіксовані дані тесту."""
+    pool = db.get_pool(app)
+
+    @contextmanager
+    def connect():
+        conn = pool.acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            pool.release(conn)
+
+    return connect
+
+
+@pytest.fixture
+def auth(client):
+    class AuthActions:
+        def __init__(self, client):
+            self._client = client
+
+        def login(self, username='testuser', password='testpass'):
+            return self._client.post('/login', data={
+                'username': username,
+                'password': password
+            })
+
+        def logout(self):
+            return self._client.get('/logout')
+
+        def register(self, username='testuser', email='test@example.com',
+                    password='testpass', role='student'):
+            return self._client.post('/register', data={
+                'username': username,
+                'email': email,
+                'password': password,
+                'role': role
+            })
+
+    return AuthActions(client)
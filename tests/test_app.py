@@ -1,50 +1,46 @@
 import pytest
 import sqlite3
-import tempfile
 import os
-from app import app, init_db, hash_password, check_password
-
-@pytest.fixture
-def client():
-    db_fd, app.config['DATABASE'] = tempfile.mkstemp()
-    app.config['TESTING'] = True
-    
-    with app.test_client() as client:
-        with app.app_context():
-            init_db()
-        yield client
-    
-    os.close(db_fd)
-    os.unlink(app.config['DATABASE'])
-
-@pytest.fixture
-def auth(client):
-    class AuthActions:
-        def __init__(self, client):
-            self._client = client
-        
-        def login(self, username='testuser', password='testpass'):
-            return self._client.post('/login', data={
-                'username': username,
-                'password': password
-            })
-        
-        def logout(self):
-            return self._client.get('/logout')
-        
-        def register(self, username='testuser', email='test@example.com', 
-                    password='testpass', role='student'):
-            return self._client.post('/register', data={
-                'username': username,
-                'email': email,
-                'password': password,
-                'role': role
-            })
-    
-    return AuthActions(client)
+import runpy
+import subprocess
+import sys
+import threading
+import bcrypt
+import time
+import json
+from app import hash_password, check_password, create_app, close_app, get_weather_cache
+from db import ConnectionPool, PoolTimeout
+from weather import WeatherCache, fetch_weather
+from schedule_cache import ScheduleCache, build_snapshot
+from conflicts import IntervalIndex, ScheduleEngine, validate_timetable
+from quizzes import QuizEngine
+import db
+import migrations
+import passwords
+from passwords import PasswordHasher, HasherBusy
+import mailer
+import bulk
+import tasks_api
+import results
+import quizzes
+import analytics
+import ratelimit
+import timetable
+import calendar_feeds
+import events
+import fulltext
+import reminders
+import metrics
+import fragments
+import assets
+import gzip
+from datetime import datetime, timedelta
+from flask import Flask, url_for
+from config import TestingConfig
+from jinja2 import Environment
 
 class TestAuthentication:   
-    def test_register_user(self, client, auth):
+    def test_register_user(self, client, auth, database):
         rv = client.get('/register')
         assert rv.status_code == 200
         assert b'registration' in rv.data.lower() or 'реєстрація'.encode('utf-8') in rv.data
@@ -52,13 +48,14 @@ class TestAuthentication:
         rv = auth.register()
         assert rv.status_code == 302
         
-        with sqlite3.connect('school_schedule.db') as conn:
+        with database() as conn:
             user = conn.execute(
                 'SELECT * FROM users WHERE username = ?', ('testuser',)
             ).fetchone()
             assert user is not None
     
     def test_register_duplicate_user(self, client, auth):
+        auth.register()
         rv = auth.register()
         assert 'користувач'.encode('utf-8') in rv.data.lower() and 'існує'.encode('utf-8') in rv.data.lower()
     
@@ -84,13 +81,14 @@ class TestAuthentication:
 
 class TestPasswordSecurity:
     
-    def test_password_hashing(self):
+    def test_password_hashing(self, app):
         password = "testpassword123"
-        hashed = hash_password(password)
-        
-        assert hashed != password.encode('utf-8')
-        assert check_password(password, hashed) == True
-        assert check_password("wrongpassword", hashed) == False
+        with app.app_context():
+            hashed = hash_password(password)
+            
+            assert hashed != password.encode('utf-8')
+            assert check_password(password, hashed) == True
+            assert check_password("wrongpassword", hashed) == False
     
     def test_password_length_validation(self, client):
         short_password = "123"
@@ -101,6 +99,97 @@ class TestPasswordSecurity:
             'role': 'student'
         })
         
+class TestPasswordHasher:
+    
+    def test_hash_rounds_parsed(self):
+        hasher = PasswordHasher(rounds=4, executor='thread')
+        hashed = hasher.hash('secret')
+        assert passwords.hash_rounds(hashed) == 4
+        assert hasher.check('secret', hashed)
+        assert not hasher.needs_rehash(hashed)
+        assert hasher.stats()['hash']['count'] == 1
+    
+    def test_rehash_only_upwards(self):
+        weaker = PasswordHasher(rounds=4, executor='thread')
+        stronger = PasswordHasher(rounds=5, executor='thread')
+        assert stronger.needs_rehash(weaker.hash('secret'))
+        assert not weaker.needs_rehash(stronger.hash('secret'))
+    
+    def test_calibrate_rounds_bounds(self):
+        rounds = passwords.calibrate_rounds(target_ms=1, min_rounds=4, max_rounds=6)
+        assert rounds == 4
+    
+    def test_full_queue_rejected(self, monkeypatch):
+        release = threading.Event()
+        def slow_hash(password, rounds):
+            release.wait(5)
+            return b'hash', 0.0
+        monkeypatch.setattr(passwords, '_hash', slow_hash)
+        
+        hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, executor='thread')
+        worker = threading.Thread(target=hasher.hash, args=('first',))
+        worker.start()
+        time.sleep(0.05)
+        with pytest.raises(HasherBusy):
+            hasher.hash('second')
+        release.set()
+        worker.join()
+        assert hasher.stats()['rejected'] == 1
+
+    def test_bulk_hashing_does_not_queue_checks(self, monkeypatch):
+        release = threading.Event()
+        def slow_hash(password, rounds):
+            release.wait(5)
+            return b'hash', 0.0
+        monkeypatch.setattr(passwords, '_hash', slow_hash)
+
+        hasher = PasswordHasher(rounds=4, workers=2, executor='thread')
+        hashed = bcrypt.hashpw(b'secret', bcrypt.gensalt(4))
+        importer = threading.Thread(target=hasher.hash_many, args=(['p'] * 20,))
+        importer.start()
+        try:
+            time.sleep(0.05)
+            check = threading.Thread(target=hasher.check, args=('secret', hashed))
+            check.start()
+            check.join(2)
+            assert not check.is_alive()
+        finally:
+            release.set()
+            importer.join()
+        assert hasher.stats()['hash']['count'] == 20
+    
+    def test_login_rehashes_old_cost(self, client, auth, database):
+        auth.register(username='rehash_user', email='rehash@example.com')
+        with database() as conn:
+            conn.execute(
+                'UPDATE users SET password_hash = ? WHERE username = ?',
+                (bcrypt.hashpw(b'testpass', bcrypt.gensalt(4)), 'rehash_user')
+            )
+        
+        rv = auth.login('rehash_user')
+        assert rv.status_code == 302
+        with database() as conn:
+            stored = conn.execute(
+                'SELECT password_hash FROM users WHERE username = ?', ('rehash_user',)
+            ).fetchone()[0]
+        assert passwords.hash_rounds(stored) != 4
+    
+    def test_login_returns_429_when_busy(self, client, monkeypatch):
+        def busy(password, hashed):
+            raise HasherBusy()
+        monkeypatch.setattr('app.check_password', busy)
+        monkeypatch.setattr(db, 'get_db', lambda: FakeUserConnection())
+        
+        rv = client.post('/login', data={'username': 'student', 'password': 'x'})
+        assert rv.status_code == 429
+
+class FakeUserConnection:
+    def execute(self, *args):
+        return self
+    
+    def fetchone(self):
+        return {'id': 1, 'username': 'student', 'role': 'student', 'password_hash': b''}
+
 class TestSchedule:
     
     def test_schedule_requires_login(self, client):
@@ -114,7 +203,7 @@ class TestSchedule:
         rv = client.get('/add_lesson')
         assert rv.status_code == 302 or 'немає прав'.encode('utf-8') in rv.data.lower()
     
-    def test_add_lesson_as_teacher(self, client, auth):
+    def test_add_lesson_as_teacher(self, client, auth, database):
         auth.register(role='teacher')
         auth.login()
         
@@ -130,12 +219,446 @@ class TestSchedule:
             'time_end': '09:35'
         })
         assert rv.status_code == 302
-        with sqlite3.connect('school_schedule.db') as conn:
+        with database() as conn:
             lesson = conn.execute(
                 'SELECT * FROM lessons WHERE subject = ?', ('Математика',)
             ).fetchone()
             assert lesson is not None
 
+LESSONS_TABLE_SQL = '''
+    CREATE TABLE lessons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subject TEXT NOT NULL,
+        teacher TEXT NOT NULL,
+        classroom TEXT NOT NULL,
+        day_of_week TEXT NOT NULL,
+        time_start TEXT NOT NULL,
+        time_end TEXT NOT NULL,
+        created_by INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+class TestScheduleSnapshot:
+    
+    def login_teacher(self, client, auth):
+        auth.register(username='snapshot_teacher', email='snapshot@example.com', role='teacher')
+        auth.login('snapshot_teacher')
+    
+    def test_schedule_etag_not_modified(self, client, auth):
+        self.login_teacher(client, auth)
+        client.get('/schedule')
+        
+        rv = client.get('/schedule')
+        assert rv.status_code == 200
+        etag = rv.headers['ETag']
+        assert rv.headers['Last-Modified']
+        
+        rv = client.get('/schedule', headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+        assert rv.data == b''
+    
+    def test_add_lesson_bumps_version(self, client, auth):
+        self.login_teacher(client, auth)
+        client.get('/schedule')
+        version = int(client.get('/schedule').headers['X-Schedule-Version'])
+        
+        client.post('/add_lesson', data={
+            'subject': 'Хімія',
+            'teacher': 'Ковальчук Н.В.',
+            'classroom': '302',
+            'day_of_week': 'Середа',
+            'time_start': '09:50',
+            'time_end': '11:25'
+        })
+        rv = client.get('/schedule')
+        assert int(rv.headers['X-Schedule-Version']) == version + 1
+        assert 'Ковальчук Н.В.'.encode('utf-8') in rv.data
+        assert f'data-version="{version + 1}"'.encode() in rv.data
+    
+    def test_snapshot_sorted_by_day_and_time(self):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.execute(LESSONS_TABLE_SQL)
+        migrations.add_lesson_slots(conn)
+        conn.executemany(
+            'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [('Фізика', 'А', '1', 'Середа', '11:40', '13:15'),
+             ('Фізика', 'А', '1', 'Понеділок', '9:50', '11:25'),
+             ('Фізика', 'А', '1', 'Середа', '08:00', '09:35'),
+             ('Фізика', 'А', '1', 'Понеділок', '08:00', '09:35')]
+        )
+        snapshot = build_snapshot(conn, 3, '2025-09-01 08:00:00')
+        
+        assert list(snapshot.days)[0] == 'Понеділок'
+        assert [l['time_start'] for l in snapshot.days['Понеділок']] == ['08:00', '9:50']
+        assert [l['time_start'] for l in snapshot.days['Середа']] == ['08:00', '11:40']
+        assert snapshot.days['Вівторок'] == []
+        assert snapshot.version == 3
+
+class TestConflicts:
+
+    def make_conn(self, lessons):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.execute(LESSONS_TABLE_SQL)
+        migrations.create_data_versions(conn)
+        migrations.add_lesson_slots(conn)
+        conn.executemany(
+            'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end) '
+            'VALUES (?, ?, ?, ?, ?, ?)', lessons
+        )
+        return conn
+
+    def test_interval_index_neighbours(self):
+        index = IntervalIndex()
+        index.add('101', 480, 575, 1)
+        index.add('101', 590, 685, 2)
+        index.add('101', 700, 795, 3)
+
+        assert index.find('101', 575, 590) == []
+        assert index.find('101', 560, 600) == [1, 2]
+        assert index.find('101', 690, 700) == []
+        assert index.find('101', 480, 575, exclude=1) == []
+        assert index.find('102', 480, 575) == []
+
+        index.remove('101', 2)
+        assert index.find('101', 560, 600) == [1]
+
+    def test_interval_index_spanning_several(self):
+        index = IntervalIndex()
+        for i, start in enumerate(range(480, 900, 60), start=1):
+            index.add('101', start, start + 45, i)
+        
+        assert index.find('101', 500, 800) == [1, 2, 3, 4, 5, 6]
+        assert index.find('101', 400, 1000) == [1, 2, 3, 4, 5, 6, 7]
+        assert index.find('101', 530, 540) == []
+    
+    def test_interval_index_with_existing_overlaps(self):
+        index = IntervalIndex()
+        index.add('101', 480, 700, 1)
+        index.add('101', 500, 520, 2)
+        index.add('101', 530, 540, 3)
+        # Довгий урок 1 не є сусідом інтервалу 650-660, але перетинається з ним
+        assert index.find('101', 650, 660) == [1]
+
+    def test_engine_checks_classroom_and_teacher(self):
+        conn = self.make_conn([
+            ('Фізика', 'Левченко', '101', 'Понеділок', '08:00', '09:35'),
+        ])
+        engine = ScheduleEngine()
+        engine.ensure_current(conn)
+
+        conflicts = engine.check('Левченко', '202', 1, 540, 600)
+        assert conflicts == [{'resource': 'teacher', 'lesson_id': 1}]
+        conflicts = engine.check('Бойко', '101', 1, 540, 600)
+        assert conflicts == [{'resource': 'classroom', 'lesson_id': 1}]
+        assert engine.check('Бойко', '101', 2, 540, 600) == []
+        assert engine.check('Бойко', '101', 1, 575, 600) == []
+
+    def test_engine_reloads_after_external_change(self):
+        conn = self.make_conn([])
+        engine = ScheduleEngine()
+        engine.ensure_current(conn)
+        assert engine.check('Левченко', '101', 1, 480, 575) == []
+
+        conn.execute(
+            "INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end) "
+            "VALUES ('Фізика', 'Левченко', '101', 'Понеділок', '08:00', '09:35')"
+        )
+        db.bump_version(conn, 'lessons')
+        engine.ensure_current(conn)
+        assert len(engine.check('Левченко', '101', 1, 480, 575)) == 2
+
+    def test_validate_timetable(self):
+        conn = self.make_conn([
+            ('Фізика', 'Левченко', '101', 'Понеділок', '08:00', '09:35'),
+            ('Хімія', 'Бойко', '101', 'Понеділок', '09:00', '10:00'),
+            ('Хімія', 'Бойко', '102', 'Понеділок', '9:50', '11:25'),
+            ('Фізика', 'Левченко', '101', 'Вівторок', '09:00', '10:00'),
+        ])
+        conflicts = validate_timetable(conn)
+        assert conflicts == [
+            {'resource': 'classroom', 'value': '101', 'weekday': 1, 'lesson_ids': [1, 2]},
+            {'resource': 'teacher', 'value': 'Бойко', 'weekday': 1, 'lesson_ids': [2, 3]},
+        ]
+
+    def test_add_lesson_rejects_double_booking(self, client, auth, database):
+        auth.register(username='conflict_teacher', email='conflict@example.com', role='teacher')
+        auth.login('conflict_teacher')
+        lesson = {
+            'subject': 'Астрономія',
+            'teacher': 'Зоряна К.К.',
+            'classroom': '701',
+            'day_of_week': 'П\'ятниця',
+            'time_start': '16:00',
+            'time_end': '17:00'
+        }
+        rv = client.post('/add_lesson', data=lesson)
+        assert rv.status_code == 302
+
+        rv = client.post('/add_lesson', data=dict(lesson, teacher='Інший В.В.', time_start='16:30'))
+        assert rv.status_code == 409
+        assert 'Кабінет зайнятий'.encode('utf-8') in rv.data
+
+        rv = client.post('/add_lesson', data=dict(lesson, time_start='17:00', time_end='18:00'))
+        assert rv.status_code == 302
+
+        with database() as conn:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM lessons WHERE classroom = '701'"
+            ).fetchone()[0]
+        assert count == 2
+
+    def test_validate_endpoint_requires_admin(self, client, auth):
+        auth.register(username='conflict_student', email='conflict_student@example.com')
+        auth.login('conflict_student')
+        assert client.get('/admin/timetable/validate').status_code == 403
+
+        auth.register(username='conflict_admin', email='conflict_admin@example.com', role='admin')
+        auth.login('conflict_admin')
+        rv = client.get('/admin/timetable/validate')
+        assert rv.status_code == 200
+        assert 'conflicts' in rv.get_json()
+
+SCHOOL_SPEC = {
+    'slots': [['08:00', '08:45'], ['08:55', '09:40'], ['09:50', '10:35'], ['10:45', '11:30']],
+    'rooms': [{'name': '201'}, {'name': '202'}, {'name': 'Спортзал', 'subjects': ['Фізкультура']}],
+    'teachers': [
+        {'name': 'Іванова О.П.', 'subjects': ['Математика']},
+        {'name': 'Петренко М.І.', 'subjects': ['Українська мова']},
+        {'name': 'Руденко С.О.', 'subjects': ['Фізкультура'], 'days_off': ['П\'ятниця']},
+        {'name': 'Brown J.', 'subjects': ['Англійська мова']},
+    ],
+    'classes': [
+        {'name': '5-А', 'hours': {'Математика': 5, 'Українська мова': 4, 'Фізкультура': 3, 'Англійська мова': 3}},
+        {'name': '5-Б', 'hours': {'Математика': 5, 'Українська мова': 4, 'Фізкультура': 3, 'Англійська мова': 3}},
+    ],
+}
+
+class TestTimetableGenerator:
+    
+    def make_conn(self, lessons=()):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.execute(LESSONS_TABLE_SQL)
+        migrations.create_data_versions(conn)
+        migrations.add_lesson_slots(conn)
+        migrations.add_lesson_classes(conn)
+        conn.executemany(
+            'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end) '
+            'VALUES (?, ?, ?, ?, ?, ?)', lessons
+        )
+        return conn
+    
+    def assert_valid(self, lessons, spec):
+        conn = self.make_conn()
+        conn.executemany(
+            'INSERT INTO lessons (subject, teacher, classroom, class_name, day_of_week, time_start, time_end) '
+            'VALUES (:subject, :teacher, :classroom, :class_name, :day_of_week, :time_start, :time_end)', lessons
+        )
+        assert validate_timetable(conn) == []
+        for item in spec['classes']:
+            for subject, hours in item['hours'].items():
+                assert sum(1 for lesson in lessons
+                           if lesson['class_name'] == item['name'] and lesson['subject'] == subject) == hours
+        slots = {(lesson['class_name'], lesson['day_of_week'], lesson['time_start']) for lesson in lessons}
+        assert len(slots) == len(lessons)
+    
+    def test_generates_conflict_free_timetable(self):
+        problem = timetable.build_problem(SCHOOL_SPEC)
+        lessons = timetable.solve(problem)
+        
+        assert len(lessons) == 30
+        self.assert_valid(lessons, SCHOOL_SPEC)
+        sport = [lesson for lesson in lessons if lesson['subject'] == 'Фізкультура']
+        assert {lesson['classroom'] for lesson in sport} == {'Спортзал'}
+        assert all(lesson['day_of_week'] != 'П\'ятниця' for lesson in sport)
+        # Не більше одного уроку предмета на день, якщо годин не більше, ніж днів
+        days = [(lesson['class_name'], lesson['subject'], lesson['day_of_week']) for lesson in lessons]
+        assert len(set(days)) == len(days)
+        assert timetable.solve(problem) == lessons
+    
+    def test_existing_lessons_are_respected(self):
+        conn = self.make_conn([
+            ('Хімія', 'Іванова О.П.', '201', 'Понеділок', '08:00', '09:40'),
+        ])
+        problem = timetable.build_problem(SCHOOL_SPEC, timetable.existing_lessons(conn, SCHOOL_SPEC))
+        lessons = timetable.solve(problem)
+        
+        monday = [lesson for lesson in lessons if lesson['day_of_week'] == 'Понеділок'
+                  and lesson['time_start'] in ('08:00', '08:55')]
+        assert all(lesson['teacher'] != 'Іванова О.П.' and lesson['classroom'] != '201' for lesson in monday)
+        
+        timetable.write_lessons(conn, problem, lessons)
+        assert validate_timetable(conn) == []
+        assert conn.execute('SELECT COUNT(*) FROM lessons').fetchone()[0] == 31
+        timetable.write_lessons(conn, problem, lessons)
+        assert conn.execute('SELECT COUNT(*) FROM lessons').fetchone()[0] == 31
+    
+    def test_weekend_lessons_ignored(self):
+        conn = self.make_conn([
+            ('Хімія', 'Іванова О.П.', '201', 'Субота', '08:00', '09:40'),
+            ('Хімія', 'Іванова О.П.', '201', 'Неділя', '08:00', '09:40'),
+        ])
+        problem = timetable.build_problem(SCHOOL_SPEC, timetable.existing_lessons(conn, SCHOOL_SPEC))
+        assert not any(problem.teacher_busy) and not any(problem.room_busy)
+    
+    def test_impossible_spec(self):
+        spec = dict(SCHOOL_SPEC, slots=[['08:00', '08:45']])
+        assert timetable.solve(timetable.build_problem(spec), restarts=2) is None
+        
+        with pytest.raises(ValueError, match='Немає вчителя'):
+            timetable.build_problem(dict(SCHOOL_SPEC, classes=[{'name': '6-А', 'hours': {'Хімія': 2}}]))
+        with pytest.raises(ValueError):
+            timetable.build_problem(dict(SCHOOL_SPEC, slots=[['09:00', '08:00']]))
+    
+    def test_parallel_restarts(self):
+        lessons = timetable.solve(timetable.build_problem(SCHOOL_SPEC), restarts=2, workers=2)
+        self.assert_valid(lessons, SCHOOL_SPEC)
+
+    def test_timeout_enforced(self):
+        # Кожен клас займає всі слоти, а кожен учитель — усі свої: перебір тут безнадійно довгий
+        subjects = [f'Предмет {i}' for i in range(5)]
+        spec = {
+            'slots': SCHOOL_SPEC['slots'],
+            'rooms': [{'name': str(200 + i)} for i in range(5)],
+            'teachers': [{'name': f'Вчитель {i}', 'subjects': [subject]} for i, subject in enumerate(subjects)],
+            'classes': [{'name': f'{5 + i}-А', 'hours': dict.fromkeys(subjects, 4)} for i in range(5)],
+        }
+        problem = timetable.build_problem(spec)
+        for workers in (1, 2):
+            started = time.monotonic()
+            assert timetable.solve(problem, restarts=30, workers=workers, timeout=0.5) is None
+            assert time.monotonic() - started < 5
+    
+    def test_generate_endpoint(self, client, auth, database):
+        auth.register(username='tt_admin', email='tt_admin@example.com', role='admin')
+        auth.login('tt_admin')
+        
+        rv = client.post('/admin/timetable/generate?dry_run=1', json=SCHOOL_SPEC)
+        assert rv.status_code == 200 and len(rv.get_json()['lessons']) == 30
+        with database() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM lessons WHERE class_name IS NOT NULL').fetchone()[0] == 0
+        
+        rv = client.post('/admin/timetable/generate', json=SCHOOL_SPEC)
+        assert rv.get_json()['success'] is True
+        with database() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM lessons WHERE class_name = ?', ('5-А',)).fetchone()[0] == 15
+        assert '5-Б' in client.get('/schedule').data.decode('utf-8')
+        assert client.get('/admin/timetable/validate').get_json()['success'] is True
+        assert client.post('/admin/timetable/generate', json={'classes': []}).status_code == 400
+
+class TestCalendarFeeds:
+    
+    def add_class_lessons(self, database):
+        with database() as conn:
+            conn.executemany(
+                'INSERT INTO lessons (subject, teacher, classroom, day_of_week, weekday, time_start, time_end, class_name) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [('Алгебра', 'Іваненко О.П.', '101', 'Вівторок', 2, '08:00', '09:35', '7-А'),
+                 ('Біологія', 'Петренко, Л.', '205', 'Четвер', 4, '9:50', '11:25', '7-Б')]
+            )
+            db.bump_version(conn, 'lessons')
+    
+    def feed_url(self, client, kind, value):
+        token = calendar_feeds.make_token(client.application.secret_key, kind, value)
+        return f'/calendar/{token}.ics'
+    
+    def test_tampered_token_not_found(self, client, auth):
+        auth.register()
+        url = self.feed_url(client, 'user', 1)
+        assert client.get(url).status_code == 200
+        assert client.get(url.replace('.ics', 'x.ics')).status_code == 404
+        
+        forged = calendar_feeds.make_token('інший ключ', 'user', 1)
+        assert client.get(f'/calendar/{forged}.ics').status_code == 404
+        assert client.get(self.feed_url(client, 'user', 999)).status_code == 404
+    
+    def test_class_feed_weekly_events(self, client, database):
+        self.add_class_lessons(database)
+        
+        rv = client.get(self.feed_url(client, 'class', '7-А'))
+        assert rv.status_code == 200
+        assert rv.mimetype == 'text/calendar'
+        body = rv.get_data(as_text=True)
+        assert body.startswith('BEGIN:VCALENDAR\r\n')
+        assert body.endswith('END:VCALENDAR\r\n')
+        assert 'SUMMARY:Алгебра' in body
+        assert 'Біологія' not in body
+        # Вівторок першого тижня від CALENDAR_TERM_START (понеділок 2025-09-01)
+        assert 'DTSTART;TZID=Europe/Kyiv:20250902T080000' in body
+        assert 'RRULE:FREQ=WEEKLY;BYDAY=TU' in body
+    
+    def test_user_feed_includes_tasks(self, client, auth, database):
+        auth.register()
+        auth.login()
+        self.add_class_lessons(database)
+        client.post('/add_task', json={
+            'title': 'Реферат', 'description': 'Розділи 1; 2', 'subject': 'Історія', 'due_date': '2025-10-15'
+        })
+        
+        links = client.get('/api/calendar_links').get_json()
+        assert sorted(links['classes']) == ['7-А', '7-Б']
+        body = client.get(links['user']).get_data(as_text=True)
+        assert 'SUMMARY:Алгебра' in body and 'SUMMARY:Біологія' in body
+        assert 'DESCRIPTION:Вчитель: Петренко\\, Л.' in body
+        # Час 'H:MM' з форми чи імпорту — усе одно шість цифр
+        assert 'DTSTART;TZID=Europe/Kyiv:20250904T095000' in body
+        assert 'DTSTART;VALUE=DATE:20251015' in body
+        assert 'DTEND;VALUE=DATE:20251016' in body
+        assert 'Розділи 1\\; 2' in body
+    
+    def test_conditional_get_and_new_version(self, client, auth, database):
+        auth.register()
+        auth.login()
+        url = self.feed_url(client, 'user', 1)
+        
+        rv = client.get(url)
+        assert rv.data.startswith(b'BEGIN:VCALENDAR')
+        etag = rv.headers['ETag']
+        assert rv.headers['Last-Modified']
+        assert rv.headers['Cache-Control'] == 'private, no-cache'
+        rv = client.get(url, headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+        assert rv.data == b''
+        
+        # Завдання іншого користувача не змінюють стрічку
+        with database() as conn:
+            conn.execute("INSERT INTO tasks (title, subject, due_date, user_id) VALUES ('Чуже', 'Фізика', '2025-11-02', 999)")
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        
+        client.post('/add_task', json={'title': 'Нове', 'description': '', 'subject': 'Фізика', 'due_date': '2025-11-01'})
+        rv = client.get(url, headers={'If-None-Match': etag})
+        assert rv.status_code == 200
+        assert rv.headers['ETag'] != etag
+        assert b'20251101' in rv.data
+    
+    def test_feed_cached_per_version(self, client, database):
+        self.add_class_lessons(database)
+        url = self.feed_url(client, 'class', '7-Б')
+        cache = client.application.extensions['calendar_cache']
+        
+        first = client.get(url).data
+        assert cache.stats()['entries'] == 1
+        assert client.get(url).data == first
+        assert cache.stats()['hits'] == 1
+        
+        self.add_class_lessons(database)
+        assert client.get(url).data.count(b'BEGIN:VEVENT') == 2
+        assert cache.stats()['entries'] == 2
+    
+    def test_fold_long_lines(self):
+        line = 'DESCRIPTION:' + 'Довгий опис уроку ' * 10
+        folded = calendar_feeds.fold(line)
+        parts = folded[:-2].split('\r\n')
+        assert len(parts) > 1
+        assert all(len(part.encode('utf-8')) <= 75 for part in parts)
+        assert all(part.startswith(' ') for part in parts[1:])
+        assert ''.join(part[1:] if i else part for i, part in enumerate(parts)) == line
+        assert calendar_feeds.escape('a;b,c\\d\ne') == 'a\\;b\\,c\\\\d\\ne'
+
 class TestTasks:
     def test_tasks_require_login(self, client):
         rv = client.get('/tasks')
@@ -158,51 +681,1318 @@ class TestTasks:
         data = rv.get_json()
         assert data['success'] == True
     
-    def test_delete_task_api(self, client, auth):
+    def test_delete_task_api(self, client, auth, database):
         auth.register()
         auth.login()
-        with sqlite3.connect('school_schedule.db') as conn:
-            conn.execute(
+        with database() as conn:
+            task_id = conn.execute(
                 'INSERT INTO tasks (title, subject, user_id) VALUES (?, ?, ?)',
                 ('Тест завдання', 'Математика', 1)
-            )
-            conn.commit()
-            task_id = conn.lastrowid
+            ).lastrowid
         
         rv = client.delete(f'/delete_task/{task_id}')
         assert rv.status_code == 200
         data = rv.get_json()
         assert data['success'] == True
 
+TASKS_TABLE_SQL = '''
+    CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        subject TEXT NOT NULL,
+        due_date DATE,
+        completed BOOLEAN DEFAULT FALSE,
+        user_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+class TestTasksApi:
+    
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.execute(TASKS_TABLE_SQL)
+        conn.execute('CREATE INDEX idx_tasks_user_due ON tasks (user_id, due_date)')
+        due_dates = [None, '2025-09-03', '2025-09-01', None, '2025-09-01', '2025-09-02', '2025-09-05']
+        for i, due_date in enumerate(due_dates):
+            conn.execute(
+                'INSERT INTO tasks (title, subject, due_date, completed, user_id) VALUES (?, ?, ?, ?, ?)',
+                (f'Завдання {i}', 'Фізика' if i % 2 else 'Хімія', due_date, i == 2, 1)
+            )
+        conn.execute("INSERT INTO tasks (title, subject, user_id) VALUES ('Чуже', 'Фізика', 2)")
+        return conn
+    
+    def collect(self, conn, args):
+        pages = []
+        cursor = None
+        while True:
+            page_args = dict(args)
+            if cursor:
+                page_args['cursor'] = cursor
+            tasks, cursor = tasks_api.query_tasks(conn, 1, page_args)
+            pages.append(tasks)
+            if cursor is None:
+                return pages
+    
+    def test_pages_cover_all_tasks_in_order(self, conn):
+        pages = self.collect(conn, {'limit': '2'})
+        assert [len(page) for page in pages] == [2, 2, 2, 1]
+        
+        ids = [task['id'] for page in pages for task in page]
+        expected = [row[0] for row in conn.execute(
+            'SELECT id FROM tasks WHERE user_id = 1 ORDER BY due_date, id'
+        )]
+        assert ids == expected
+    
+    def test_filters_and_sparse_fields(self, conn):
+        tasks, _ = tasks_api.query_tasks(conn, 1, {
+            'subject': 'Фізика', 'completed': '0', 'due_from': '2025-09-01', 'fields': 'title'
+        })
+        assert [task['title'] for task in tasks] == ['Завдання 5', 'Завдання 1']
+        assert set(tasks[0]) == {'id', 'due_date', 'title'}
+    
+    def test_invalid_parameters(self, conn):
+        with pytest.raises(ValueError):
+            tasks_api.query_tasks(conn, 1, {'cursor': 'не-курсор'})
+        with pytest.raises(ValueError):
+            tasks_api.query_tasks(conn, 1, {'fields': 'password_hash'})
+    
+    def test_api_endpoint(self, client, auth):
+        auth.register(username='api_user', email='api_user@example.com')
+        auth.login('api_user')
+        for i in range(3):
+            client.post('/add_task', json={
+                'title': f'API {i}', 'description': '', 'subject': 'Фізика', 'due_date': f'2025-10-0{i + 1}'
+            })
+        
+        rv = client.get('/api/tasks?limit=2')
+        data = rv.get_json()
+        assert [task['title'] for task in data['tasks']] == ['API 0', 'API 1']
+        assert data['summary']['total'] == 3
+        
+        rv = client.get(f"/api/tasks?limit=2&cursor={data['next_cursor']}")
+        data = rv.get_json()
+        assert [task['title'] for task in data['tasks']] == ['API 2']
+        assert data['next_cursor'] is None
+        assert 'summary' not in data
+        
+        assert client.get('/api/tasks?cursor=xyz').status_code == 400
+        assert client.get('/tasks').status_code == 200
+
+class TestTaskChanges:
+    
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.execute(TASKS_TABLE_SQL)
+        migrations.create_data_versions(conn)
+        migrations.add_task_revisions(conn)
+        return conn
+    
+    def add(self, conn, title, user_id=1):
+        return conn.execute(
+            'INSERT INTO tasks (title, subject, user_id) VALUES (?, ?, ?)', (title, 'Фізика', user_id)
+        ).lastrowid
+    
+    def test_changes_since_revision(self, conn):
+        first = self.add(conn, 'Перше')
+        second = self.add(conn, 'Друге')
+        self.add(conn, 'Чуже', user_id=2)
+        
+        initial = tasks_api.changes(conn, 1, 0)
+        assert [task['id'] for task in initial['changed']] == [first, second]
+        assert initial['deleted'] == []
+        
+        conn.execute("UPDATE tasks SET completed = 1 WHERE id = ?", (first,))
+        conn.execute('DELETE FROM tasks WHERE id = ?', (second,))
+        
+        delta = tasks_api.changes(conn, 1, initial['revision'])
+        assert [task['id'] for task in delta['changed']] == [first]
+        assert delta['changed'][0]['completed'] == 1
+        assert delta['deleted'] == [second]
+        assert delta['revision'] > initial['revision']
+        
+        assert tasks_api.changes(conn, 1, delta['revision'])['changed'] == []
+    
+    def test_changes_paged(self, conn):
+        for i in range(5):
+            self.add(conn, f'Завдання {i}')
+        
+        page = tasks_api.changes(conn, 1, 0, limit=3)
+        assert page['more']
+        assert len(page['changed']) == 3
+        
+        rest = tasks_api.changes(conn, 1, page['revision'], limit=3)
+        assert not rest['more']
+        assert len(rest['changed']) == 2
+    
+    def test_changes_endpoint(self, client, auth):
+        auth.register(username='sync_user', email='sync_user@example.com')
+        auth.login('sync_user')
+        
+        # Перша сторінка дає ревізію, з якої клієнт синхронізується без історії
+        start = client.get('/api/tasks').get_json()['revision']
+        task_id = client.post('/add_task', json={
+            'title': 'Синхронізація', 'description': '', 'subject': 'Фізика', 'due_date': '2025-10-01'
+        }).get_json()['id']
+        
+        data = client.get(f'/api/tasks/changes?since={start}').get_json()
+        assert [task['id'] for task in data['changed']] == [task_id]
+        assert data['summary'] == {'total': 1, 'completed': 0, 'pending': 1}
+        
+        client.delete(f'/delete_task/{task_id}')
+        data = client.get(f"/api/tasks/changes?since={data['revision']}").get_json()
+        assert data['changed'] == []
+        assert data['deleted'] == [task_id]
+        assert data['summary']['total'] == 0
+    
+    def test_revision_only_on_first_page(self, client, auth):
+        auth.register(username='sync_pages', email='sync_pages@example.com')
+        auth.login('sync_pages')
+        for title in ('Перше', 'Друге'):
+            client.post('/add_task', json={'title': title, 'description': '', 'subject': 'Фізика', 'due_date': ''})
+        
+        first = client.get('/api/tasks?limit=1').get_json()
+        assert 'revision' in first
+        second = client.get(f"/api/tasks?limit=1&cursor={first['next_cursor']}").get_json()
+        assert 'revision' not in second and 'summary' not in second
+
+class TestEvents:
+    
+    def read_events(self, client, last_id=None):
+        headers = {'Last-Event-ID': str(last_id)} if last_id is not None else {}
+        rv = client.get('/events', headers=headers)
+        assert rv.status_code == 200
+        assert rv.mimetype == 'text/event-stream'
+        body = rv.get_data(as_text=True)
+        # Місце потоку звільняє сервер, закриваючи відповідь
+        rv.close()
+        messages = []
+        for block in body.split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.split('\n') if line and not line.startswith(':'))
+            if 'data' in fields:
+                messages.append((fields.get('id'), json.loads(fields['data'])))
+        return messages
+    
+    def test_events_require_login(self, client):
+        assert client.get('/events').status_code == 302
+    
+    def test_lesson_events(self, client, auth):
+        auth.register(username='events_teacher', email='events@example.com', role='teacher')
+        auth.login('events_teacher')
+        client.post('/add_lesson', data={
+            'subject': 'Фізика', 'teacher': 'Мельник І.В.', 'classroom': '210',
+            'day_of_week': 'Четвер', 'time_start': '08:00', 'time_end': '09:35'
+        })
+        
+        messages = self.read_events(client, last_id=0)
+        hello = messages[0][1]
+        assert hello['type'] == 'hello'
+        event_id, added = messages[1]
+        assert added['type'] == 'lesson_added'
+        assert added['lesson']['teacher'] == 'Мельник І.В.'
+        assert added['version'] == hello['lessons_version']
+        
+        client.delete(f"/delete_lesson/{added['lesson']['id']}")
+        messages = self.read_events(client, last_id=event_id)
+        assert [data['type'] for _, data in messages] == ['hello', 'lesson_deleted']
+        assert messages[1][1]['version'] == added['version'] + 1
+    
+    def test_task_events_are_private(self, client, auth):
+        auth.register()
+        auth.register(username='other', email='other@example.com')
+        auth.login()
+        client.post('/add_task', json={'title': 'Есе', 'description': '', 'subject': 'Мова', 'due_date': ''})
+        
+        messages = self.read_events(client, last_id=0)
+        assert messages[1][1]['type'] == 'task_added'
+        assert messages[1][1]['task']['title'] == 'Есе'
+        assert messages[1][1]['summary'] == {'total': 1, 'completed': 0, 'pending': 1}
+        
+        client.get('/logout')
+        auth.login('other')
+        assert [data['type'] for _, data in self.read_events(client, last_id=0)] == ['hello']
+    
+    def test_new_stream_starts_from_now(self, client, auth):
+        auth.register()
+        auth.login()
+        client.post('/add_task', json={'title': 'Старе', 'description': '', 'subject': 'Мова', 'due_date': ''})
+        assert [data['type'] for _, data in self.read_events(client)] == ['hello']
+    
+    def test_stream_limit(self, client, auth):
+        auth.register()
+        auth.login()
+        hub = client.application.extensions['event_hub']
+        self.read_events(client)
+        assert hub.stats()['streams'] == 0
+        
+        hub.max_streams = 0
+        rv = client.get('/events')
+        assert rv.status_code == 503
+        assert rv.headers['Retry-After']
+    
+    def test_hub_wait_wakes_on_publish(self):
+        hub = events.EventHub(events.LocalBackend())
+        timer = threading.Timer(0.05, hub.publish, ('lessons', {'type': 'lesson_deleted', 'id': 1}))
+        timer.start()
+        started = time.monotonic()
+        found, last_id = hub.wait(0, ('lessons',), timeout=5)
+        timer.join()
+        assert time.monotonic() - started < 1
+        assert [event.data['id'] for event in found] == [1]
+        assert last_id == 1
+        
+        hub.publish('tasks:2', {'type': 'task_deleted', 'id': 7})
+        assert hub.wait(last_id, ('lessons',), timeout=0.01) == ([], 2)
+    
+    def test_hub_wait_cooperative_under_gevent(self):
+        # Як у воркері gunicorn gevent: threading підмінено до імпорту хаба
+        pytest.importorskip('gevent')
+        script = """
+from gevent import monkey; monkey.patch_all()
+import gevent, events
+hub = events.EventHub(events.LocalBackend(), max_streams=5000)
+waiters = [gevent.spawn(hub.wait, 0, ('lessons',), 5) for _ in range(2000)]
+gevent.sleep(0.1)
+hub.publish('lessons', {'id': 1})
+gevent.joinall(waiters, timeout=5)
+print(sum(1 for waiter in waiters if waiter.value and waiter.value[0]))
+"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, timeout=60)
+        assert result.stdout.strip() == '2000', result.stderr
+    
+    def test_hub_reports_evicted_history(self):
+        hub = events.EventHub(events.LocalBackend(), history=2)
+        for i in range(5):
+            hub.publish('lessons', {'id': i})
+        assert hub.wait(1, ('lessons',), timeout=0)[0] is None
+        assert [event.id for event in hub.wait(3, ('lessons',), timeout=0)[0]] == [4, 5]
+    
+    def test_sqlite_backend_shares_events(self, tmp_path):
+        path = str(tmp_path / 'events.db')
+        first = events.EventHub(events.SQLiteBackend(path, poll_interval=60))
+        second = events.EventHub(events.SQLiteBackend(path, poll_interval=60))
+        try:
+            first.publish('lessons', {'type': 'lesson_deleted', 'id': 3})
+            assert first.last_id == 1
+            assert second.backend.poll() == 1
+            found, last_id = second.wait(0, ('lessons',), timeout=0)
+            assert [(event.id, event.data['id']) for event in found] == [(1, 3)]
+            
+            # Воркер, що стартував пізніше, не переграє старі події
+            third = events.EventHub(events.SQLiteBackend(path, poll_interval=60))
+            assert third.last_id == 1
+            third.close()
+        finally:
+            first.close()
+            second.close()
+
+class TestSearch:
+    
+    def add_task(self, database, title, description, user_id=1, subject='Історія'):
+        with database() as conn:
+            return conn.execute(
+                'INSERT INTO tasks (title, description, subject, user_id) VALUES (?, ?, ?, ?)',
+                (title, description, subject, user_id)
+            ).lastrowid
+    
+    def search(self, client, **params):
+        rv = client.get('/search', query_string=params)
+        return rv.status_code, rv.get_json()
+    
+    def test_search_requires_login(self, client):
+        assert client.get('/search?q=тест').status_code == 302
+    
+    def test_prefix_and_case_insensitive(self, client, auth, database):
+        auth.register()
+        auth.login()
+        task_id = self.add_task(database, 'Реферат', 'Козацька доба: гетьманщина та Запорозька Січ')
+        
+        status, data = self.search(client, q='КОЗАЦ', type='tasks')
+        assert status == 200
+        assert [task['id'] for task in data['results']['tasks']] == [task_id]
+        assert '[Козацька]' in data['results']['tasks'][0]['snippet']
+        
+        # Усі слова мають бути в записі
+        assert self.search(client, q='козацька фізика', type='tasks')[1]['results']['tasks'] == []
+    
+    def test_title_ranked_above_description(self, client, auth, database):
+        auth.register()
+        auth.login()
+        in_description = self.add_task(database, 'Конспект', 'Повторити рівняння руху та закони')
+        in_title = self.add_task(database, 'Рівняння руху', 'Задачі 1-5')
+        
+        tasks = self.search(client, q='рівнян', type='tasks')[1]['results']['tasks']
+        assert [task['id'] for task in tasks] == [in_title, in_description]
+    
+    def test_tasks_filtered_by_owner(self, client, auth, database):
+        auth.register()
+        auth.register(username='other', email='other@example.com')
+        auth.register(username='search_admin', email='search_admin@example.com', role='admin')
+        mine = self.add_task(database, 'Есе про весну', '', user_id=1)
+        theirs = self.add_task(database, 'Есе про осінь', '', user_id=2)
+        
+        auth.login()
+        assert [t['id'] for t in self.search(client, q='есе')[1]['results']['tasks']] == [mine]
+        
+        client.get('/logout')
+        auth.login('search_admin')
+        ids = {t['id'] for t in self.search(client, q='есе', type='tasks')[1]['results']['tasks']}
+        assert ids == {mine, theirs}
+    
+    def test_users_scope_admin_only(self, client, auth):
+        auth.register(username='olena_koval', email='olena@example.com')
+        auth.register(username='search_admin', email='search_admin@example.com', role='admin')
+        
+        auth.login('olena_koval', 'testpass')
+        status, data = self.search(client, q='olena', type='users')
+        assert status == 403
+        assert 'users' not in self.search(client, q='olena')[1]['results']
+        
+        client.get('/logout')
+        auth.login('search_admin')
+        users = self.search(client, q='olena', type='users')[1]['results']['users']
+        assert [user['username'] for user in users] == ['olena_koval']
+        assert 'password_hash' not in users[0]
+    
+    def test_lessons_by_teacher_and_day(self, client, auth, database):
+        auth.register()
+        auth.login()
+        with database() as conn:
+            conn.executemany(
+                'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [('Хімія', 'Ковальчук Н.В.', '302', 'Середа', '09:50', '11:25'),
+                 ('Хімія', 'Ковальчук Н.В.', '302', "П'ятниця", '08:00', '09:35'),
+                 ('Фізика', 'Мельник І.В.', '210', 'Середа', '08:00', '09:35')]
+            )
+        
+        lessons = self.search(client, q='ковальч середа', type='lessons')[1]['results']['lessons']
+        assert [(lesson['subject'], lesson['day_of_week']) for lesson in lessons] == [('Хімія', 'Середа')]
+        lessons = self.search(client, q="п'ятниця", type='lessons')[1]['results']['lessons']
+        assert [lesson['day_of_week'] for lesson in lessons] == ["П'ятниця"]
+    
+    def test_index_follows_updates_and_deletes(self, client, auth, database):
+        auth.register()
+        auth.login()
+        task_id = self.add_task(database, 'Лабораторна', 'Вимірювання густини')
+        with database() as conn:
+            conn.execute("UPDATE tasks SET description = 'Вимірювання опору' WHERE id = ?", (task_id,))
+            conn.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (task_id,))
+        assert self.search(client, q='густин', type='tasks')[1]['results']['tasks'] == []
+        assert len(self.search(client, q='опору', type='tasks')[1]['results']['tasks']) == 1
+        
+        client.delete(f'/delete_task/{task_id}')
+        assert self.search(client, q='опору', type='tasks')[1]['results']['tasks'] == []
+    
+    def test_invalid_queries(self, client, auth):
+        auth.register()
+        auth.login()
+        assert self.search(client, q='')[0] == 400
+        assert self.search(client, q='!!! ***')[0] == 400
+        assert self.search(client, q='тест', type='grades')[0] == 400
+        assert self.search(client, q='тест', limit='багато')[0] == 400
+        # Синтаксис FTS5 у запиті не інтерпретується
+        assert self.search(client, q='фіз" OR NEAR(a b) *')[0] == 200
+    
+    def test_parse_query(self):
+        assert fulltext.parse_query('Фіз  мельник!') == '"Фіз"* AND "мельник"*'
+        assert fulltext.parse_query("м'яч") == '"м"* AND "яч"*'
+        assert fulltext.parse_query(' '.join(['слово'] * 20)).count('AND') == fulltext.MAX_TERMS - 1
+
+class TestReminders:
+    
+    NOON = datetime(2025, 10, 1, 12).timestamp()
+    
+    @pytest.fixture
+    def pool(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'reminders.db'))
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, email TEXT)')
+        conn.execute(TASKS_TABLE_SQL)
+        migrations.create_email_outbox(conn)
+        migrations.create_task_reminders(conn)
+        conn.execute("INSERT INTO users (id, username, email) VALUES (1, 'olena', 'olena@example.com')")
+        conn.commit()
+        pool.release(conn)
+        return pool
+    
+    @pytest.fixture
+    def clock(self):
+        now = [self.NOON]
+        return now
+    
+    def scheduler(self, pool, clock, sender=None):
+        return reminders.ReminderScheduler(pool, sender or reminders.LocalSink(), clock=lambda: clock[0])
+    
+    def add(self, pool, title, due_date, completed=0):
+        conn = pool.acquire()
+        task_id = conn.execute(
+            'INSERT INTO tasks (title, subject, due_date, completed, user_id) VALUES (?, ?, ?, ?, 1)',
+            (title, 'Фізика', due_date, completed)
+        ).lastrowid
+        conn.commit()
+        pool.release(conn)
+        return task_id
+    
+    def rebuild(self, pool, scheduler):
+        conn = pool.acquire()
+        try:
+            return scheduler.rebuild(conn)
+        finally:
+            pool.release(conn)
+    
+    def test_rebuild_reads_only_window(self, pool, clock):
+        self.add(pool, 'Завтра', '2025-10-02')
+        self.add(pool, 'За місяць', '2025-11-01')
+        self.add(pool, 'Минуле', '2025-09-20')
+        self.add(pool, 'Виконане', '2025-10-03', completed=1)
+        
+        assert self.rebuild(pool, self.scheduler(pool, clock)) == 1
+    
+    def test_fires_at_configured_hour(self, pool, clock):
+        scheduler = self.scheduler(pool, clock)
+        task_id = self.add(pool, 'Лабораторна', '2025-10-02')
+        self.rebuild(pool, scheduler)
+        
+        assert scheduler.run_pending() == 0
+        clock[0] = datetime(2025, 10, 1, 18).timestamp()
+        assert scheduler.run_pending() == 1
+        assert scheduler.run_pending() == 0
+        
+        reminder = scheduler.sender.sent[0]
+        assert (reminder.task_id, reminder.email, reminder.due_date) == (task_id, 'olena@example.com', '2025-10-02')
+        assert scheduler.stats() == {'fired': 1, 'skipped': 0, 'rebuilds': 1, 'scheduled': 0}
+    
+    def test_cancelled_and_completed_tasks_skipped(self, pool, clock):
+        scheduler = self.scheduler(pool, clock)
+        self.rebuild(pool, scheduler)
+        deleted = self.add(pool, 'Видалене', '2025-10-02')
+        completed = self.add(pool, 'Виконане', '2025-10-02')
+        scheduler.schedule(deleted, '2025-10-02')
+        scheduler.schedule(completed, '2025-10-02')
+        scheduler.schedule(self.add(pool, 'Далеко', '2025-12-01'), '2025-12-01')
+        assert scheduler.stats()['scheduled'] == 2
+        
+        scheduler.cancel(deleted)
+        conn = pool.acquire()
+        conn.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (completed,))
+        conn.commit()
+        pool.release(conn)
+        
+        clock[0] += 86400
+        assert scheduler.run_pending() == 0
+        assert scheduler.sender.sent == []
+        assert scheduler.stats()['skipped'] == 1
+    
+    def test_workers_send_once_and_restart_skips_sent(self, pool, clock):
+        self.add(pool, 'Твір', '2025-10-02')
+        first, second = self.scheduler(pool, clock), self.scheduler(pool, clock)
+        self.rebuild(pool, first)
+        self.rebuild(pool, second)
+        
+        clock[0] += 86400
+        assert first.run_pending() + second.run_pending() == 1
+        assert self.rebuild(pool, self.scheduler(pool, clock)) == 0
+    
+    def test_outbox_sender_enqueues_mail(self, pool, clock):
+        woken = []
+        scheduler = self.scheduler(pool, clock, reminders.OutboxSender(wake=lambda: woken.append(True)))
+        self.add(pool, 'Есе', '2025-10-02')
+        self.rebuild(pool, scheduler)
+        
+        clock[0] += 86400
+        assert scheduler.run_pending() == 1
+        conn = pool.acquire()
+        row = conn.execute('SELECT recipient, subject FROM email_outbox').fetchone()
+        pool.release(conn)
+        assert tuple(row) == ('olena@example.com', 'Нагадування: «Есе» до 2025-10-02')
+        assert woken == [True]
+    
+    def test_background_thread_sends_due(self, pool, clock):
+        scheduler = self.scheduler(pool, clock)
+        self.add(pool, 'Проєкт', '2025-10-01')
+        scheduler.start()
+        try:
+            deadline = time.monotonic() + 2
+            while not scheduler.sender.sent and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+        assert [reminder.title for reminder in scheduler.sender.sent] == ['Проєкт']
+    
+    def test_task_endpoints_update_heap(self, app, client, auth, database):
+        auth.register(username='reminder_user', email='reminder_user@example.com')
+        auth.login('reminder_user')
+        tomorrow = (datetime.now() + timedelta(days=1)).date().isoformat()
+        scheduler = reminders.ReminderScheduler(db.get_pool(app), reminders.LocalSink())
+        app.extensions['reminder_scheduler'] = scheduler
+        with database() as conn:
+            scheduler.rebuild(conn)
+        
+        task_id = client.post('/add_task', json={
+            'title': 'Нагадати', 'description': '', 'subject': 'Фізика', 'due_date': tomorrow
+        }).get_json()['id']
+        assert scheduler.stats()['scheduled'] == 1
+        
+        client.delete(f'/delete_task/{task_id}')
+        assert scheduler.stats()['scheduled'] == 0
+
 class TestTest:
     def test_test_page_accessible(self, client):
         rv = client.get('/test')
         assert rv.status_code == 200
         assert b'test' in rv.data.lower() or 'тест'.encode('utf-8') in rv.data
     
-    def test_submit_test_results(self, client, auth):
+    def test_submit_test_results(self, client, auth, database):
+        quiz = client.get('/api/quiz').get_json()
         rv = client.post('/submit_test',
-                        json={'score': 8, 'total': 10},
+                        json={'attempt': quiz['attempt'], 'answers': [0] * len(quiz['questions'])},
                         content_type='application/json')
         assert rv.status_code == 200
         
         auth.register()
         auth.login()
         
+        quiz = client.get('/api/quiz').get_json()
         rv = client.post('/submit_test',
-                        json={'score': 8, 'total': 10},
+                        json={'attempt': quiz['attempt'], 'answers': [0] * len(quiz['questions'])},
                         content_type='application/json')
         assert rv.status_code == 200
         
-        with sqlite3.connect('school_schedule.db') as conn:
+        with database() as conn:
             result = conn.execute(
                 'SELECT * FROM test_results WHERE user_id = ?', (1,)
             ).fetchone()
             assert result is not None
 
+TEST_RESULTS_TABLE_SQL = '''
+    CREATE TABLE test_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        test_name TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        total_questions INTEGER NOT NULL,
+        completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+class TestResultBuffer:
+    
+    @pytest.fixture
+    def pool(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'results.db'), size=2)
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT)')
+        conn.executemany('INSERT INTO users (id, username) VALUES (?, ?)', [(1, 'olena'), (2, 'taras')])
+        conn.execute(TEST_RESULTS_TABLE_SQL)
+        migrations.add_test_aggregates(conn)
+        conn.commit()
+        pool.release(conn)
+        yield pool
+        pool.close()
+    
+    def count(self, pool):
+        conn = pool.acquire()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM test_results').fetchone()[0]
+        finally:
+            pool.release(conn)
+    
+    def test_flush_writes_one_batch(self, pool):
+        buffer = results.ResultBuffer(pool, batch_size=100, flush_interval=60)
+        for score in (4, 6, 8, 10):
+            buffer.submit(1, 'Тест', score, 10, time_spent=30, answers='[]')
+        buffer.submit(2, 'Тест', 9, 10)
+        assert self.count(pool) == 0
+        
+        assert buffer.flush() == 5
+        assert self.count(pool) == 5
+        stats = buffer.stats()
+        assert stats['batches'] == 1 and stats['pending'] == 0
+        buffer.stop()
+    
+    def test_batch_size_wakes_writer(self, pool):
+        buffer = results.ResultBuffer(pool, batch_size=3, flush_interval=60)
+        for _ in range(3):
+            buffer.submit(1, 'Тест', 5, 10)
+        deadline = time.time() + 2
+        while self.count(pool) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert self.count(pool) == 3
+        buffer.stop()
+    
+    def test_stop_flushes_pending(self, pool):
+        buffer = results.ResultBuffer(pool, batch_size=100, flush_interval=60)
+        buffer.submit(1, 'Тест', 5, 10)
+        buffer.stop()
+        assert self.count(pool) == 1
+    
+    def test_aggregates_maintained_incrementally(self, pool):
+        buffer = results.ResultBuffer(pool, flush_interval=60)
+        for score in (4, 6, 8, 10):
+            buffer.submit(1, 'Тест', score, 10)
+        buffer.submit(2, 'Тест', 9, 10)
+        buffer.submit(None, 'Тест', 1, 10)
+        buffer.stop()
+        
+        conn = pool.acquire()
+        try:
+            summary = results.test_summary(conn, 'Тест')
+            board = results.leaderboard(conn, 'Тест')
+            olena = results.user_stats(conn, 1)
+        finally:
+            pool.release(conn)
+        assert summary == {'test_name': 'Тест', 'attempts': 6, 'best_percent': 100,
+                           'mean_percent': 63.3, 'p50': 60, 'p90': 100}
+        assert [row['username'] for row in board] == ['olena', 'taras']
+        assert olena[0]['attempts'] == 4
+        assert olena[0]['best_score'] == 10
+        assert olena[0]['mean_percent'] == 70.0
+    
+    def test_backfill_existing_results(self, tmp_path):
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.execute(TEST_RESULTS_TABLE_SQL)
+        conn.executemany(
+            'INSERT INTO test_results (user_id, test_name, score, total_questions) VALUES (?, ?, ?, ?)',
+            [(1, 'Тест', 3, 5), (1, 'Тест', 8, 10), (1, 'Тест', 2, 10)]
+        )
+        migrations.add_test_aggregates(conn)
+        row = conn.execute('SELECT * FROM user_test_stats WHERE user_id = 1').fetchone()
+        assert (row['attempts'], row['best_score'], row['best_percent'], row['sum_percent']) == (3, 8, 80, 160)
+        assert results.test_summary(conn, 'Тест')['p50'] == 60
+    
+    def test_submit_and_read_stats(self, app, client, auth):
+        auth.register(username='quiz_user', email='quiz_user@example.com')
+        auth.login('quiz_user')
+        quiz = client.get('/api/quiz').get_json()
+        key = app.extensions['quiz_engine'].get(quiz['quiz_id']).key
+        answers = list(key[:7]) + [(k + 1) % 4 for k in key[7:]]
+        rv = client.post('/submit_test', json={
+            'attempt': quiz['attempt'], 'answers': answers, 'timeSpent': 42
+        })
+        assert rv.status_code == 200
+        assert rv.get_json()['score'] == 7
+        
+        data = client.get('/api/test_stats').get_json()
+        assert data['test']['attempts'] >= 1
+        assert data['user'][0]['best_score'] == 7
+        assert any(row['username'] == 'quiz_user' for row in data['leaderboard'])
+    
+    def test_submit_rejects_unknown_quiz(self, client):
+        rv = client.post('/submit_test', json={'score': 11, 'total': 10})
+        assert rv.status_code == 400
+        rv = client.post('/submit_test', json={'quiz_id': 'не-тест', 'answers': []})
+        assert rv.status_code == 400
+        rv = client.post('/submit_test', json={'attempt': 'не-токен', 'answers': []})
+        assert rv.status_code == 400
+    
+    def test_attempt_is_single_use(self, app, client, auth):
+        quiz = client.get('/api/quiz?subject=Математика&size=2').get_json()
+        key = app.extensions['quiz_engine'].get(quiz['quiz_id']).key
+        rv = client.post('/submit_test', json={'attempt': quiz['attempt'], 'answers': [None, None]})
+        assert rv.get_json()['score'] == 0
+        assert rv.get_json()['results'][0]['correctAnswer']
+        
+        # Ключ відповідей уже видано — повторна здача тієї ж спроби не зараховується
+        rv = client.post('/submit_test', json={'attempt': quiz['attempt'], 'answers': list(key)})
+        assert rv.status_code == 409
+        assert 'results' not in rv.get_json()
+        
+        # Новий тест — новий токен, навіть якщо випав той самий набір
+        again = client.get('/api/quiz?subject=Математика&size=2').get_json()
+        assert again['attempt'] != quiz['attempt']
+        
+        # Токен гостя не підходить після входу в обліковий запис
+        auth.register(username='attempt_user', email='attempt_user@example.com')
+        auth.login('attempt_user')
+        rv = client.post('/submit_test', json={'attempt': again['attempt'], 'answers': []})
+        assert rv.status_code == 400
+
+QUESTIONS_TABLE_SQL = '''
+    CREATE TABLE data_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 1,
+                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+'''
+
+class TestQuizEngine:
+    
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute(QUESTIONS_TABLE_SQL)
+        migrations.create_question_bank(conn)
+        return conn
+    
+    def test_sets_are_deterministic_across_engines(self, conn):
+        first, second = QuizEngine(sets_per_quiz=4), QuizEngine(sets_per_quiz=4)
+        first.ensure_current(conn)
+        second.ensure_current(conn)
+        quiz = first.draw(size=5)
+        
+        assert len(quiz.questions) == 5
+        assert second.get(quiz.quiz_id) == quiz
+        assert first.get(quiz.quiz_id) is quiz
+        assert 'correct' not in quiz.payload
+    
+    def test_attempt_tokens(self, tmp_path):
+        token = quizzes.make_attempt('ключ', '1:10:0:', 7)
+        quiz_id, nonce = quizzes.load_attempt('ключ', token, 7, max_age=60)
+        assert quiz_id == '1:10:0:'
+        
+        path = str(tmp_path / 'attempts.db')
+        for store in (quizzes.MemoryAttemptStore(60), quizzes.SQLiteAttemptStore(path, 60)):
+            store.claim(nonce)
+            with pytest.raises(quizzes.AttemptInvalid):
+                store.claim(nonce)
+            assert store.stats() == {'used': 1}
+        # Файл спільний для воркерів: інший процес бачить ту саму використану спробу
+        with pytest.raises(quizzes.AttemptInvalid):
+            quizzes.SQLiteAttemptStore(path, 60).claim(nonce)
+        for secret, user_id in (('інший ключ', 7), ('ключ', 8), ('ключ', None)):
+            with pytest.raises(quizzes.AttemptInvalid):
+                quizzes.load_attempt(secret, token, user_id, max_age=60)
+        with pytest.raises(quizzes.AttemptInvalid):
+            quizzes.load_attempt('ключ', None, 7, max_age=60)
+    
+    def test_score_uses_shuffled_key(self, conn):
+        engine = QuizEngine()
+        engine.ensure_current(conn)
+        quiz = engine.draw('Математика', size=10)
+        assert len(quiz.key) == 2 and quiz.test_name == 'Математика'
+        
+        score, details = engine.score(quiz, [quiz.key[0], True])
+        assert score == 1
+        assert details[0]['isCorrect'] and details[0]['userAnswer'] == details[0]['correctAnswer']
+        assert details[1]['userAnswer'] == quizzes.NO_ANSWER
+    
+    def test_bank_change_expires_quizzes(self, conn):
+        engine = QuizEngine()
+        engine.ensure_current(conn)
+        quiz = engine.draw()
+        conn.execute(
+            "INSERT INTO questions (subject, question, options, correct) VALUES ('Фізика', '?', '[\"a\", \"b\"]', 1)"
+        )
+        engine.ensure_current(conn)
+        
+        with pytest.raises(quizzes.QuizExpired):
+            engine.get(quiz.quiz_id)
+        assert engine.stats()['questions'] == len(migrations.SEED_QUESTIONS) + 1
+        with pytest.raises(LookupError):
+            engine.draw('Астрономія')
+    
+    def test_server_side_scoring(self, app, client):
+        rv = client.get('/api/quiz?subject=Математика&size=2')
+        assert rv.headers['Cache-Control'] == 'no-store'
+        quiz = rv.get_json()
+        assert all('correct' not in question for question in quiz['questions'])
+        key = app.extensions['quiz_engine'].get(quiz['quiz_id']).key
+        
+        rv = client.post('/submit_test', json={
+            'attempt': quiz['attempt'], 'answers': list(key), 'score': 0, 'total': 100
+        })
+        data = rv.get_json()
+        assert (data['score'], data['total']) == (2, 2)
+        assert all(result['isCorrect'] for result in data['results'])
+        assert client.get('/api/quiz?size=0').status_code == 400
+        assert client.get('/api/quiz?subject=Астрономія').status_code == 404
+    
+    def test_imported_questions_expire_old_quiz(self, client, auth, database):
+        quiz = client.get('/api/quiz').get_json()
+        with database() as conn:
+            imported, errors = bulk.import_rows(conn, 'questions', [
+                {'subject': 'Астрономія', 'question': 'Найближча зоря?', 'options': 'Сонце|Сіріус', 'correct': '0'},
+            ])
+        assert (imported, errors) == (1, [])
+        
+        rv = client.post('/submit_test', json={'attempt': quiz['attempt'], 'answers': []})
+        assert rv.status_code == 409
+        assert 'results' not in rv.get_json()
+        assert client.get('/api/quiz?subject=Астрономія').get_json()['questions'][0]['question'] == 'Найближча зоря?'
+
+class TestResultAnalytics:
+    
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute(TEST_RESULTS_TABLE_SQL)
+        migrations.add_test_aggregates(conn)
+        return conn
+    
+    def submit(self, conn, user_id, score, test_name='Тест', time_spent=None, answers=None):
+        conn.execute(results.INSERT_SQL, (user_id, test_name, score, 10, time_spent, answers))
+    
+    def test_incremental_refresh(self, conn):
+        stats = analytics.ResultAnalytics()
+        assert stats.ensure_current(conn) == 0
+        assert stats.overview() == {'attempts': 0, 'tests': [], 'subjects': []}
+        
+        for score in (2, 5, 8):
+            self.submit(conn, 1, score)
+        assert stats.ensure_current(conn) == 3
+        first = stats.overview()
+        assert stats.ensure_current(conn) == 0
+        assert stats.overview() is first
+        
+        self.submit(conn, 2, 10, test_name='Математика')
+        assert stats.ensure_current(conn) == 1
+        assert stats.stats()['rows'] == 4
+        assert [test['test_name'] for test in stats.overview()['tests']] == ['Тест', 'Математика']
+    
+    def test_overview_distribution_and_percentiles(self, conn):
+        for user_id, score, time_spent in ((1, 3, 60), (1, 6, None), (2, 10, 30), (3, 9, 90)):
+            self.submit(conn, user_id, score, time_spent=time_spent)
+        stats = analytics.ResultAnalytics()
+        stats.ensure_current(conn)
+        
+        test = stats.overview()['tests'][0]
+        assert test['attempts'] == 4
+        assert test['mean_percent'] == 70.0
+        assert test['distribution'] == [0, 0, 0, 1, 0, 0, 1, 0, 0, 2]
+        assert (test['p25'], test['p50'], test['p90']) == (52.5, 75.0, 97.0)
+        assert test['median_time'] == 60
+    
+    def test_user_progress_and_subjects(self, conn):
+        answers = json.dumps([
+            {'subject': 'Математика', 'isCorrect': True},
+            {'subject': 'Фізика', 'isCorrect': False},
+        ])
+        for score in (3, 6, 9):
+            self.submit(conn, 1, score, answers=answers)
+        self.submit(conn, 2, 1, answers='[{"question": "без предмета", "isCorrect": true}]')
+        stats = analytics.ResultAnalytics()
+        stats.ensure_current(conn)
+        
+        progress = stats.user_progress(1)
+        test = progress['tests'][0]
+        assert (test['attempts'], test['best_percent'], test['mean_percent']) == (3, 90.0, 60.0)
+        assert (test['first_percent'], test['last_percent'], test['trend']) == (30.0, 90.0, 30.0)
+        assert progress['subjects'] == [
+            {'subject': 'Математика', 'answers': 3, 'accuracy': 100.0},
+            {'subject': 'Фізика', 'answers': 3, 'accuracy': 0.0},
+        ]
+        assert stats.user_progress(2)['subjects'] == []
+        assert stats.user_progress(3) == {'tests': [], 'subjects': []}
+    
+    def test_deleted_results_reload(self, conn):
+        stats = analytics.ResultAnalytics()
+        for score in (4, 5):
+            self.submit(conn, 1, score)
+        stats.ensure_current(conn)
+        conn.execute('DELETE FROM test_results WHERE id = 2')
+        stats.ensure_current(conn)
+        assert stats.overview()['attempts'] == 1
+    
+    def test_stats_endpoints(self, app, client, auth):
+        assert client.get('/stats').status_code == 302
+        auth.register(username='stats_user', email='stats@example.com')
+        auth.login('stats_user')
+        quiz = client.get('/api/quiz?subject=Математика&size=2').get_json()
+        key = app.extensions['quiz_engine'].get(quiz['quiz_id']).key
+        client.post('/submit_test', json={'attempt': quiz['attempt'], 'answers': [key[0], None]})
+        app.extensions['result_buffer'].flush()
+        
+        data = client.get('/api/stats').get_json()
+        assert data['overview']['tests'][0]['test_name'] == 'Математика'
+        assert data['user']['tests'][0]['best_percent'] == 50.0
+        assert data['user']['subjects'] == [{'subject': 'Математика', 'answers': 2, 'accuracy': 50.0}]
+        
+        rv = client.get('/stats')
+        assert rv.status_code == 200
+        assert 'Мої результати' in rv.data.decode('utf-8')
+
+class TestRateLimit:
+    
+    def test_token_bucket_refills(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+        store = ratelimit.MemoryStore()
+        limit = ratelimit.parse_limit('2/minute')
+        
+        assert limit == ratelimit.Limit(2, 60)
+        assert store.hit('k', limit) == 0
+        assert store.hit('k', limit) == 0
+        assert store.hit('k', limit) == pytest.approx(30)
+        now[0] += 30
+        assert store.hit('k', limit) == 0
+        assert store.hit('other', limit) == 0
+    
+    def test_memory_store_evicts_oldest(self):
+        store = ratelimit.MemoryStore(max_keys=2)
+        limit = ratelimit.Limit(1, 60)
+        for key in ('a', 'b', 'c'):
+            store.hit(key, limit)
+        assert store.stats() == {'keys': 2, 'evictions': 1}
+        # 'a' витіснено — кошик знову повний
+        assert store.hit('a', limit) == 0
+        assert store.hit('c', limit) > 0
+    
+    def test_sqlite_store_is_shared(self, tmp_path):
+        path = str(tmp_path / 'limits.db')
+        first, second = ratelimit.SQLiteStore(path), ratelimit.SQLiteStore(path)
+        limit = ratelimit.Limit(2, 60)
+        
+        assert first.hit('ip:1', limit) == 0
+        assert second.hit('ip:1', limit) == 0
+        assert first.hit('ip:1', limit) > 0
+        second.reset('ip:1')
+        assert first.hit('ip:1', limit) == 0
+        assert first.stats() == {'keys': 1}
+    
+    @pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+    def test_rejected_request_keeps_other_buckets(self, kind, tmp_path):
+        store = ratelimit.MemoryStore() if kind == 'memory' else ratelimit.SQLiteStore(str(tmp_path / 'limits.db'))
+        limiter = ratelimit.RateLimiter({'main.login': {'ip': '3/minute', 'username': '1/minute'}}, store)
+        
+        limiter.check('main.login', {'ip': '10.0.0.1', 'username': 'olena'})
+        for _ in range(5):
+            with pytest.raises(ratelimit.RateLimited):
+                limiter.check('main.login', {'ip': '10.0.0.1', 'username': 'olena'})
+        # Відхилені спроби не витратили токени IP
+        limiter.check('main.login', {'ip': '10.0.0.1', 'username': 'petro'})
+        limiter.check('main.login', {'ip': '10.0.0.1', 'username': 'ivan'})
+        with pytest.raises(ratelimit.RateLimited):
+            limiter.check('main.login', {'ip': '10.0.0.1', 'username': 'taras'})
+    
+    def test_invalid_limit(self):
+        with pytest.raises(ValueError):
+            ratelimit.parse_limit('5/week')
+    
+    def test_login_rejected_before_bcrypt(self, app, client, auth, monkeypatch):
+        auth.register(username='limited', email='limited@example.com')
+        checks = []
+        monkeypatch.setattr('app.check_password', lambda password, hashed: checks.append(password))
+        
+        for _ in range(5):
+            assert auth.login('limited', 'wrong').status_code == 200
+        rv = auth.login('Limited', 'wrong')
+        assert rv.status_code == 429
+        assert int(rv.headers['Retry-After']) > 0
+        assert 'Забагато спроб' in rv.data.decode('utf-8')
+        assert len(checks) == 5
+        # Інший логін з того ж IP не заблоковано
+        assert auth.login('someone_else', 'wrong').status_code == 200
+        assert app.extensions['rate_limiter'].stats()['rejected'] == {'main.login': 1}
+    
+    def test_successful_login_resets_username(self, app, client, auth):
+        auth.register()
+        for _ in range(4):
+            auth.login('testuser', 'wrong')
+        assert auth.login().status_code == 302
+        auth.logout()
+        for _ in range(4):
+            assert auth.login('testuser', 'wrong').status_code == 200
+    
+    def test_json_endpoint_limit(self, app, client, monkeypatch):
+        limiter = ratelimit.RateLimiter({'main.submit_test': {'ip': '1/hour'}}, ratelimit.MemoryStore())
+        monkeypatch.setitem(app.extensions, 'rate_limiter', limiter)
+        
+        assert client.post('/submit_test', json={}).status_code == 400
+        rv = client.post('/submit_test', json={})
+        assert rv.status_code == 429
+        assert rv.get_json()['success'] is False
+        # GET-запити не обмежуються
+        assert client.get('/test').status_code == 200
+    
+    def test_admin_stats(self, client, auth):
+        auth.register(username='limit_admin', email='limit_admin@example.com', role='admin')
+        auth.login('limit_admin')
+        data = client.get('/admin/rate_limits').get_json()
+        assert data['enabled'] is True
+        assert data['limits']['main.login']['username'] == '5/minute'
+
+class TestMetrics:
+    
+    def test_histogram_rendered_cumulative(self):
+        registry = metrics.Registry()
+        registry.describe('demo_seconds', 'Демо')
+        for value in (0.002, 0.003, 0.2, 20):
+            registry.observe('demo_seconds', value, buckets=(0.01, 1.0), route='a"b')
+        text = registry.render()
+        assert '# TYPE demo_seconds histogram' in text
+        assert 'demo_seconds_bucket{route="a\\"b",le="0.01"} 2' in text
+        assert 'demo_seconds_bucket{route="a\\"b",le="1.0"} 3' in text
+        assert 'demo_seconds_bucket{route="a\\"b",le="+Inf"} 4' in text
+        assert 'demo_seconds_count{route="a\\"b"} 4' in text
+    
+    def test_instrumented_connection_counts_queries_and_rows(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'metrics.db'), size=1, factory=metrics.InstrumentedConnection)
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(5)])
+        
+        before = dict(metrics.registry._counters)
+        rows = list(conn.execute('SELECT x FROM t'))
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 5
+        after = metrics.registry._counters
+        assert len(rows) == 5
+        key_rows = ('app_sql_rows_total', ())
+        key_statements = ('app_sql_statements_total', ())
+        assert after[key_rows] - before.get(key_rows, 0) == 6
+        assert after[key_statements] - before.get(key_statements, 0) == 2
+        pool.release(conn)
+        pool.close()
+    
+    def test_request_metrics_exposed(self, client, auth):
+        auth.register(username='metrics_user', email='metrics@example.com')
+        auth.login('metrics_user')
+        rv = client.get('/schedule')
+        timing = rv.headers['Server-Timing']
+        assert 'db-query;dur=' in timing and 'template;dur=' in timing and 'total;dur=' in timing
+        
+        rv = client.get('/metrics')
+        assert rv.status_code == 200
+        assert rv.content_type.startswith('text/plain')
+        text = rv.get_data(as_text=True)
+        assert 'http_requests_total{endpoint="main.schedule",method="GET",status="200"}' in text
+        assert 'app_span_seconds_count{span="bcrypt.check"}' in text
+        assert 'app_db_pool_in_use' in text
+    
+    def test_collector_removed_on_close(self):
+        before = len(metrics.registry._collectors)
+        other = create_app(TestingConfig)
+        assert len(metrics.registry._collectors) == before + 1
+        close_app(other)
+        assert len(metrics.registry._collectors) == before
+    
+    def test_slow_request_profile_saved(self, app, client, tmp_path, monkeypatch):
+        monkeypatch.setitem(app.config, 'PROFILE_MODE', 'cprofile')
+        monkeypatch.setitem(app.config, 'PROFILE_SAMPLE_RATE', 1.0)
+        monkeypatch.setitem(app.config, 'PROFILE_THRESHOLD_MS', 0)
+        monkeypatch.setitem(app.config, 'PROFILE_DIR', str(tmp_path))
+        client.get('/login')
+        monkeypatch.setitem(app.config, 'PROFILE_MODE', 'stacks')
+        client.get('/register')
+        
+        names = sorted(os.listdir(tmp_path))
+        assert any('-main.login-' in name and name.endswith('.prof') for name in names)
+        assert any('-main.register-' in name and name.endswith('.folded') for name in names)
+
+class TestFragmentCache:
+    
+    def make_env(self, cache, versions=None):
+        env = Environment(extensions=[fragments.FragmentCacheExtension])
+        env.fragment_cache = cache
+        env.fragment_versions = lambda name: versions[name]
+        return env
+    
+    def test_lru_eviction_and_ttl(self):
+        cache = fragments.FragmentCache(max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        
+        expiring = fragments.FragmentCache(ttl=0)
+        expiring.set('a', 1)
+        assert expiring.get('a') is None
+        assert expiring.stats()['expired'] == 1
+        assert cache.stats() == {'entries': 2, 'hits': 2, 'misses': 1, 'evictions': 1,
+                                 'expired': 0, 'invalidated': 0, 'hit_ratio': 0.6667}
+    
+    def test_tag_renders_once_per_key(self):
+        calls = []
+        env = self.make_env(fragments.FragmentCache())
+        env.globals['work'] = lambda: calls.append(1) or len(calls)
+        template = env.from_string("{% cache 'nav', role %}{{ role }}-{{ work() }}{% endcache %}")
+        
+        assert template.render(role='student') == 'student-1'
+        assert template.render(role='student') == 'student-1'
+        assert template.render(role='teacher') == 'teacher-2'
+    
+    def test_data_version_invalidates(self):
+        versions = {'lessons': 1}
+        cache = fragments.FragmentCache()
+        env = self.make_env(cache, versions)
+        template = env.from_string("{% cache 'days' depends 'lessons' %}{{ value }}{% endcache %}")
+        
+        assert template.render(value='old') == 'old'
+        assert template.render(value='new') == 'old'
+        versions['lessons'] = 2
+        assert template.render(value='new') == 'new'
+        # Нова версія замінює запис, а не додає ще один
+        assert cache.stats()['entries'] == 1
+        assert cache.stats()['invalidated'] == 1
+    
+    def test_schedule_fragment_follows_lessons_version(self, app, client, auth):
+        auth.register(username='frag_admin', email='frag_admin@example.com', role='admin')
+        auth.login('frag_admin')
+        client.get('/schedule')
+        client.post('/add_lesson', data={
+            'subject': 'Астрономія', 'teacher': 'Зоряна О.О.', 'classroom': '404',
+            'day_of_week': 'Четвер', 'time_start': '14:00', 'time_end': '14:45'
+        })
+        assert 'Зоряна О.О.'.encode('utf-8') in client.get('/schedule').data
+        
+        keys = [key for key, _ in app.extensions['fragment_cache']._entries.items()]
+        assert not any(key[0][0] in ('nav_user', 'index_welcome') for key in keys)
+        assert len([key for key in keys if key[0][0] == 'schedule_days']) == 1
+    
+    def test_disabled_cache_renders_every_time(self):
+        template = self.make_env(None).from_string("{% cache 'x' %}{{ value }}{% endcache %}")
+        assert template.render(value=1) == '1'
+        assert template.render(value=2) == '2'
+    
+    def test_navbar_per_role_and_hit_ratio(self, app, client, auth):
+        auth.register(username='frag_student', email='frag_student@example.com')
+        auth.register(username='frag_teacher', email='frag_teacher@example.com', role='teacher')
+        auth.login('frag_student')
+        assert 'Додати урок'.encode('utf-8') not in client.get('/tasks').data
+        client.get('/tasks')
+        auth.logout()
+        auth.login('frag_teacher')
+        assert 'Додати урок'.encode('utf-8') in client.get('/tasks').data
+        
+        stats = app.extensions['fragment_cache'].stats()
+        assert stats['hits'] > 0 and 0 < stats['hit_ratio'] < 1
+        assert 'app_fragment_cache_hit_ratio' in client.get('/metrics').get_data(as_text=True)
+
+class TestStaticAssets:
+    
+    def make_static(self, tmp_path):
+        (tmp_path / 'css').mkdir()
+        (tmp_path / 'js').mkdir()
+        (tmp_path / 'css' / 'site.css').write_text('/* тема */\nbody {\n    color: red;\n}\n', encoding='utf-8')
+        (tmp_path / 'js' / 'site.js').write_text('// вітання\nfunction hi() {\n    return 1;\n}\n', encoding='utf-8')
+        (tmp_path / 'js' / 'lib.min.js').write_text('var a=1;\n', encoding='utf-8')
+        return tmp_path
+    
+    def test_minify(self):
+        assert assets.minify_css('a > b ,c {\n  color: red;\n}') == 'a>b,c{color: red}\n'
+        source = 'function f() {\n    // коментар\n    return `\n    <b>${x}</b>\n    `;\n}\n'
+        assert assets.minify_js(source) == 'function f() {\nreturn `\n    <b>${x}</b>\n    `;\n}\n'
+
+    def test_minify_js_tracks_strings_and_regexes(self):
+        source = (
+            '    const a = "a`b";  // x\n'
+            '    const re = /["`]\\/+/g;  /* it\'s\n'
+            '    коментар */ let t = `x ${ \'`\' + y }\n'
+            '        z`;\n'
+            '    const d = a / 2;\n'
+        )
+        assert assets.minify_js(source) == (
+            'const a = "a`b";\n'
+            'const re = /["`]\\/+/g;\n'
+            'let t = `x ${ \'`\' + y }\n'
+            '        z`;\n'
+            'const d = a / 2;\n'
+        )
+
+    def test_build_hashes_and_compresses(self, tmp_path):
+        static = self.make_static(tmp_path)
+        manifest = assets.build(str(static))
+        
+        assert sorted(manifest) == ['css/site.css', 'js/lib.min.js', 'js/site.js']
+        built = static / manifest['js/site.js']
+        assert built.read_text() == 'function hi() {\nreturn 1;\n}\n'
+        assert gzip.decompress((static / (manifest['js/site.js'] + '.gz')).read_bytes()) == built.read_bytes()
+        assert (static / manifest['js/lib.min.js']).read_text() == 'var a=1;\n'
+        assert assets.load_manifest(str(static)) == manifest
+        
+        (static / 'js' / 'site.js').write_text('function hi() {}\n', encoding='utf-8')
+        rebuilt = assets.build(str(static))
+        assert rebuilt['js/site.js'] != manifest['js/site.js']
+        assert built.exists()
+    
+    def test_fingerprinted_url_served_immutable(self, tmp_path):
+        static = self.make_static(tmp_path)
+        manifest = assets.build(str(static))
+        app = Flask(__name__, static_folder=str(static), static_url_path='/static')
+        assets.init_app(app)
+        
+        with app.test_request_context():
+            url = url_for('static', filename='js/site.js')
+        assert url == '/static/' + manifest['js/site.js']
+        
+        client = app.test_client()
+        rv = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        assert rv.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert rv.mimetype in ('text/javascript', 'application/javascript')
+        assert gzip.decompress(rv.data) == (static / manifest['js/site.js']).read_bytes()
+        
+        rv = client.get(url)
+        assert 'Content-Encoding' not in rv.headers
+        assert rv.data == (static / manifest['js/site.js']).read_bytes()
+        assert client.get('/static/js/site.js').status_code == 200
+    
+    def test_pages_use_vendored_bootstrap(self, client):
+        html = client.get('/login').get_data(as_text=True)
+        assert 'cdn.jsdelivr.net' not in html
+        assert 'vendor/bootstrap/bootstrap.min' in html
+
+class TestHealth:
+    
+    def test_liveness(self, client):
+        rv = client.get('/healthz')
+        assert rv.status_code == 200
+        assert rv.get_json() == {'status': 'ok'}
+    
+    def test_readiness(self, client):
+        rv = client.get('/readyz')
+        assert rv.status_code == 200
+        assert rv.get_json()['schema_version'] == len(migrations.MIGRATIONS)
+    
+    def test_not_ready_until_migrated(self, client, monkeypatch):
+        monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [lambda conn: None])
+        rv = client.get('/readyz')
+        assert rv.status_code == 503
+        assert rv.get_json()['status'] == 'migrating'
+    
+    def test_gunicorn_config(self, monkeypatch):
+        monkeypatch.setenv('WEB_CONCURRENCY', '3')
+        monkeypatch.setenv('PASSWORD_WORKERS', '2')
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+        config = runpy.run_path(path)
+        assert config['workers'] == 3
+        assert config['wsgi_app'] == 'app:create_app()'
+        assert config['preload_app'] is False
+        assert os.environ['PASSWORD_WORKERS'] == '2'
+    
+    def test_gunicorn_streams_sized_for_gevent(self, monkeypatch):
+        monkeypatch.setenv('GUNICORN_WORKER_CONNECTIONS', '1000')
+        for name in ('GUNICORN_WORKER_CLASS', 'EVENTS_MAX_STREAMS', 'TIMETABLE_WORKERS'):
+            # setenv + delenv: після тесту змінні, задані конфігом, прибираються
+            monkeypatch.setenv(name, '')
+            monkeypatch.delenv(name)
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+        config = runpy.run_path(path)
+        assert config['worker_class'] == 'gevent'
+        assert os.environ['EVENTS_MAX_STREAMS'] == '900'
+        assert os.environ['TIMETABLE_WORKERS'] == '2'
+
+class TestBenchmarkReport:
+    
+    @pytest.fixture
+    def bench(self, monkeypatch):
+        monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+        import run
+        return run
+    
+    def test_percentiles(self, bench):
+        stats = bench.summarize([i / 1000 for i in range(1, 101)], errors=0, elapsed=2.0)
+        assert (stats['p50_ms'], stats['p95_ms'], stats['p99_ms']) == (50.0, 95.0, 99.0)
+        assert stats['rps'] == 50.0
+    
+    def test_compare_flags_regressions(self, bench):
+        def report(p95, rps, errors=0):
+            route = {'p95_ms': p95, 'rps': rps, 'errors': errors}
+            return {'scenarios': {'morning_rush': {'routes': {'GET /schedule': route}}}}
+        
+        assert bench.compare(report(110, 95), report(100, 100)) == []
+        regressions = bench.compare(report(150, 50, errors=2), report(100, 100))
+        assert len(regressions) == 3
+
 class TestSQLInjection:
     
-    def test_sql_injection_in_login(self, client):
+    def test_sql_injection_in_login(self, client, database):
         malicious_input = "'; DROP TABLE users; --"
         
         rv = client.post('/login', data={
@@ -210,14 +2000,14 @@ class TestSQLInjection:
             'password': 'anypassword'
         })
         
-        with sqlite3.connect('school_schedule.db') as conn:
+        with database() as conn:
             try:
                 conn.execute('SELECT COUNT(*) FROM users').fetchone()
                 assert True
             except sqlite3.OperationalError:
                 assert False, "SQL injection vulnerability detected!"
     
-    def test_sql_injection_in_tasks(self, client, auth):
+    def test_sql_injection_in_tasks(self, client, auth, database):
         auth.register()
         auth.login()
         
@@ -232,7 +2022,7 @@ class TestSQLInjection:
                         },
                         content_type='application/json')
         
-        with sqlite3.connect('school_schedule.db') as conn:
+        with database() as conn:
             try:
                 conn.execute('SELECT COUNT(*) FROM tasks').fetchone()
                 assert True
@@ -250,22 +2040,22 @@ class TestInputValidation:
         })
         assert 'обов\'язкові'.encode('utf-8') in rv.data.lower() or rv.status_code != 302
     
-    def test_invalid_email_format(self, client):
+    def test_invalid_email_format(self, client, database):
         rv = client.post('/register', data={
             'username': 'testuser',
             'email': 'invalid-email',
             'password': 'testpass',
             'role': 'student'
         })
-        with sqlite3.connect('school_schedule.db') as conn:
+        with database() as conn:
             user = conn.execute(
                 'SELECT * FROM users WHERE username = ?', ('testuser',)
             ).fetchone()
 
 class TestDatabase:
     
-    def test_database_initialization(self, client):
-        with sqlite3.connect('school_schedule.db') as conn:
+    def test_database_initialization(self, client, database):
+        with database() as conn:
             tables = conn.execute(
                 "SELECT name FROM sqlite_master WHERE type='table'"
             ).fetchall()
@@ -276,10 +2066,10 @@ class TestDatabase:
             for table in required_tables:
                 assert table in table_names
     
-    def test_user_creation_and_retrieval(self, client, auth):
+    def test_user_creation_and_retrieval(self, client, auth, database):
         auth.register(username='dbtest', email='dbtest@test.com')
         
-        with sqlite3.connect('school_schedule.db') as conn:
+        with database() as conn:
             user = conn.execute(
                 'SELECT username, email, role FROM users WHERE username = ?',
                 ('dbtest',)
@@ -290,5 +2080,463 @@ class TestDatabase:
             assert user[1] == 'dbtest@test.com'
             assert user[2] == 'student'
 
+class TestConnectionPool:
+    
+    def test_connection_reused_in_same_thread(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+        conn = pool.acquire()
+        pool.release(conn)
+        assert pool.acquire() is conn
+        
+        stats = pool.stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+    
+    def test_pragmas_applied(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'pool.db'))
+        conn = pool.acquire()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    
+    def test_pool_size_limit(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.05)
+        pool.acquire()
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+        assert pool.stats()['waits'] == 1
+    
+    def test_broken_connection_replaced(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), health_check_interval=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()
+        
+        fresh = pool.acquire()
+        assert fresh is not conn
+        assert fresh.execute('SELECT 1').fetchone()[0] == 1
+        assert pool.stats()['health_failures'] == 1
+
+    def test_slow_connect_does_not_block_pool(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+        idle = pool.acquire()
+        pool.release(idle)
+        idle = pool.acquire()
+
+        connecting = threading.Event()
+        finish = threading.Event()
+        connect = pool._connect
+        def slow_connect():
+            connecting.set()
+            finish.wait(5)
+            return connect()
+        pool._connect = slow_connect
+
+        opener = threading.Thread(target=pool.acquire)
+        opener.start()
+        assert connecting.wait(5)
+        releaser = threading.Thread(target=pool.release, args=(idle,))
+        releaser.start()
+        releaser.join(1)
+        assert not releaser.is_alive()
+        assert pool.acquire() is idle
+        finish.set()
+        opener.join(5)
+        assert pool.stats()['open'] == 2
+
+    def test_failed_connect_frees_slot(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'missing' / 'pool.db'), size=1)
+        with pytest.raises(sqlite3.Error):
+            pool.acquire()
+        assert pool.stats()['open'] == 0
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+    
+    def json(self):
+        return self._payload
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+    
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, params, timeout))
+        return self.responses.pop(0)
+
+class TestWeatherCache:
+    
+    def test_fetch_weather_uses_timeout(self):
+        session = FakeSession([FakeResponse(200, {'name': 'Kyiv'})])
+        data = fetch_weather(session, 'http://weather.local', 'key', 'Kyiv')
+        assert data == {'name': 'Kyiv'}
+        assert session.calls[0][2] is not None
+    
+    def test_fetch_weather_error_status(self):
+        session = FakeSession([FakeResponse(401, {})])
+        assert fetch_weather(session, 'http://weather.local', 'key', 'Kyiv') is None
+    
+    def test_first_get_does_not_block(self):
+        release = threading.Event()
+        def slow_fetch(city):
+            release.wait(5)
+            return {'name': city}
+        
+        cache = WeatherCache(slow_fetch)
+        assert cache.get('Kyiv') is None
+        release.set()
+        cache.refresh('Kyiv').result(timeout=5)
+        assert cache.get('Kyiv') == {'name': 'Kyiv'}
+    
+    def test_stale_value_served_during_refresh(self):
+        calls = []
+        def fetch(city):
+            calls.append(city)
+            return {'n': len(calls)}
+        
+        cache = WeatherCache(fetch, ttl=0)
+        cache.refresh('Lviv').result(timeout=5)
+        assert cache.get('Lviv') == {'n': 1}
+        cache.refresh('Lviv').result(timeout=5)
+        assert cache.get('Lviv')['n'] >= 2
+
+    def test_close_app_stops_refresher(self):
+        app = create_app(TestingConfig)
+        with app.app_context():
+            cache = get_weather_cache()
+        refresher = cache._refresher
+        assert refresher.is_alive()
+
+        close_app(app)
+        assert not refresher.is_alive()
+        assert 'weather_cache' not in app.extensions
+    
+    def test_index_uses_cache(self, app, client):
+        cache = WeatherCache(lambda city: None)
+        cache._entries['Kyiv'] = ({
+            'name': 'Київ',
+            'weather': [{'icon': '01d', 'description': 'ясно'}],
+            'main': {'temp': 20, 'feels_like': 19, 'humidity': 40, 'pressure': 1013}
+        }, time.monotonic())
+        app.extensions['weather_cache'] = cache
+        try:
+            rv = client.get('/')
+            assert 'Київ'.encode('utf-8') in rv.data
+        finally:
+            app.extensions.pop('weather_cache')
+
+class TestMigrations:
+    
+    def test_schema_version_recorded(self, client, database):
+        with database() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            assert version == len(migrations.MIGRATIONS)
+            
+            indexes = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )]
+            for index in ['idx_tasks_user_due', 'idx_test_results_user_completed', 'idx_lessons_slot']:
+                assert index in indexes
+    
+    def test_existing_lessons_backfilled(self, monkeypatch):
+        monkeypatch.setattr(migrations, 'BACKFILL_BATCH_SIZE', 2)
+        conn = sqlite3.connect(':memory:')
+        conn.execute(LESSONS_TABLE_SQL)
+        conn.executemany(
+            'INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [('Історія', 'Б', '2', day, '09:50', '11:25')
+             for day in ['Понеділок', 'Вівторок', 'Середа', 'Четвер', "П'ятниця"]]
+        )
+        migrations.add_lesson_slots(conn)
+        
+        rows = conn.execute('SELECT weekday, start_minute, end_minute FROM lessons ORDER BY id').fetchall()
+        assert rows == [(day, 590, 685) for day in range(1, 6)]
+    
+    def test_trigger_fills_slot_on_update(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute(LESSONS_TABLE_SQL)
+        migrations.add_lesson_slots(conn)
+        conn.execute(
+            "INSERT INTO lessons (subject, teacher, classroom, day_of_week, time_start, time_end) "
+            "VALUES ('Хімія', 'В', '3', 'Четвер', '14:00', '15:35')"
+        )
+        conn.execute("UPDATE lessons SET day_of_week = 'Вівторок', time_start = '8:00'")
+        
+        assert conn.execute('SELECT weekday, start_minute FROM lessons').fetchone() == (2, 480)
+    
+    def test_route_queries_use_indexes(self, app, client, auth, monkeypatch, database):
+        statements = []
+        traced = []
+        original_get_db = db.get_db
+        
+        def get_traced_db():
+            conn = original_get_db()
+            conn.set_trace_callback(statements.append)
+            traced.append(conn)
+            return conn
+        
+        monkeypatch.setattr(db, 'get_db', get_traced_db)
+        monkeypatch.setitem(app.extensions, 'schedule_cache', ScheduleCache())
+        try:
+            auth.register(username='plan_user', email='plan@example.com')
+            auth.login('plan_user')
+            client.get('/schedule')
+            client.get('/tasks')
+            client.post('/add_task', json={
+                'title': 'План', 'description': '', 'subject': 'Фізика', 'due_date': '2025-12-01'
+            })
+            client.delete('/delete_task/1')
+            quiz = client.get('/api/quiz').get_json()
+            client.post('/submit_test', json={'attempt': quiz['attempt'], 'answers': [1, 2]})
+            client.get('/search?q=план')
+        finally:
+            for conn in traced:
+                conn.set_trace_callback(None)
+        
+        queries = {s for s in statements if s.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))}
+        assert any('FROM lessons' in query for query in queries)
+        # Банк запитань свідомо читається цілком, один раз на версію
+        queries = {query for query in queries if 'FROM questions ORDER BY id' not in query}
+        # Службові запити FTS5 до його таблиць ('main'.'lessons_fts_config' тощо)
+        queries = {query for query in queries if "'main'." not in query}
+        with database() as conn:
+            for query in queries:
+                for row in conn.execute('EXPLAIN QUERY PLAN ' + query):
+                    detail = row[3]
+                    # Пошук FTS5 — обхід віртуальної таблиці за індексом MATCH (:M)
+                    indexed = 'USING' in detail or ('VIRTUAL TABLE INDEX' in detail and ':M' in detail)
+                    assert not (detail.startswith('SCAN') and not indexed), (query, detail)
+
+class StubTransport:
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.sent = []
+        self.opened = 0
+    
+    def open(self):
+        self.opened += 1
+    
+    def send(self, recipient, subject, body):
+        if recipient in self.fail_for:
+            raise OSError('mailbox unavailable')
+        self.sent.append((recipient, subject))
+    
+    def close(self):
+        pass
+
+class TestEmailOutbox:
+    
+    @pytest.fixture
+    def pool(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'outbox.db'))
+        conn = pool.acquire()
+        migrations.create_email_outbox(conn)
+        pool.release(conn)
+        return pool
+    
+    def enqueue(self, pool, *recipients):
+        conn = pool.acquire()
+        for recipient in recipients:
+            mailer.enqueue(conn, recipient, 'Тема', 'Текст')
+        conn.commit()
+        pool.release(conn)
+    
+    def test_batch_sent_over_one_connection(self, pool):
+        transport = StubTransport()
+        dispatcher = mailer.OutboxDispatcher(pool, lambda: transport, batch_size=10)
+        self.enqueue(pool, 'a@example.com', 'b@example.com', 'c@example.com')
+        
+        assert dispatcher.drain_once() == 3
+        assert transport.opened == 1
+        assert len(transport.sent) == 3
+        assert dispatcher.stats() == {'sent': 3}
+
+    def test_connection_released_while_sending(self, tmp_path):
+        pool = ConnectionPool(str(tmp_path / 'outbox.db'), size=1, timeout=0.1)
+        conn = pool.acquire()
+        migrations.create_email_outbox(conn)
+        pool.release(conn)
+        self.enqueue(pool, 'a@example.com')
+
+        in_use = []
+        class CheckingTransport(StubTransport):
+            def send(self, recipient, subject, body):
+                in_use.append(pool.stats()['in_use'])
+                super().send(recipient, subject, body)
+
+        dispatcher = mailer.OutboxDispatcher(pool, CheckingTransport)
+        assert dispatcher.drain_once() == 1
+        assert in_use == [0]
+        assert dispatcher.stats() == {'sent': 1}
+    
+    def test_failed_message_retried_with_backoff(self, pool):
+        transport = StubTransport(fail_for={'bad@example.com'})
+        dispatcher = mailer.OutboxDispatcher(pool, lambda: transport, base_delay=60)
+        self.enqueue(pool, 'bad@example.com', 'good@example.com')
+        
+        dispatcher.drain_once()
+        assert dispatcher.drain_once() == 0
+        
+        conn = pool.acquire()
+        row = conn.execute(
+            "SELECT status, attempts, next_attempt_at, last_error FROM email_outbox WHERE recipient = 'bad@example.com'"
+        ).fetchone()
+        pool.release(conn)
+        assert row['status'] == 'pending'
+        assert row['attempts'] == 1
+        assert row['next_attempt_at'] > time.time() + 50
+        assert 'mailbox unavailable' in row['last_error']
+    
+    def test_dead_letter_after_max_attempts(self, pool):
+        transport = StubTransport(fail_for={'bad@example.com'})
+        dispatcher = mailer.OutboxDispatcher(pool, lambda: transport, max_attempts=2, base_delay=0)
+        self.enqueue(pool, 'bad@example.com')
+        
+        dispatcher.drain_once()
+        dispatcher.drain_once()
+        assert dispatcher.stats() == {'dead': 1}
+    
+    def test_claimed_messages_kept_without_recover(self, pool):
+        dispatcher = mailer.OutboxDispatcher(pool, StubTransport)
+        self.enqueue(pool, 'a@example.com')
+        conn = pool.acquire()
+        dispatcher._claim(conn)
+        pool.release(conn)
+        
+        other = mailer.OutboxDispatcher(pool, StubTransport, poll_interval=60)
+        other.start(recover=False)
+        other.stop()
+        assert other.stats() == {'sending': 1}
+        
+        conn = pool.acquire()
+        assert mailer.requeue_interrupted(conn) == 1
+        conn.commit()
+        pool.release(conn)
+        assert other.stats() == {'pending': 1}
+    
+    def test_wake_does_not_requeue_claimed(self, pool):
+        dispatcher = mailer.OutboxDispatcher(pool, StubTransport)
+        self.enqueue(pool, 'a@example.com')
+        conn = pool.acquire()
+        dispatcher._claim(conn)
+        pool.release(conn)
+        
+        other = mailer.OutboxDispatcher(pool, StubTransport, poll_interval=60)
+        other.wake()
+        other.stop()
+        assert other.stats() == {'sending': 1}
+    
+    def test_registration_enqueues_email(self, client, auth, database):
+        auth.register(username='outbox_user', email='outbox@example.com')
+        with database() as conn:
+            row = conn.execute(
+                'SELECT subject FROM email_outbox WHERE recipient = ?', ('outbox@example.com',)
+            ).fetchone()
+        assert row is not None
+
+class TestBulkImportExport:
+    
+    def login_admin(self, auth):
+        auth.register(username='bulk_admin', email='bulk_admin@example.com', role='admin')
+        auth.login('bulk_admin')
+    
+    def test_import_lessons_csv(self, client, auth, database):
+        self.login_admin(auth)
+        payload = (
+            'subject,teacher,classroom,day_of_week,time_start,time_end\n'
+            'Астрономія,Зірка О.О.,601,Вівторок,15:50,17:25\n'
+            'Астрономія,Зірка О.О.,601,Четвер,15:50,17:25\n'
+        )
+        rv = client.post('/admin/import/lessons', data=payload.encode('utf-8'),
+                         content_type='text/csv')
+        assert rv.status_code == 200
+        assert rv.get_json()['imported'] == 2
+        
+        with database() as conn:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM lessons WHERE teacher = 'Зірка О.О.' AND start_minute = 950"
+            ).fetchone()[0]
+        assert count >= 2
+    
+    def test_import_rejects_whole_batch_on_errors(self, client, auth, database):
+        self.login_admin(auth)
+        rv = client.post('/admin/import/tasks', json=[
+            {'title': 'Добре завдання', 'subject': 'Фізика', 'user_id': 1},
+            {'title': '', 'subject': 'Фізика', 'user_id': 1},
+            {'title': 'Погане завдання', 'subject': 'Фізика', 'user_id': 'abc', 'due_date': '31.12.2025'},
+        ])
+        assert rv.status_code == 400
+        errors = rv.get_json()['errors']
+        assert {(e['row'], e['field']) for e in errors} == {(2, 'title'), (3, 'user_id'), (3, 'due_date')}
+        
+        with database() as conn:
+            assert conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE title = 'Добре завдання'"
+            ).fetchone()[0] == 0
+    
+    def test_import_lessons_reports_conflicts(self, client, auth, database):
+        self.login_admin(auth)
+        client.post('/add_lesson', data={
+            'subject': 'Фізика', 'teacher': 'Мороз В.В.', 'classroom': '701',
+            'day_of_week': 'Середа', 'time_start': '10:00', 'time_end': '10:45'
+        })
+        payload = (
+            'subject,teacher,classroom,day_of_week,time_start,time_end\n'
+            'Хімія,Лис А.А.,701,Середа,10:30,11:15\n'
+            'Біологія,Лис А.А.,702,Середа,11:00,11:45\n'
+            'Біологія,Лис А.А.,702,П\'ятниця,11:00,11:45\n'
+        )
+        rv = client.post('/admin/import/lessons', data=payload.encode('utf-8'), content_type='text/csv')
+        assert rv.status_code == 400
+        errors = rv.get_json()['errors']
+        assert {(e['row'], e['field']) for e in errors} == {(1, 'classroom'), (2, 'teacher')}
+        with database() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM lessons WHERE teacher = 'Лис А.А.'").fetchone()[0] == 0
+    
+    def test_import_users_hashed_in_batch(self, app, client, auth, database):
+        self.login_admin(auth)
+        hasher = app.extensions['password_hasher']
+        before = hasher.stats()['hash']['count']
+        rv = client.post('/admin/import/users', json=[
+            {'username': f'bulk_user{i}', 'email': f'bulk_user{i}@example.com', 'password': 'secret'}
+            for i in range(3)
+        ])
+        assert rv.get_json()['imported'] == 3
+        assert hasher.stats()['hash']['count'] == before + 3
+        with database() as conn:
+            hashed = conn.execute("SELECT password_hash FROM users WHERE username = 'bulk_user2'").fetchone()[0]
+        assert check_password('secret', hashed)
+    
+    def test_validate_lesson_times(self):
+        _, errors = bulk.validate('lessons', [{
+            'subject': 'Хімія', 'teacher': 'А', 'classroom': '1',
+            'day_of_week': 'Субота', 'time_start': '10:00', 'time_end': '09:00'
+        }])
+        assert [e['field'] for e in errors] == ['day_of_week']
+        
+        _, errors = bulk.validate('lessons', [{
+            'subject': 'Хімія', 'teacher': 'А', 'classroom': '1',
+            'day_of_week': 'Середа', 'time_start': '10:00', 'time_end': '09:00'
+        }])
+        assert [e['field'] for e in errors] == ['time_end']
+    
+    def test_export_streams_csv(self, client, auth):
+        self.login_admin(auth)
+        rv = client.get('/admin/export/users')
+        assert rv.status_code == 200
+        assert rv.is_streamed
+        lines = rv.get_data(as_text=True).splitlines()
+        assert lines[0] == 'id,username,email,role,created_at'
+        assert any('bulk_admin' in line for line in lines[1:])
+    
+    def test_import_requires_admin(self, client, auth):
+        auth.register(username='bulk_student', email='bulk_student@example.com')
+        auth.login('bulk_student')
+        rv = client.post('/admin/import/lessons', data=b'', content_type='text/csv')
+        assert rv.status_code == 403
+
 if __name__ == '__main__':
     pytest.main(['-v', __file__])
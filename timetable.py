@@ -0,0 +1,354 @@
+"""Автоматичне складання розкладу для класів.
+
+Опис задачі (JSON):
+
+    {
+      "slots": [["08:00", "08:45"], ["08:55", "09:40"], ...],
+      "days": ["Понеділок", ...],                        # необов'язково, за замовчуванням усі
+      "rooms": [{"name": "201"}, {"name": "Спортзал", "subjects": ["Фізкультура"]}],
+      "teachers": [{"name": "Іванова О.П.", "subjects": ["Математика"], "days_off": ["П'ятниця"]}],
+      "classes": [{"name": "5-А", "hours": {"Математика": 5}, "teachers": {"Математика": "Іванова О.П."}}]
+    }
+
+Зайнятість кожного класу, вчителя й кабінету — ціле число, де біт
+day * len(slots) + slot означає зайнятий урок, тож перевірка вільних слотів
+зводиться до кількох побітових операцій. Пошук — перебір з поверненням:
+щоразу обирається вимога (клас, предмет) з найменшим запасом вільних слотів,
+а вимога, для якої слотів уже не вистачає, одразу відкидає гілку. Спроби з
+різними seed можна запускати паралельно в пулі процесів.
+
+Уроки згенерованих класів замінюються; решта уроків у lessons лишається і
+займає своїх вчителів і кабінети.
+"""
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+
+import db
+from bulk import minutes
+from schedule_cache import WEEKDAYS
+
+Requirement = namedtuple('Requirement', 'class_index subject teacher_index hours per_day')
+Problem = namedtuple('Problem', 'days slots classes teachers rooms requirements rooms_for '
+                                'teacher_blocked class_busy teacher_busy room_busy')
+
+
+def _names(items, kind):
+    names = []
+    for item in items:
+        name = item.get('name') if isinstance(item, dict) else None
+        if not name or not isinstance(name, str):
+            raise ValueError(f'{kind}: потрібна назва')
+        if name in names:
+            raise ValueError(f'{kind}: «{name}» повторюється')
+        names.append(name)
+    return names
+
+
+def build_problem(spec, lessons=()):
+    """Перевіряє опис і будує задачу; lessons — наявні уроки інших класів.
+
+    lessons — рядки (teacher, classroom, weekday, start_minute, end_minute, class_name).
+    """
+    days = spec.get('days') or WEEKDAYS
+    if any(day not in WEEKDAYS for day in days):
+        raise ValueError('Невідомий день тижня')
+    try:
+        slots = [(start, end) for start, end in spec['slots']]
+        slot_minutes = [(minutes(start), minutes(end)) for start, end in slots]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('slots: очікуються пари ["08:00", "08:45"]')
+    if not slots or any(start >= end for start, end in slot_minutes):
+        raise ValueError('slots: урок має закінчуватися пізніше, ніж починається')
+
+    room_specs = spec.get('rooms') or []
+    teacher_specs = spec.get('teachers') or []
+    class_specs = spec.get('classes') or []
+    rooms = _names(room_specs, 'rooms')
+    teachers = _names(teacher_specs, 'teachers')
+    classes = _names(class_specs, 'classes')
+    if not classes:
+        raise ValueError('classes: потрібен хоча б один клас')
+    day_bits = [((1 << len(slots)) - 1) << (day * len(slots)) for day in range(len(days))]
+
+    # Спеціалізовані кабінети (зі списком subjects) — лише для своїх предметів,
+    # решта предметів займає загальні кабінети
+    general = [index for index, room in enumerate(room_specs) if not room.get('subjects')]
+    rooms_for = {}
+    for index, room in enumerate(room_specs):
+        for subject in room.get('subjects') or ():
+            rooms_for.setdefault(subject, []).append(index)
+
+    teacher_blocked = []
+    for teacher in teacher_specs:
+        blocked = 0
+        for day in teacher.get('days_off') or ():
+            if day in days:
+                blocked |= day_bits[days.index(day)]
+        teacher_blocked.append(blocked)
+
+    load = [0] * len(teachers)
+    requirements = []
+    for class_index, item in enumerate(class_specs):
+        chosen = item.get('teachers') or {}
+        hours_by_subject = item.get('hours')
+        if not isinstance(hours_by_subject, dict) or not isinstance(chosen, dict):
+            raise ValueError(f'{classes[class_index]}: hours і teachers мають бути об\'єктами')
+        for subject, hours in hours_by_subject.items():
+            if not isinstance(hours, int) or hours < 1:
+                raise ValueError(f'{classes[class_index]}: кількість годин «{subject}» має бути додатною')
+            if subject in chosen:
+                if chosen[subject] not in teachers:
+                    raise ValueError(f'Невідомий вчитель: {chosen[subject]}')
+                teacher_index = teachers.index(chosen[subject])
+            else:
+                # Найменше завантажений із тих, хто веде предмет
+                qualified = [index for index, teacher in enumerate(teacher_specs)
+                             if subject in (teacher.get('subjects') or ())]
+                if not qualified:
+                    raise ValueError(f'Немає вчителя з предмета «{subject}»')
+                teacher_index = min(qualified, key=lambda index: load[index])
+            if not rooms_for.get(subject, general):
+                raise ValueError(f'Немає кабінету для предмета «{subject}»')
+            load[teacher_index] += hours
+            per_day = -(-hours // len(days))
+            requirements.append(Requirement(class_index, subject, teacher_index, hours, per_day))
+
+    class_busy = [0] * len(classes)
+    teacher_busy = [0] * len(teachers)
+    room_busy = [0] * len(rooms)
+    for teacher, classroom, weekday, start, end, class_name in lessons:
+        # Уроки вихідних (weekday 6, 7 зі старих даних) не займають робочих днів задачі
+        if weekday is None or not 1 <= weekday <= len(WEEKDAYS):
+            continue
+        day_name = WEEKDAYS[weekday - 1]
+        if day_name not in days:
+            continue
+        bits = 0
+        for slot, (slot_start, slot_end) in enumerate(slot_minutes):
+            if start < slot_end and slot_start < end:
+                bits |= 1 << (days.index(day_name) * len(slots) + slot)
+        if teacher in teachers:
+            teacher_busy[teachers.index(teacher)] |= bits
+        if classroom in rooms:
+            room_busy[rooms.index(classroom)] |= bits
+        if class_name in classes:
+            class_busy[classes.index(class_name)] |= bits
+
+    rooms_for = {req.subject: rooms_for.get(req.subject, general) for req in requirements}
+    return Problem(days, slots, classes, teachers, rooms, requirements, rooms_for,
+                   teacher_blocked, class_busy, teacher_busy, room_busy)
+
+
+class _Search:
+
+    def __init__(self, problem, rng):
+        self.problem = problem
+        self.rng = rng
+        self.per_day = len(problem.slots)
+        self.full = (1 << (len(problem.days) * self.per_day)) - 1
+        self.day_bits = [((1 << self.per_day) - 1) << (day * self.per_day) for day in range(len(problem.days))]
+        self.class_busy = list(problem.class_busy)
+        self.teacher_busy = [busy | blocked for busy, blocked in zip(problem.teacher_busy, problem.teacher_blocked)]
+        self.room_busy = list(problem.room_busy)
+        self.remaining = [req.hours for req in problem.requirements]
+        self.day_count = [[0] * len(problem.days) for _ in problem.requirements]
+        self.day_full = [0] * len(problem.requirements)
+        self.tiebreak = [rng.random() for _ in problem.requirements]
+        # Скільки перших уроків дня вистачає класу при рівномірному розподілі
+        hours = [0] * len(problem.classes)
+        for req in problem.requirements:
+            hours[req.class_index] += req.hours
+        self.class_depth = [-(-total // len(problem.days)) for total in hours]
+
+    def select(self):
+        """(вимога, вільні слоти); (None, None) — усе розставлено, (i, None) — глухий кут."""
+        room_free = {}
+        best = None
+        for i, req in enumerate(self.problem.requirements):
+            remaining = self.remaining[i]
+            if not remaining:
+                continue
+            free = room_free.get(req.subject)
+            if free is None:
+                free = 0
+                for room in self.problem.rooms_for[req.subject]:
+                    free |= ~self.room_busy[room]
+                free = room_free[req.subject] = free & self.full
+            domain = free & ~(self.class_busy[req.class_index] | self.teacher_busy[req.teacher_index]
+                              | self.day_full[i])
+            # Скільки уроків ще можна поставити з урахуванням ліміту на день
+            capacity = sum(min(req.per_day - self.day_count[i][day], (domain & bits).bit_count())
+                           for day, bits in enumerate(self.day_bits))
+            if capacity < remaining:
+                return i, None
+            key = (capacity - remaining, -remaining, self.tiebreak[i])
+            if best is None or key < best[0]:
+                best = (key, i, domain)
+        if best is None:
+            return None, None
+        return best[1], best[2]
+
+    def candidates(self, i, domain):
+        """Слоти за пріоритетом: дні без цього предмета, менш завантажені дні класу,
+        уроки в межах class_depth (без «вікон» наприкінці дня).
+
+        Порядок серед перших уроків дня випадковий: жорстке «якомога раніше»
+        змушує всі класи змагатися за тих самих вчителів на перших уроках.
+        """
+        req = self.problem.requirements[i]
+        class_busy = self.class_busy[req.class_index]
+        depth = self.class_depth[req.class_index]
+        slots = []
+        while domain:
+            bit = domain & -domain
+            slot = bit.bit_length() - 1
+            day = slot // self.per_day
+            slots.append(((self.day_count[i][day], (class_busy & self.day_bits[day]).bit_count(),
+                           slot % self.per_day >= depth, self.rng.random()), slot))
+            domain ^= bit
+        slots.sort()
+        return [slot for _, slot in slots]
+
+    def place(self, i, slot):
+        req = self.problem.requirements[i]
+        bit = 1 << slot
+        room = next(room for room in self.problem.rooms_for[req.subject] if not self.room_busy[room] & bit)
+        self.class_busy[req.class_index] |= bit
+        self.teacher_busy[req.teacher_index] |= bit
+        self.room_busy[room] |= bit
+        self.remaining[i] -= 1
+        day = slot // self.per_day
+        self.day_count[i][day] += 1
+        if self.day_count[i][day] == req.per_day:
+            self.day_full[i] |= self.day_bits[day]
+        return room
+
+    def unplace(self, i, slot, room):
+        req = self.problem.requirements[i]
+        bit = 1 << slot
+        self.class_busy[req.class_index] &= ~bit
+        self.teacher_busy[req.teacher_index] &= ~bit
+        self.room_busy[room] &= ~bit
+        self.remaining[i] += 1
+        day = slot // self.per_day
+        self.day_count[i][day] -= 1
+        self.day_full[i] &= ~self.day_bits[day]
+
+    def run(self, deadline, max_steps):
+        """Перебір з поверненням; список (вимога, слот, кабінет) або None.
+
+        deadline — час (time.time()), після якого спроба здається.
+        """
+        # Кадр: [вимога, слоти-кандидати, наступний кандидат, (слот, кабінет) або None]
+        frames = []
+        steps = 0
+        while True:
+            i, domain = self.select()
+            if i is None:
+                return [(frame[0], frame[3][0], frame[3][1]) for frame in frames]
+            if domain is not None:
+                frames.append([i, self.candidates(i, domain), 0, None])
+            while frames:
+                frame = frames[-1]
+                if frame[3] is not None:
+                    self.unplace(frame[0], *frame[3])
+                    frame[3] = None
+                if frame[2] < len(frame[1]):
+                    slot = frame[1][frame[2]]
+                    frame[2] += 1
+                    frame[3] = (slot, self.place(frame[0], slot))
+                    break
+                frames.pop()
+            else:
+                return None
+            steps += 1
+            if steps > max_steps:
+                return None
+            if steps % 1024 == 0 and time.time() > deadline:
+                return None
+
+
+def _attempt(problem, seed, deadline, max_steps):
+    return _Search(problem, random.Random(seed)).run(deadline, max_steps)
+
+
+def solve(problem, seed=0, restarts=8, workers=1, timeout=30, max_steps=None):
+    """Розклад як список уроків або None, якщо жодна спроба не вдалася за timeout секунд.
+
+    Спроби відрізняються seed (порядок серед рівноцінних варіантів); з
+    workers > 1 вони виконуються в пулі процесів і береться перша вдала.
+    Невдала спроба зазвичай застрягає глибоко в переборі, тож перша
+    обмежена подвоєною кількістю уроків, а кожна наступна отримує вдвічі
+    більше кроків — аж до дедлайну. max_steps задає однакову межу для всіх спроб.
+    """
+    deadline = time.time() + timeout
+    base_steps = 2 * sum(req.hours for req in problem.requirements) + 100
+    attempts = [(seed + attempt, max_steps or base_steps * 2 ** attempt) for attempt in range(restarts)]
+    placements = None
+    if workers > 1:
+        # spawn: пул не успадковує потоки й з'єднання процесу додатку
+        context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(workers, mp_context=context)
+        try:
+            futures = [pool.submit(_attempt, problem, attempt_seed, deadline, steps)
+                       for attempt_seed, steps in attempts]
+            for future in as_completed(futures, timeout=max(deadline - time.time(), 0)):
+                placements = future.result()
+                if placements is not None:
+                    break
+        except TimeoutError:
+            placements = None
+        finally:
+            # Не чекаємо спроб, що ще виконуються: кожна сама зупиниться на дедлайні
+            pool.shutdown(wait=False, cancel_futures=True)
+    else:
+        for attempt_seed, steps in attempts:
+            placements = _attempt(problem, attempt_seed, deadline, steps)
+            if placements is not None or time.time() > deadline:
+                break
+    if placements is None:
+        return None
+
+    lessons = []
+    for i, slot, room in sorted(placements, key=lambda placement: (placement[1], placement[0])):
+        req = problem.requirements[i]
+        day, position = divmod(slot, len(problem.slots))
+        time_start, time_end = problem.slots[position]
+        lessons.append({
+            'subject': req.subject,
+            'teacher': problem.teachers[req.teacher_index],
+            'classroom': problem.rooms[room],
+            'class_name': problem.classes[req.class_index],
+            'day_of_week': problem.days[day],
+            'time_start': time_start,
+            'time_end': time_end,
+        })
+    return lessons
+
+
+def existing_lessons(conn, spec):
+    """Уроки, що лишаються (усі, крім уроків класів зі spec), у форматі для build_problem."""
+    classes = [item.get('name') for item in spec.get('classes') or () if isinstance(item, dict)]
+    rows = conn.execute(
+        'SELECT teacher, classroom, weekday, start_minute, end_minute, class_name FROM lessons '
+        f'WHERE class_name IS NULL OR class_name NOT IN ({", ".join("?" * len(classes))})', classes
+    )
+    return [tuple(row) for row in rows]
+
+
+def write_lessons(conn, problem, lessons, created_by=None):
+    """Замінює уроки класів задачі згенерованими; повертає нову версію lessons.
+
+    Викликається в транзакції; коміт — на боці викликача.
+    """
+    conn.execute(f'DELETE FROM lessons WHERE class_name IN ({", ".join("?" * len(problem.classes))})',
+                 problem.classes)
+    conn.executemany(
+        'INSERT INTO lessons (subject, teacher, classroom, class_name, day_of_week, time_start, time_end, created_by) '
+        'VALUES (:subject, :teacher, :classroom, :class_name, :day_of_week, :time_start, :time_end, :created_by)',
+        [dict(lesson, created_by=created_by) for lesson in lessons]
+    )
+    return db.bump_version(conn, 'lessons')
@@ -0,0 +1,109 @@
+"""Кеш погодного віджету з фоновим оновленням."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (з'єднання, читання) в секундах
+DEFAULT_TIMEOUT = (2, 3)
+
+
+def make_session(pool_size=4):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_weather(session, url, api_key, city, timeout=DEFAULT_TIMEOUT):
+    params = {
+        'q': city,
+        'appid': api_key,
+        'units': 'metric',
+        'lang': 'uk'
+    }
+    try:
+        response = session.get(url, params=params, timeout=timeout)
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except (requests.RequestException, ValueError) as e:
+        print(f"Помилка отримання погоди: {e}")
+        return None
+
+
+class WeatherCache:
+    """Кеш погоди за містом з TTL.
+
+    `get()` ніколи не чекає на зовнішній API: повертає те, що є в кеші
+    (навіть застаріле), а оновлення запускає у фоні. Фоновий потік
+    підтримує відомі міста «теплими», щоб записи не встигали застаріти.
+    """
+
+    def __init__(self, fetch, ttl=600, max_stale=3600, workers=2):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather')
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def get(self, city):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(city)
+        if entry is None or now - entry[1] >= self.ttl:
+            self.refresh(city)
+        if entry is None or now - entry[1] >= self.max_stale:
+            return None
+        return entry[0]
+
+    def refresh(self, city):
+        """Запускає оновлення міста, якщо воно ще не виконується."""
+        with self._lock:
+            future = self._in_flight.get(city)
+            if future is None:
+                future = self._executor.submit(self._refresh, city)
+                self._in_flight[city] = future
+        return future
+
+    def _refresh(self, city):
+        try:
+            data = self._fetch(city)
+            if data is not None:
+                with self._lock:
+                    self._entries[city] = (data, time.monotonic())
+            return data
+        finally:
+            with self._lock:
+                self._in_flight.pop(city, None)
+
+    def start(self, interval=None):
+        """Запускає фоновий потік, що оновлює записи до закінчення TTL."""
+        if self._refresher is not None:
+            return
+        interval = interval or max(self.ttl * 0.8, 1)
+        self._refresher = threading.Thread(
+            target=self._run, args=(interval,), name='weather-refresher', daemon=True
+        )
+        self._refresher.start()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            with self._lock:
+                cities = list(self._entries)
+            for city in cities:
+                self.refresh(city)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout)
+            self._refresher = None
+        self._executor.shutdown(wait=False)